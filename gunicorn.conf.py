@@ -0,0 +1,61 @@
+import multiprocessing
+import os
+import tempfile
+
+bind = os.getenv("WMS_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+worker_class = "gthread"
+threads = int(os.getenv("WMS_THREADS", "4"))
+
+# Import the app once in the master and fork it: workers share the imported
+# code copy-on-write and start instantly. post_fork gives each its own pool.
+preload_app = True
+
+# Seconds a worker gets after SIGTERM to finish in-flight requests before
+# worker_exit drains the group-commit queue. /healthz reports "draining"
+# from the SIGTERM on (post_worker_init).
+graceful_timeout = int(os.getenv("WMS_GRACEFUL_TIMEOUT", "30"))
+timeout = int(os.getenv("WMS_TIMEOUT", "60"))
+max_requests = int(os.getenv("WMS_MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+
+# Pools are per worker: one connection per request thread plus the
+# group-commit writer, and overflow for read_session() when there is no
+# replica. Total connections ~ workers x (DB_POOL_SIZE + DB_MAX_OVERFLOW).
+# Read by wms.config at import, i.e. during preload below.
+os.environ.setdefault("DB_POOL_SIZE", str(threads + 1))
+os.environ.setdefault("DB_MAX_OVERFLOW", str(threads))
+os.environ.setdefault("REPLICA_POOL_SIZE", str(threads))
+os.environ.setdefault("REPLICA_MAX_OVERFLOW", "0")
+
+# Shared by the workers so /metrics reports all of them (see wms.metrics).
+os.environ.setdefault("METRICS_DIR", tempfile.mkdtemp(prefix="wms-metrics-"))
+
+
+def post_fork(server, worker):
+    from wms.server import after_fork
+    from wsgi import app
+
+    after_fork(app)
+
+
+def post_worker_init(worker):
+    # Runs after the worker installed its own signal handlers.
+    from wms.server import drain_on_signal
+    from wsgi import app
+
+    drain_on_signal(app)
+
+
+def worker_int(worker):
+    from wms.server import start_draining
+    from wsgi import app
+
+    start_draining(app)
+
+
+def worker_exit(server, worker):
+    from wms.server import shutdown
+    from wsgi import app
+
+    shutdown(app, timeout=float(graceful_timeout))
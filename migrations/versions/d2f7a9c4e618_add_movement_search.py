@@ -0,0 +1,80 @@
+"""add full-text search over movements
+
+Revision ID: d2f7a9c4e618
+Revises: c5a8e2f1d6b4
+Create Date: 2026-10-19 16:05:41.208113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2f7a9c4e618'
+down_revision = 'c5a8e2f1d6b4'
+branch_labels = None
+depends_on = None
+
+# Same statements as wms/models/search.py (create_all path). Note: a later
+# batch_alter_table on stock_movements/products recreates the table on
+# SQLite and drops these triggers; such migrations must recreate them.
+SQLITE_UPGRADE = (
+    """CREATE VIRTUAL TABLE IF NOT EXISTS movement_search USING fts5(
+        note, reason, product, sku, tokenize = 'unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS movement_search_ai AFTER INSERT ON stock_movements BEGIN
+        INSERT INTO movement_search (rowid, note, reason, product, sku)
+        SELECT new.id, replace(new.note, 'ı', 'i'), replace(new.reason, 'ı', 'i'), replace(p.name, 'ı', 'i'), replace(p.sku, 'ı', 'i')
+        FROM products p WHERE p.id = new.product_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS movement_search_au AFTER UPDATE OF note, reason ON stock_movements BEGIN
+        UPDATE movement_search SET note = replace(new.note, 'ı', 'i'), reason = replace(new.reason, 'ı', 'i') WHERE rowid = new.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS movement_search_product_au AFTER UPDATE OF name, sku ON products BEGIN
+        UPDATE movement_search SET product = replace(new.name, 'ı', 'i'), sku = replace(new.sku, 'ı', 'i')
+        WHERE rowid IN (
+            SELECT id FROM stock_movements WHERE product_id = new.id
+            UNION ALL SELECT id FROM stock_movements_archive WHERE product_id = new.id
+        );
+    END""",
+    *(
+        f"""INSERT INTO movement_search (rowid, note, reason, product, sku)
+        SELECT m.id, replace(m.note, 'ı', 'i'), replace(m.reason, 'ı', 'i'), replace(p.name, 'ı', 'i'), replace(p.sku, 'ı', 'i')
+        FROM {table} m JOIN products p ON p.id = m.product_id"""
+        for table in ('stock_movements', 'stock_movements_archive')
+    ),
+)
+
+# Elsewhere search is ILIKE '%term%'; on PostgreSQL trigram indexes serve it.
+POSTGRESQL_TRGM_INDEXES = (
+    ('ix_stockmovement_note_trgm', 'stock_movements', 'note'),
+    ('ix_stockmovement_reason_trgm', 'stock_movements', 'reason'),
+    ('ix_stockmovementarchive_note_trgm', 'stock_movements_archive', 'note'),
+    ('ix_stockmovementarchive_reason_trgm', 'stock_movements_archive', 'reason'),
+    ('ix_product_name_trgm', 'products', 'name'),
+    ('ix_product_sku_trgm', 'products', 'sku'),
+)
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for statement in SQLITE_UPGRADE:
+            op.execute(statement)
+    elif dialect == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for name, table, column in POSTGRESQL_TRGM_INDEXES:
+            op.create_index(
+                name, table, [sa.text(f'{column} gin_trgm_ops')], unique=False, postgresql_using='gin'
+            )
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for trigger in ('movement_search_product_au', 'movement_search_au', 'movement_search_ai'):
+            op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        op.execute('DROP TABLE IF EXISTS movement_search')
+    elif dialect == 'postgresql':
+        for name, table, _column in POSTGRESQL_TRGM_INDEXES:
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,70 @@
+"""never reuse stock_movements ids on SQLite
+
+Revision ID: e4b8c1f05a93
+Revises: d2f7a9c4e618
+Create Date: 2026-10-20 09:12:37.504126
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4b8c1f05a93'
+down_revision = 'd2f7a9c4e618'
+branch_labels = None
+depends_on = None
+
+# Without AUTOINCREMENT SQLite hands out max(id)+1, so archiving the newest
+# movements made their ids free again. PostgreSQL sequences never go back.
+SEED_SEQUENCE = (
+    "DELETE FROM sqlite_sequence WHERE name = 'stock_movements'",
+    """INSERT INTO sqlite_sequence (name, seq) SELECT 'stock_movements', max(
+        coalesce((SELECT max(id) FROM stock_movements), 0),
+        coalesce((SELECT max(id) FROM stock_movements_archive), 0)
+    )""",
+)
+
+# Recreating the table drops its triggers, and the products trigger that
+# reads it would fail the rename; same statements as d2f7a9c4e618.
+SEARCH_TRIGGERS = (
+    """CREATE TRIGGER IF NOT EXISTS movement_search_ai AFTER INSERT ON stock_movements BEGIN
+        INSERT INTO movement_search (rowid, note, reason, product, sku)
+        SELECT new.id, replace(new.note, 'ı', 'i'), replace(new.reason, 'ı', 'i'), replace(p.name, 'ı', 'i'), replace(p.sku, 'ı', 'i')
+        FROM products p WHERE p.id = new.product_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS movement_search_au AFTER UPDATE OF note, reason ON stock_movements BEGIN
+        UPDATE movement_search SET note = replace(new.note, 'ı', 'i'), reason = replace(new.reason, 'ı', 'i') WHERE rowid = new.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS movement_search_product_au AFTER UPDATE OF name, sku ON products BEGIN
+        UPDATE movement_search SET product = replace(new.name, 'ı', 'i'), sku = replace(new.sku, 'ı', 'i')
+        WHERE rowid IN (
+            SELECT id FROM stock_movements WHERE product_id = new.id
+            UNION ALL SELECT id FROM stock_movements_archive WHERE product_id = new.id
+        );
+    END""",
+)
+
+
+def _rebuild(autoincrement):
+    for trigger in ('movement_search_product_au', 'movement_search_au', 'movement_search_ai'):
+        op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    with op.batch_alter_table(
+        'stock_movements', recreate='always', table_kwargs={'sqlite_autoincrement': autoincrement}
+    ):
+        pass
+    for statement in SEARCH_TRIGGERS:
+        op.execute(statement)
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    _rebuild(True)
+    for statement in SEED_SEQUENCE:
+        op.execute(statement)
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    _rebuild(False)
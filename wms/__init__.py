@@ -4,12 +4,38 @@ from flask import Flask
 from dotenv import load_dotenv
 
 from .config import Config
-from .extensions import db, login_manager, migrate, csrf
+from .extensions import db
+from .caching import init_caching
 from .cli import register_cli
+from .db_routing import configure_engines, init_read_session
+from .sqlite_profile import init_sqlite_profile
 
+WEB_BLUEPRINTS = (
+    "auth",
+    "admin",
+    "products",
+    "units",
+    "stock",
+    "warehouses",
+    "reports",
+    "suppliers",
+    "customers",
+    "purchases",
+    "sales",
+)
 
-def create_app(config_object: type[Config] | None = None) -> Flask:
+
+def create_app(config_object: type[Config] | None = None, *, web: bool | None = None) -> Flask:
+    """Application factory.
+
+    With web=False (or WMS_WEB=0) the app is created for CLI commands and
+    background jobs only: no blueprints, forms, login, CSRF or response
+    compression are imported or registered. Flask-Migrate is only set up
+    for the `flask db` command group; scripts that drive migrations
+    themselves call init_migrate(app)."""
     load_dotenv()
+    if web is None:
+        web = os.getenv("WMS_WEB", "1") == "1"
 
     app = Flask(__name__, instance_relative_config=True)
 
@@ -23,34 +49,59 @@ def create_app(config_object: type[Config] | None = None) -> Flask:
             "sqlite:///" + os.path.join(app.instance_path, "wms.sqlite3")
         )
 
+    configure_engines(app)
     db.init_app(app)
-    login_manager.init_app(app)
-    login_manager.login_view = app.config.get("LOGIN_VIEW", "auth.login")
-    migrate.init_app(app, db)
-    csrf.init_app(app)
-
-    from .blueprints.auth import bp as auth_bp
-    from .blueprints.admin import bp as admin_bp
-    from .blueprints.products import bp as products_bp
-    from .blueprints.units import bp as units_bp
-    from .blueprints.stock import bp as stock_bp
-    from .blueprints.warehouses import bp as warehouses_bp
-    from .blueprints.reports import bp as reports_bp
-    from .blueprints.suppliers import bp as suppliers_bp
-    from .blueprints.customers import bp as customers_bp
-    from .blueprints.purchases import bp as purchases_bp
-
-    app.register_blueprint(auth_bp)
-    app.register_blueprint(admin_bp)
-    app.register_blueprint(products_bp)
-    app.register_blueprint(units_bp)
-    app.register_blueprint(stock_bp)
-    app.register_blueprint(warehouses_bp)
-    app.register_blueprint(reports_bp)
-    app.register_blueprint(suppliers_bp)
-    app.register_blueprint(customers_bp)
-    app.register_blueprint(purchases_bp)
+    init_sqlite_profile(app)
+    init_read_session(app)
+    init_caching(app)
+
+    # Registers the listener that bumps the users cache version, which must
+    # run for changes made from CLI commands too.
+    from . import security  # noqa: F401
+
+    if web:
+        _init_web(app)
 
     register_cli(app)
 
     return app
+
+
+def create_cli_app() -> Flask:
+    """Entry point for cron and maintenance commands: flask --app wms:create_cli_app ..."""
+    return create_app(web=False)
+
+
+def init_migrate(app: Flask) -> None:
+    """Register Flask-Migrate, for flask_migrate.upgrade()/current() and the db commands."""
+    from flask_migrate import Migrate
+
+    from .models.search import include_name
+
+    Migrate(app, db, include_name=include_name)
+
+
+def _init_web(app: Flask) -> None:
+    from importlib import import_module
+
+    from flask_login import LoginManager
+    from flask_wtf import CSRFProtect
+
+    from .metrics import init_metrics
+    from .responses import init_compression, init_template_cache
+    from .security import load_user
+    from .server import init_server
+    from .services.stock_read_model import init_stock_read_model
+
+    login_manager = LoginManager(app)
+    login_manager.login_view = app.config.get("LOGIN_VIEW", "auth.login")
+    login_manager.user_loader(load_user)
+    CSRFProtect(app)
+    init_compression(app)
+    init_template_cache(app)
+    init_server(app)
+    init_metrics(app)
+    init_stock_read_model(app)
+
+    for name in WEB_BLUEPRINTS:
+        app.register_blueprint(import_module(f".blueprints.{name}", __name__).bp)
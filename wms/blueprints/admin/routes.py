@@ -1,9 +1,11 @@
 from datetime import date
 
-from flask import redirect, render_template, url_for
+from flask import current_app, redirect, render_template, url_for
 from flask_login import login_required
 from flask_login import current_user
 
+from ...caching import registered_caches
+from ...db_routing import read_session
 from ...extensions import db
 from ...models import Product, StockLevel, StockMovement, Warehouse
 from ...security import admin_required
@@ -21,25 +23,26 @@ def index():
 @bp.route("/admin/dashboard")
 @admin_required
 def dashboard():
-    total_products = db.session.query(Product.id).count()
-    total_warehouses = db.session.query(Warehouse.id).count()
+    rs = read_session()
+    total_products = rs.query(Product.id).count()
+    total_warehouses = rs.query(Warehouse.id).count()
 
     today = date.today().isoformat()
     today_in_count = (
-        db.session.query(StockMovement.id)
+        rs.query(StockMovement.id)
         .filter(db.func.date(StockMovement.created_at) == today)
         .filter(StockMovement.movement_type == "IN")
         .count()
     )
     today_out_count = (
-        db.session.query(StockMovement.id)
+        rs.query(StockMovement.id)
         .filter(db.func.date(StockMovement.created_at) == today)
         .filter(StockMovement.movement_type == "OUT")
         .count()
     )
 
     critical_products = (
-        db.session.query(Product)
+        rs.query(Product)
         .outerjoin(StockLevel, StockLevel.product_id == Product.id)
         .group_by(Product.id)
         .having(db.func.coalesce(db.func.sum(StockLevel.quantity), 0) < Product.min_stock_level)
@@ -54,3 +57,29 @@ def dashboard():
         today_out_count=today_out_count,
         critical_products=critical_products,
     )
+
+
+@bp.route("/admin/perf")
+@admin_required
+def perf():
+    from ...services.report_cache import day_buckets
+
+    caches = []
+    for name, cache in registered_caches():
+        lookups = cache.hits + cache.misses
+        caches.append(
+            {
+                "name": name,
+                "entries": len(cache),
+                "maxsize": cache.maxsize,
+                "hits": cache.hits,
+                "misses": cache.misses,
+                "ratio": cache.hits / lookups if lookups else None,
+            }
+        )
+    return render_template(
+        "admin/perf.html",
+        caches=caches,
+        day_buckets=day_buckets,
+        writer=current_app.extensions.get("group_commit"),
+    )
@@ -1,17 +1,12 @@
 from flask import flash, redirect, render_template, request, url_for
 from flask_login import current_user, login_user, logout_user
 
-from ...extensions import login_manager
+from ...extensions import db
 from ...models import User
 from . import bp
 from .forms import LoginForm
 
 
-@login_manager.user_loader
-def load_user(user_id: str):
-    return User.query.get(int(user_id))
-
-
 @bp.route("/login", methods=["GET", "POST"])
 def login():
     if current_user.is_authenticated:
@@ -24,6 +19,10 @@ def login():
             flash("Kullanıcı adı/şifre hatalı.", "danger")
             return render_template("auth/login.html", form=form)
 
+        if user.password_needs_rehash():
+            user.set_password(form.password.data)
+            db.session.commit()
+
         login_user(user)
         next_url = request.args.get("next")
         default_url = url_for("admin.dashboard" if user.is_admin else "stock.stock_list")
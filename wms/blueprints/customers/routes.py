@@ -1,5 +1,8 @@
 from flask import flash, redirect, render_template, url_for
 
+from ...caching import bump_cache_version
+from ...choices import CUSTOMERS
+from ...db_routing import read_session
 from ...extensions import db
 from ...models import Customer
 from ...security import admin_required
@@ -10,7 +13,7 @@ from .forms import CustomerForm
 @bp.route("/customers")
 @admin_required
 def customers_list():
-    customers = Customer.query.order_by(Customer.name.asc()).all()
+    customers = read_session().query(Customer).order_by(Customer.name.asc()).all()
     return render_template("customers/customers_list.html", customers=customers)
 
 
@@ -34,6 +37,7 @@ def customers_new():
             is_active=bool(form.is_active.data),
         )
         db.session.add(c)
+        bump_cache_version(CUSTOMERS)
         db.session.commit()
 
         flash("Müşteri oluşturuldu.", "success")
@@ -65,6 +69,7 @@ def customers_edit(customer_id: int):
         c.address = form.address.data
         c.is_active = bool(form.is_active.data)
 
+        bump_cache_version(CUSTOMERS)
         db.session.commit()
         flash("Müşteri güncellendi.", "success")
         return redirect(url_for("customers.customers_list"))
@@ -77,6 +82,7 @@ def customers_edit(customer_id: int):
 def customers_toggle(customer_id: int):
     c = Customer.query.get_or_404(customer_id)
     c.is_active = not c.is_active
+    bump_cache_version(CUSTOMERS)
     db.session.commit()
     flash("Müşteri durumu güncellendi.", "success")
     return redirect(url_for("customers.customers_list"))
@@ -5,6 +5,7 @@ from wtforms.validators import DataRequired, NumberRange, Optional
 
 class CategoryForm(FlaskForm):
     name = StringField("Kategori Adı", validators=[DataRequired()])
+    parent_id = SelectField("Üst Kategori", coerce=int, validators=[Optional()])
     submit = SubmitField("Kaydet")
 
 
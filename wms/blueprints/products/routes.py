@@ -1,8 +1,20 @@
 from flask import flash, redirect, render_template, url_for
+from sqlalchemy.orm import joinedload
 
+from ...caching import bump_cache_version
+from ...choices import PRODUCTS, category_choices, unit_choices
+from ...db_routing import read_session
+from ...responses import stream_page
 from ...extensions import db
-from ...models import Category, Product, Unit
+from ...models import Category, Product
 from ...security import admin_required
+from ...services.category_service import (
+    CategoryError,
+    category_stock,
+    category_tree,
+    create_category,
+    update_category,
+)
 from . import bp
 from .forms import CategoryForm, ProductForm
 
@@ -10,47 +22,70 @@ from .forms import CategoryForm, ProductForm
 @bp.route("/categories")
 @admin_required
 def categories_list():
-    categories = Category.query.order_by(Category.name.asc()).all()
-    return render_template("products/categories_list.html", categories=categories)
+    rs = read_session()
+    return render_template(
+        "products/categories_list.html",
+        categories=category_tree(session=rs),
+        totals=category_stock(session=rs),
+    )
 
 
 @bp.route("/categories/new", methods=["GET", "POST"])
 @admin_required
 def categories_new():
     form = CategoryForm()
+    form.parent_id.choices = [(0, "-")] + category_choices()
     if form.validate_on_submit():
-        existing = Category.query.filter_by(name=form.name.data.strip()).first()
-        if existing:
-            flash("Bu kategori zaten mevcut.", "warning")
+        try:
+            create_category(form.name.data, form.parent_id.data or None)
+        except CategoryError as e:
+            flash(str(e), "warning")
             return render_template("products/category_form.html", form=form)
-
-        c = Category(name=form.name.data.strip())
-        db.session.add(c)
-        db.session.commit()
         flash("Kategori oluşturuldu.", "success")
         return redirect(url_for("products.categories_list"))
 
     return render_template("products/category_form.html", form=form)
 
 
+@bp.route("/categories/<int:category_id>/edit", methods=["GET", "POST"])
+@admin_required
+def categories_edit(category_id: int):
+    category = Category.query.get_or_404(category_id)
+    form = CategoryForm(obj=category)
+    form.parent_id.choices = [(0, "-")] + [c for c in category_choices() if c[0] != category.id]
+    if not form.is_submitted():
+        form.parent_id.data = category.parent_id or 0
+    if form.validate_on_submit():
+        try:
+            update_category(category.id, form.name.data, form.parent_id.data or None)
+        except CategoryError as e:
+            flash(str(e), "warning")
+            return render_template("products/category_form.html", form=form, category=category)
+        flash("Kategori güncellendi.", "success")
+        return redirect(url_for("products.categories_list"))
+
+    return render_template("products/category_form.html", form=form, category=category)
+
+
 @bp.route("/products")
 @admin_required
 def products_list():
-    products = Product.query.order_by(Product.name.asc()).all()
-    return render_template("products/products_list.html", products=products)
+    products = (
+        read_session()
+        .query(Product)
+        .options(joinedload(Product.category), joinedload(Product.unit))
+        .order_by(Product.name.asc())
+        .all()
+    )
+    return stream_page("products/products_list.html", products=products)
 
 
 @bp.route("/products/new", methods=["GET", "POST"])
 @admin_required
 def products_new():
     form = ProductForm()
-    form.category_id.choices = [(0, "-")] + [
-        (c.id, c.name) for c in Category.query.order_by(Category.name.asc()).all()
-    ]
-    form.unit_id.choices = [
-        (u.id, f"{u.name} ({u.short_code})")
-        for u in Unit.query.filter_by(is_active=True).order_by(Unit.name.asc()).all()
-    ]
+    form.category_id.choices = [(0, "-")] + category_choices()
+    form.unit_id.choices = unit_choices()
 
     if form.validate_on_submit():
         if Product.query.filter_by(sku=form.sku.data.strip()).first():
@@ -68,6 +103,7 @@ def products_new():
             is_active=bool(form.is_active.data),
         )
         db.session.add(p)
+        bump_cache_version(PRODUCTS)
         db.session.commit()
         flash("Ürün oluşturuldu.", "success")
         return redirect(url_for("products.products_list"))
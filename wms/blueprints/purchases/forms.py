@@ -14,4 +14,5 @@ class PurchaseForm(FlaskForm):
 class PurchaseItemForm(FlaskForm):
     product_id = SelectField("Ürün", coerce=int, validators=[DataRequired()])
     quantity = FloatField("Miktar", validators=[DataRequired()])
+    unit_cost = FloatField("Birim Maliyet", validators=[Optional()])
     submit = SubmitField("Ekle")
@@ -3,23 +3,20 @@ from datetime import datetime
 from flask import flash, redirect, render_template, request, url_for
 from flask_login import current_user
 
+from ...choices import product_choices, shelf_choices, supplier_choices, warehouse_choices
+from ...db_routing import read_session
 from ...extensions import db
-from ...models import Product, Purchase, PurchaseItem, Shelf, Supplier, Warehouse
+from ...models import Product, Purchase, PurchaseItem
 from ...security import admin_required
 from ...services.stock_service import StockError, StockMovementRequest, create_stock_movement
+from ...sqlite_profile import begin_immediate
 from . import bp
 from .forms import PurchaseForm, PurchaseItemForm
 
 
 def _populate_purchase_form_choices(form: PurchaseForm) -> None:
-    form.supplier_id.choices = [
-        (s.id, s.name)
-        for s in Supplier.query.filter_by(is_active=True).order_by(Supplier.name.asc()).all()
-    ]
-    form.warehouse_id.choices = [
-        (w.id, w.name)
-        for w in Warehouse.query.filter_by(is_active=True).order_by(Warehouse.name.asc()).all()
-    ]
+    form.supplier_id.choices = supplier_choices()
+    form.warehouse_id.choices = warehouse_choices()
 
     selected_wh = None
     try:
@@ -27,23 +24,19 @@ def _populate_purchase_form_choices(form: PurchaseForm) -> None:
     except ValueError:
         selected_wh = None
 
-    shelves = []
-    if selected_wh:
-        shelves = Shelf.query.filter_by(warehouse_id=selected_wh).order_by(Shelf.code.asc()).all()
-    form.shelf_id.choices = [(0, "-")] + [(s.id, s.code) for s in shelves]
+    form.shelf_id.choices = [(0, "-")] + (shelf_choices(selected_wh) if selected_wh else [])
 
 
 def _populate_item_form_choices(form: PurchaseItemForm) -> None:
-    form.product_id.choices = [
-        (p.id, f"{p.name} ({p.sku})")
-        for p in Product.query.filter_by(is_active=True).order_by(Product.name.asc()).all()
-    ]
+    form.product_id.choices = product_choices()
 
 
 @bp.route("/purchases")
 @admin_required
 def purchases_list():
-    purchases = Purchase.query.order_by(Purchase.created_at.desc()).limit(200).all()
+    purchases = (
+        read_session().query(Purchase).order_by(Purchase.created_at.desc()).limit(200).all()
+    )
     return render_template("purchases/purchases_list.html", purchases=purchases)
 
 
@@ -134,18 +127,31 @@ def purchase_items_add(purchase_id: int):
         if form.quantity.data is None or form.quantity.data <= 0:
             flash("Miktar 0'dan büyük olmalı.", "danger")
             return redirect(url_for("purchases.purchases_detail", purchase_id=p.id))
+        if form.unit_cost.data is not None and form.unit_cost.data < 0:
+            flash("Birim maliyet negatif olamaz.", "danger")
+            return redirect(url_for("purchases.purchases_detail", purchase_id=p.id))
 
         existing = PurchaseItem.query.filter_by(
             purchase_id=p.id, product_id=form.product_id.data
         ).first()
 
         if existing:
-            existing.quantity = float(existing.quantity or 0) + float(form.quantity.data)
+            old_qty = float(existing.quantity or 0)
+            new_qty = float(form.quantity.data)
+            if form.unit_cost.data is not None:
+                if existing.unit_cost is None:
+                    existing.unit_cost = float(form.unit_cost.data)
+                else:
+                    existing.unit_cost = (
+                        old_qty * float(existing.unit_cost) + new_qty * float(form.unit_cost.data)
+                    ) / (old_qty + new_qty)
+            existing.quantity = old_qty + new_qty
         else:
             it = PurchaseItem(
                 purchase_id=p.id,
                 product_id=form.product_id.data,
                 quantity=float(form.quantity.data),
+                unit_cost=form.unit_cost.data,
             )
             db.session.add(it)
 
@@ -185,7 +191,12 @@ def purchases_receive(purchase_id: int):
         flash("Teslim almak için en az bir kalem eklemelisiniz.", "danger")
         return redirect(url_for("purchases.purchases_detail", purchase_id=p.id))
 
+    begin_immediate(db.session())
     try:
+        # Checked again under the write lock: a concurrent receive may have won.
+        if db.session.get(Purchase, p.id, populate_existing=True).status == Purchase.Status.RECEIVED.value:
+            raise StockError("Bu satın alma zaten teslim alınmış.")
+        items = PurchaseItem.query.filter_by(purchase_id=p.id).all()
         for it in items:
             req = StockMovementRequest(
                 product_id=it.product_id,
@@ -197,6 +208,7 @@ def purchases_receive(purchase_id: int):
                 reason=None,
                 note=f"purchase:{p.id}",
                 created_by=current_user.id,
+                unit_cost=it.unit_cost,
             )
             create_stock_movement(req, manage_transaction=False)
 
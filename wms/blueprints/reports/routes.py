@@ -1,14 +1,20 @@
 from __future__ import annotations
 
+import csv
+import io
 from datetime import date, timedelta
 
-from flask import render_template, request
+from flask import Response, flash, render_template, request
 
+from ...db_routing import read_session
 from ...extensions import db
-from ...models import Product, StockLevel, StockMovement
+from ...models import Product, StockLevel
 from ...security import admin_required
+from ...services.report_cache import daily_report
 from . import bp
 
+FORECAST_WEEKS = 4
+
 
 def _get_days(default_days: int = 7) -> int:
     try:
@@ -22,52 +28,15 @@ def _get_days(default_days: int = 7) -> int:
 @bp.route("/")
 @admin_required
 def index():
-    days = _get_days(7)
-    start_date = (date.today() - timedelta(days=days - 1)).isoformat()
-
-    daily = (
-        db.session.query(
-            db.func.date(StockMovement.created_at).label("d"),
-            db.func.count(StockMovement.id).label("cnt"),
-        )
-        .filter(db.func.date(StockMovement.created_at) >= start_date)
-        .group_by(db.func.date(StockMovement.created_at))
-        .order_by(db.func.date(StockMovement.created_at).asc())
-        .all()
-    )
+    # forecast_service pulls in numpy; keep it out of worker start-up.
+    from ...services.forecast_service import get_forecast_totals
 
-    top_in = (
-        db.session.query(
-            Product.name.label("name"),
-            Product.sku.label("sku"),
-            db.func.coalesce(db.func.sum(StockMovement.quantity), 0).label("qty"),
-        )
-        .join(StockMovement, StockMovement.product_id == Product.id)
-        .filter(db.func.date(StockMovement.created_at) >= start_date)
-        .filter(StockMovement.movement_type == "IN")
-        .group_by(Product.id)
-        .order_by(db.func.sum(StockMovement.quantity).desc())
-        .limit(10)
-        .all()
-    )
-
-    top_out = (
-        db.session.query(
-            Product.name.label("name"),
-            Product.sku.label("sku"),
-            db.func.coalesce(db.func.sum(StockMovement.quantity), 0).label("qty"),
-        )
-        .join(StockMovement, StockMovement.product_id == Product.id)
-        .filter(db.func.date(StockMovement.created_at) >= start_date)
-        .filter(StockMovement.movement_type == "OUT")
-        .group_by(Product.id)
-        .order_by(db.func.sum(StockMovement.quantity).desc())
-        .limit(10)
-        .all()
-    )
+    rs = read_session()
+    days = _get_days(7)
+    report = daily_report(days, session=rs)
 
     low_stock = (
-        db.session.query(
+        rs.query(
             Product.id.label("id"),
             Product.name.label("name"),
             Product.sku.label("sku"),
@@ -81,12 +50,138 @@ def index():
         .limit(50)
         .all()
     )
+    forecast = get_forecast_totals(
+        [p.id for p in low_stock], weeks=FORECAST_WEEKS, session=rs
+    )
 
     return render_template(
         "reports/reports_dashboard.html",
         days=days,
-        daily=daily,
-        top_in=top_in,
-        top_out=top_out,
+        daily=report.daily,
+        top_in=report.top_in,
+        top_out=report.top_out,
         low_stock=low_stock,
+        forecast=forecast,
+        forecast_weeks=FORECAST_WEEKS,
+    )
+
+
+@bp.route("/valuation")
+@admin_required
+def valuation():
+    from ...choices import warehouse_choices
+    from ...services.valuation_service import valuation_method, valuation_report
+
+    try:
+        warehouse_id = int(request.args.get("warehouse_id") or 0) or None
+    except ValueError:
+        warehouse_id = None
+
+    rows = valuation_report(warehouse_id, session=read_session())
+    return render_template(
+        "reports/valuation.html",
+        rows=rows,
+        total=sum(r.total_value for r in rows),
+        method=valuation_method(),
+        warehouses=warehouse_choices(),
+        warehouse_id=warehouse_id,
+    )
+
+
+EXPLORE_PAGE_LIMIT = 1000
+
+
+def _date_arg(name: str, default: date) -> date:
+    try:
+        return date.fromisoformat(request.args.get(name) or "")
+    except ValueError:
+        return default
+
+
+@bp.route("/explore")
+@admin_required
+def explore():
+    from ...choices import category_choices, warehouse_choices
+    from ...services.report_engine import DIMENSIONS, MEASURES, ReportError, ReportSpec, run_report
+
+    today = date.today()
+    start = _date_arg("from", today - timedelta(days=29))
+    end = _date_arg("to", today)
+    dimensions = tuple(d for d in request.args.getlist("dim") if d)
+    try:
+        warehouse_id = int(request.args.get("warehouse_id") or 0) or None
+    except ValueError:
+        warehouse_id = None
+    movement_type = request.args.get("movement_type") or None
+    category_id = request.args.get("category_id", type=int) or None
+
+    result = None
+    if "run" in request.args:
+        try:
+            spec = ReportSpec(
+                start,
+                end,
+                dimensions,
+                warehouse_id=warehouse_id,
+                movement_type=movement_type,
+                category_id=category_id,
+            )
+            result = run_report(spec, session=read_session())
+        except ReportError as e:
+            flash(str(e), "danger")
+
+    if result is not None and request.args.get("format") == "csv":
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(list(dimensions) + list(MEASURES))
+        writer.writerows(result.rows)
+        return Response(
+            buf.getvalue(),
+            mimetype="text/csv",
+            headers={"Content-Disposition": f"attachment; filename=rapor_{start}_{end}.csv"},
+        )
+
+    return render_template(
+        "reports/explore.html",
+        result=result,
+        rows=result.rows[:EXPLORE_PAGE_LIMIT] if result else [],
+        limit=EXPLORE_PAGE_LIMIT,
+        dimension_names=DIMENSIONS,
+        measure_names=MEASURES,
+        selected=dimensions,
+        start=start,
+        end=end,
+        warehouses=warehouse_choices(),
+        warehouse_id=warehouse_id,
+        categories=category_choices(),
+        category_id=category_id,
+        movement_type=movement_type,
+    )
+
+
+@bp.route("/categories")
+@admin_required
+def categories():
+    from ...choices import warehouse_choices
+    from ...services.category_service import category_movements, category_tree
+    from ...services.report_engine import refresh_movement_rollups
+
+    today = date.today()
+    start = _date_arg("from", today - timedelta(days=29))
+    end = _date_arg("to", today)
+    try:
+        warehouse_id = int(request.args.get("warehouse_id") or 0) or None
+    except ValueError:
+        warehouse_id = None
+
+    refresh_movement_rollups()
+    rs = read_session()
+    return render_template(
+        "reports/categories.html",
+        categories=category_tree(session=rs),
+        totals=category_movements(start, end, warehouse_id, session=rs),
+        start=start,
+        end=end,
+        warehouses=warehouse_choices(),
+        warehouse_id=warehouse_id,
     )
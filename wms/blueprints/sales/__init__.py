@@ -0,0 +1,5 @@
+from flask import Blueprint
+
+bp = Blueprint("sales", __name__, url_prefix="/admin")
+
+from . import routes  # noqa: F401,E402
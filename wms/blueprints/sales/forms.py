@@ -0,0 +1,17 @@
+from flask_wtf import FlaskForm
+from wtforms import FloatField, SelectField, SubmitField, TextAreaField
+from wtforms.validators import DataRequired, Optional
+
+
+class SalesOrderForm(FlaskForm):
+    customer_id = SelectField("Müşteri", coerce=int, validators=[DataRequired()])
+    warehouse_id = SelectField("Depo", coerce=int, validators=[DataRequired()])
+    shelf_id = SelectField("Raf (opsiyonel)", coerce=int, validators=[Optional()])
+    note = TextAreaField("Açıklama", validators=[Optional()])
+    submit = SubmitField("Kaydet")
+
+
+class SalesOrderItemForm(FlaskForm):
+    product_id = SelectField("Ürün", coerce=int, validators=[DataRequired()])
+    quantity = FloatField("Miktar", validators=[DataRequired()])
+    submit = SubmitField("Ekle")
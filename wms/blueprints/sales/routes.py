@@ -0,0 +1,225 @@
+from flask import flash, redirect, render_template, request, url_for
+from flask_login import current_user
+
+from ...choices import customer_choices, product_choices, shelf_choices, warehouse_choices
+from ...db_routing import read_session
+from ...extensions import db
+from ...models import Product, SalesOrder, SalesOrderItem
+from ...security import admin_required
+from ...services.sales_service import build_pick_list, ship_sales_orders
+from ...services.stock_service import StockError
+from . import bp
+from .forms import SalesOrderForm, SalesOrderItemForm
+
+
+def _populate_order_form_choices(form: SalesOrderForm) -> None:
+    form.customer_id.choices = customer_choices()
+    form.warehouse_id.choices = warehouse_choices()
+
+    selected_wh = None
+    try:
+        selected_wh = int(request.form.get("warehouse_id") or form.warehouse_id.data or 0)
+    except ValueError:
+        selected_wh = None
+
+    form.shelf_id.choices = [(0, "-")] + (shelf_choices(selected_wh) if selected_wh else [])
+
+
+def _populate_item_form_choices(form: SalesOrderItemForm) -> None:
+    form.product_id.choices = product_choices()
+
+
+def _selected_order_ids() -> list[int]:
+    values = request.form.getlist("order_ids") or request.args.getlist("order_ids")
+    ids: list[int] = []
+    for v in values:
+        try:
+            ids.append(int(v))
+        except ValueError:
+            continue
+    return list(dict.fromkeys(ids))
+
+
+@bp.route("/sales")
+@admin_required
+def sales_list():
+    orders = (
+        read_session().query(SalesOrder).order_by(SalesOrder.created_at.desc()).limit(200).all()
+    )
+    return render_template("sales/sales_list.html", orders=orders)
+
+
+@bp.route("/sales/new", methods=["GET", "POST"])
+@admin_required
+def sales_new():
+    form = SalesOrderForm()
+    _populate_order_form_choices(form)
+
+    if form.validate_on_submit():
+        shelf_id = form.shelf_id.data if form.shelf_id.data != 0 else None
+
+        o = SalesOrder(
+            customer_id=form.customer_id.data,
+            warehouse_id=form.warehouse_id.data,
+            shelf_id=shelf_id,
+            status=SalesOrder.Status.DRAFT.value,
+            note=form.note.data,
+            created_by=current_user.id,
+        )
+        db.session.add(o)
+        db.session.commit()
+
+        flash("Satış siparişi oluşturuldu.", "success")
+        return redirect(url_for("sales.sales_detail", order_id=o.id))
+
+    return render_template("sales/sales_form.html", form=form)
+
+
+@bp.route("/sales/<int:order_id>/edit", methods=["GET", "POST"])
+@admin_required
+def sales_edit(order_id: int):
+    o = SalesOrder.query.get_or_404(order_id)
+    if o.status == SalesOrder.Status.SHIPPED.value:
+        flash("Sevk edilmiş sipariş düzenlenemez.", "warning")
+        return redirect(url_for("sales.sales_detail", order_id=o.id))
+
+    form = SalesOrderForm(obj=o)
+    _populate_order_form_choices(form)
+
+    if form.validate_on_submit():
+        o.customer_id = form.customer_id.data
+        o.warehouse_id = form.warehouse_id.data
+        o.shelf_id = form.shelf_id.data if form.shelf_id.data != 0 else None
+        o.note = form.note.data
+        db.session.commit()
+
+        flash("Satış siparişi güncellendi.", "success")
+        return redirect(url_for("sales.sales_detail", order_id=o.id))
+
+    return render_template("sales/sales_form.html", form=form, order=o)
+
+
+@bp.route("/sales/<int:order_id>")
+@admin_required
+def sales_detail(order_id: int):
+    o = SalesOrder.query.get_or_404(order_id)
+    items = (
+        SalesOrderItem.query.filter_by(sales_order_id=o.id)
+        .join(Product, Product.id == SalesOrderItem.product_id)
+        .order_by(Product.name.asc())
+        .all()
+    )
+
+    item_form = SalesOrderItemForm()
+    _populate_item_form_choices(item_form)
+
+    return render_template(
+        "sales/sales_detail.html",
+        order=o,
+        items=items,
+        item_form=item_form,
+    )
+
+
+@bp.route("/sales/<int:order_id>/items/add", methods=["POST"])
+@admin_required
+def sales_items_add(order_id: int):
+    o = SalesOrder.query.get_or_404(order_id)
+    if o.status == SalesOrder.Status.SHIPPED.value:
+        flash("Sevk edilmiş sipariş değiştirilemez.", "warning")
+        return redirect(url_for("sales.sales_detail", order_id=o.id))
+
+    form = SalesOrderItemForm()
+    _populate_item_form_choices(form)
+
+    if form.validate_on_submit():
+        if form.quantity.data is None or form.quantity.data <= 0:
+            flash("Miktar 0'dan büyük olmalı.", "danger")
+            return redirect(url_for("sales.sales_detail", order_id=o.id))
+
+        existing = SalesOrderItem.query.filter_by(
+            sales_order_id=o.id, product_id=form.product_id.data
+        ).first()
+
+        if existing:
+            existing.quantity = float(existing.quantity or 0) + float(form.quantity.data)
+        else:
+            it = SalesOrderItem(
+                sales_order_id=o.id,
+                product_id=form.product_id.data,
+                quantity=float(form.quantity.data),
+            )
+            db.session.add(it)
+
+        db.session.commit()
+        flash("Kalem eklendi.", "success")
+
+    return redirect(url_for("sales.sales_detail", order_id=o.id))
+
+
+@bp.route("/sales/<int:order_id>/items/<int:item_id>/delete", methods=["POST"])
+@admin_required
+def sales_item_delete(order_id: int, item_id: int):
+    o = SalesOrder.query.get_or_404(order_id)
+    if o.status == SalesOrder.Status.SHIPPED.value:
+        flash("Sevk edilmiş sipariş değiştirilemez.", "warning")
+        return redirect(url_for("sales.sales_detail", order_id=o.id))
+
+    it = SalesOrderItem.query.filter_by(sales_order_id=o.id, id=item_id).first_or_404()
+    db.session.delete(it)
+    db.session.commit()
+
+    flash("Kalem silindi.", "success")
+    return redirect(url_for("sales.sales_detail", order_id=o.id))
+
+
+@bp.route("/sales/<int:order_id>/ship", methods=["POST"])
+@admin_required
+def sales_ship(order_id: int):
+    o = SalesOrder.query.get_or_404(order_id)
+
+    if o.status == SalesOrder.Status.SHIPPED.value:
+        flash("Bu sipariş zaten sevk edilmiş.", "warning")
+        return redirect(url_for("sales.sales_detail", order_id=o.id))
+
+    try:
+        ship_sales_orders([o.id], current_user.id)
+        flash("Sipariş sevk edildi ve stok çıkışları işlendi.", "success")
+    except StockError as e:
+        flash(str(e), "danger")
+
+    return redirect(url_for("sales.sales_detail", order_id=o.id))
+
+
+@bp.route("/sales/ship", methods=["POST"])
+@admin_required
+def sales_ship_bulk():
+    order_ids = _selected_order_ids()
+    if not order_ids:
+        flash("Sevk için en az bir sipariş seçmelisiniz.", "warning")
+        return redirect(url_for("sales.sales_list"))
+
+    try:
+        orders = ship_sales_orders(order_ids, current_user.id)
+        flash(f"{len(orders)} sipariş sevk edildi.", "success")
+    except StockError as e:
+        flash(str(e), "danger")
+
+    return redirect(url_for("sales.sales_list"))
+
+
+@bp.route("/sales/pick-list")
+@admin_required
+def sales_pick_list():
+    order_ids = _selected_order_ids()
+    if not order_ids:
+        flash("Toplama listesi için en az bir sipariş seçmelisiniz.", "warning")
+        return redirect(url_for("sales.sales_list"))
+
+    try:
+        rows = build_pick_list(order_ids, session=read_session())
+    except StockError as e:
+        flash(str(e), "danger")
+        return redirect(url_for("sales.sales_list"))
+
+    return render_template("sales/pick_list.html", rows=rows, order_ids=order_ids)
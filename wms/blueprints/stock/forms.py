@@ -1,5 +1,14 @@
 from flask_wtf import FlaskForm
-from wtforms import FloatField, SelectField, StringField, SubmitField, TextAreaField
+from flask_wtf.file import FileField
+from wtforms import (
+    BooleanField,
+    FloatField,
+    HiddenField,
+    SelectField,
+    StringField,
+    SubmitField,
+    TextAreaField,
+)
 from wtforms.validators import DataRequired, Optional
 
 
@@ -15,6 +24,7 @@ class StockMovementForm(FlaskForm):
     )
 
     quantity = FloatField("Miktar", validators=[DataRequired()])
+    unit_cost = FloatField("Birim Maliyet (giriş için, opsiyonel)", validators=[Optional()])
 
     reference_type = SelectField(
         "Referans",
@@ -29,4 +39,30 @@ class StockMovementForm(FlaskForm):
 
     reason = StringField("Sebep (ADJUST için zorunlu)", validators=[Optional()])
     note = TextAreaField("Açıklama", validators=[Optional()])
+    # Generated per form render; a resubmitted POST reuses it and is not booked twice.
+    idempotency_key = HiddenField(validators=[Optional()])
     submit = SubmitField("Kaydet")
+
+
+class ReservationForm(FlaskForm):
+    product_id = SelectField("Ürün", coerce=int, validators=[DataRequired()])
+    warehouse_id = SelectField("Depo", coerce=int, validators=[DataRequired()])
+    customer_id = SelectField("Müşteri", coerce=int, validators=[DataRequired()])
+    quantity = FloatField("Miktar", validators=[DataRequired()])
+    note = TextAreaField("Açıklama", validators=[Optional()])
+    submit = SubmitField("Rezerve Et")
+
+
+class CycleCountForm(FlaskForm):
+    warehouse_id = SelectField("Depo", coerce=int, validators=[DataRequired()])
+    shelf_id = SelectField("Raf (boşsa tüm depo)", coerce=int, validators=[Optional()])
+    reason = StringField("Sebep", validators=[DataRequired()])
+    note = TextAreaField("Açıklama", validators=[Optional()])
+    submit = SubmitField("Sayımı Başlat")
+
+
+class CountSubmitForm(FlaskForm):
+    counts = TextAreaField("Okutulan / yapıştırılan satırlar", validators=[Optional()])
+    csv_file = FileField("CSV dosyası", validators=[Optional()])
+    accumulate = BooleanField("Önceki sayıma ekle (çoklu okutma)")
+    submit = SubmitField("Sayımı Kaydet")
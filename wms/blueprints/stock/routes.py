@@ -1,42 +1,202 @@
-from flask import flash, jsonify, redirect, render_template, request, url_for
+import csv
+import io
+import math
+import uuid
+from datetime import datetime, timedelta
+
+from flask import Response, current_app, flash, jsonify, redirect, render_template, request, url_for
 from flask_login import current_user
+from sqlalchemy.orm import contains_eager, joinedload
 
+from ...choices import customer_choices, product_choices, shelf_choices, warehouse_choices
+from ...db_routing import read_session
 from ...extensions import db
-from ...models import Product, Shelf, StockLevel, StockMovement, User, Warehouse
-from ...security import staff_allowed
-from ...services.stock_service import StockError, StockMovementRequest, create_stock_movement
+from ...responses import stream_page
+from ...models import (
+    CycleCount,
+    CycleCountLine,
+    Product,
+    Shelf,
+    StockLevel,
+    StockMovement,
+    StockMovementArchive,
+    StockReservation,
+    User,
+    Warehouse,
+)
+from ...security import admin_required, staff_allowed
+from ...services.category_service import category_stock, category_tree, subtree_ids
+from ...services.count_service import (
+    cancel_cycle_count,
+    count_sheet,
+    count_summary,
+    count_variances,
+    open_cycle_count,
+    post_cycle_count,
+    submit_counts,
+)
+from ...services.group_commit import book_movement
+from ...services.history_service import stock_history
+from ...services.matrix_service import get_stock_matrix
+from ...services.search_service import MAX_RESULTS, SearchError, search_movements
+from ...services.stock_read_model import get_stock_read_model, query_levels
+from ...services.stock_service import (
+    StockError,
+    StockMovementRequest,
+    available_to_promise,
+    consume_reservation,
+    create_stock_movements_batch,
+    release_reservation,
+    reserve_stock,
+)
 from . import bp
-from .forms import StockMovementForm
+from .forms import CountSubmitForm, CycleCountForm, ReservationForm, StockMovementForm
 
 
 @bp.route("")
 @bp.route("/")
 @staff_allowed
 def stock_list():
-    levels = (
-        db.session.query(StockLevel)
+    q = (
+        read_session()
+        .query(StockLevel)
         .join(Product, Product.id == StockLevel.product_id)
         .join(Warehouse, Warehouse.id == StockLevel.warehouse_id)
+    )
+    product_id = request.args.get("product_id", type=int)
+    warehouse_id = request.args.get("warehouse_id", type=int)
+    category_id = request.args.get("category_id", type=int)
+    if product_id:
+        q = q.filter(StockLevel.product_id == product_id)
+    if warehouse_id:
+        q = q.filter(StockLevel.warehouse_id == warehouse_id)
+    if category_id:
+        q = q.filter(Product.category_id.in_(subtree_ids(category_id)))
+
+    levels = (
+        q.options(
+            contains_eager(StockLevel.product),
+            contains_eager(StockLevel.warehouse),
+            joinedload(StockLevel.shelf),
+        )
         .order_by(Product.name.asc(), Warehouse.name.asc())
         .all()
     )
-    return render_template("stock/stock_list.html", levels=levels)
+    return stream_page("stock/stock_list.html", levels=levels)
+
+
+@bp.route("/categories")
+@staff_allowed
+def stock_by_category():
+    warehouse_id = request.args.get("warehouse_id", type=int) or None
+    rs = read_session()
+    return render_template(
+        "stock/stock_categories.html",
+        categories=category_tree(session=rs),
+        totals=category_stock(warehouse_id, session=rs),
+        warehouses=warehouse_choices(),
+        warehouse_id=warehouse_id,
+    )
+
+
+@bp.route("/matrix")
+@staff_allowed
+def stock_matrix():
+    matrix = get_stock_matrix(read_session())
+
+    if request.args.get("format") == "csv":
+        def generate():
+            buf = io.StringIO()
+            writer = csv.writer(buf)
+            writer.writerow(["SKU", "Ürün"] + [name for _, name in matrix.warehouses] + ["Toplam"])
+            for i, (_, name, sku, cells, total) in enumerate(matrix.rows(), 1):
+                writer.writerow([sku, name] + [f"{q:.2f}" for q in cells] + [f"{total:.2f}"])
+                if i % 1000 == 0:
+                    yield buf.getvalue()
+                    buf.seek(0)
+                    buf.truncate()
+            yield buf.getvalue()
+
+        return Response(
+            generate(),
+            mimetype="text/csv",
+            headers={"Content-Disposition": "attachment; filename=stok_matrisi.csv"},
+        )
+
+    page = max(request.args.get("page", 1, type=int), 1)
+    per_page = min(max(request.args.get("per_page", 100, type=int), 1), 500)
+    pages = max((len(matrix) + per_page - 1) // per_page, 1)
+    page = min(page, pages)
+
+    return render_template(
+        "stock/stock_matrix.html",
+        warehouses=matrix.warehouses,
+        rows=matrix.page(page, per_page),
+        total_rows=len(matrix),
+        page=page,
+        pages=pages,
+        per_page=per_page,
+    )
 
 
 @bp.route("/movements")
 @staff_allowed
 def movements_list():
+    archived = request.args.get("archive") == "1"
+    model = StockMovementArchive if archived else StockMovement
+    q = (request.args.get("q") or "").strip()
+    warehouse_id = request.args.get("warehouse_id", type=int) or None
+    try:
+        start, end = _datetime_arg("from"), _datetime_arg("to")
+    except StockError as e:
+        flash(str(e), "danger")
+        start = end = None
+    if end is not None and len(request.args["to"]) == 10:
+        # A bare date includes the whole day.
+        end += timedelta(days=1)
+
     movements = (
-        db.session.query(StockMovement)
-        .join(Product, Product.id == StockMovement.product_id)
-        .join(Warehouse, Warehouse.id == StockMovement.warehouse_id)
-        .outerjoin(Shelf, Shelf.id == StockMovement.shelf_id)
-        .outerjoin(User, User.id == StockMovement.created_by)
-        .order_by(StockMovement.created_at.desc())
-        .limit(200)
-        .all()
+        read_session()
+        .query(model)
+        .join(Product, Product.id == model.product_id)
+        .join(Warehouse, Warehouse.id == model.warehouse_id)
+        .outerjoin(Shelf, Shelf.id == model.shelf_id)
+        .outerjoin(User, User.id == model.created_by)
+        .options(
+            contains_eager(model.product),
+            contains_eager(model.warehouse),
+            contains_eager(model.shelf),
+            contains_eager(model.user),
+        )
+    )
+    if q:
+        try:
+            ids = search_movements(
+                q, archived=archived, start=start, end=end, warehouse_id=warehouse_id, session=read_session()
+            )
+        except SearchError as e:
+            flash(str(e), "danger")
+            ids = []
+        movements = movements.filter(model.id.in_(ids))
+    else:
+        if start is not None:
+            movements = movements.filter(model.created_at >= start)
+        if end is not None:
+            movements = movements.filter(model.created_at < end)
+        if warehouse_id is not None:
+            movements = movements.filter(model.warehouse_id == warehouse_id)
+
+    movements = movements.order_by(model.created_at.desc()).limit(MAX_RESULTS).all()
+    return stream_page(
+        "stock/movements_list.html",
+        movements=movements,
+        archived=archived,
+        q=q,
+        warehouses=warehouse_choices(),
+        warehouse_id=warehouse_id,
+        date_from=request.args.get("from", ""),
+        date_to=request.args.get("to", ""),
     )
-    return render_template("stock/movements_list.html", movements=movements)
 
 
 @bp.route("/api/shelves")
@@ -50,8 +210,7 @@ def api_shelves():
     if not warehouse_id:
         return jsonify([])
 
-    shelves = Shelf.query.filter_by(warehouse_id=warehouse_id).order_by(Shelf.code.asc()).all()
-    return jsonify([{"id": s.id, "code": s.code} for s in shelves])
+    return jsonify([{"id": sid, "code": code} for sid, code in shelf_choices(warehouse_id)])
 
 
 @bp.route("/movements/new", methods=["GET", "POST"])
@@ -62,14 +221,8 @@ def movements_new():
     if not current_user.is_admin:
         form.movement_type.choices = [("IN", "Giriş"), ("OUT", "Çıkış")]
 
-    form.product_id.choices = [
-        (p.id, f"{p.name} ({p.sku})")
-        for p in Product.query.filter_by(is_active=True).order_by(Product.name.asc()).all()
-    ]
-    form.warehouse_id.choices = [
-        (w.id, w.name)
-        for w in Warehouse.query.filter_by(is_active=True).order_by(Warehouse.name.asc()).all()
-    ]
+    form.product_id.choices = product_choices()
+    form.warehouse_id.choices = warehouse_choices()
 
     selected_wh = None
     try:
@@ -77,10 +230,7 @@ def movements_new():
     except ValueError:
         selected_wh = None
 
-    shelves = []
-    if selected_wh:
-        shelves = Shelf.query.filter_by(warehouse_id=selected_wh).order_by(Shelf.code.asc()).all()
-    form.shelf_id.choices = [(0, "-")] + [(s.id, s.code) for s in shelves]
+    form.shelf_id.choices = [(0, "-")] + (shelf_choices(selected_wh) if selected_wh else [])
 
     if form.validate_on_submit():
         if form.movement_type.data == "ADJUST":
@@ -102,15 +252,469 @@ def movements_new():
             reason=form.reason.data,
             note=form.note.data,
             created_by=current_user.id,
+            unit_cost=form.unit_cost.data if form.movement_type.data == "IN" else None,
         )
 
         try:
-            create_stock_movement(req)
+            _, replayed = book_movement(req, form.idempotency_key.data)
         except StockError as e:
             flash(str(e), "danger")
             return render_template("stock/movement_form.html", form=form)
 
-        flash("Stok hareketi kaydedildi.", "success")
+        if replayed:
+            flash("Bu stok hareketi zaten kaydedilmişti.", "info")
+        else:
+            flash("Stok hareketi kaydedildi.", "success")
         return redirect(url_for("stock.stock_list"))
 
+    if not form.idempotency_key.data:
+        form.idempotency_key.data = uuid.uuid4().hex
     return render_template("stock/movement_form.html", form=form)
+
+
+def _movement_json(m) -> dict:
+    return {
+        "id": m.id,
+        "product_id": m.product_id,
+        "warehouse_id": m.warehouse_id,
+        "shelf_id": m.shelf_id,
+        "movement_type": m.movement_type,
+        "quantity": m.quantity,
+        "unit_cost": m.unit_cost,
+        "reference_type": m.reference_type,
+        "reason": m.reason,
+        "note": m.note,
+        "created_by": m.created_by,
+        "created_at": m.created_at.isoformat() if m.created_at else None,
+    }
+
+
+def _movement_request_from_json(data: dict) -> StockMovementRequest:
+    try:
+        product_id = int(data["product_id"])
+        warehouse_id = int(data["warehouse_id"])
+        shelf_id = int(data["shelf_id"]) if data.get("shelf_id") else None
+        quantity = float(data["quantity"])
+        unit_cost = float(data["unit_cost"]) if data.get("unit_cost") is not None else None
+    except (KeyError, TypeError, ValueError) as e:
+        raise StockError("Geçersiz istek.") from e
+    # float() accepts "NaN" and "inf".
+    if not math.isfinite(quantity) or (unit_cost is not None and not math.isfinite(unit_cost)):
+        raise StockError("Miktar ve birim maliyet sonlu bir sayı olmalıdır.")
+    return StockMovementRequest(
+        product_id=product_id,
+        warehouse_id=warehouse_id,
+        shelf_id=shelf_id,
+        movement_type=str(data.get("movement_type") or ""),
+        quantity=quantity,
+        reference_type=str(data.get("reference_type") or ""),
+        reason=data.get("reason"),
+        note=data.get("note"),
+        created_by=current_user.id,
+        unit_cost=unit_cost,
+    )
+
+
+@bp.route("/api/movements", methods=["POST"])
+@staff_allowed
+def api_movements_create():
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({"error": "İstek gövdesi bir JSON nesnesi olmalıdır."}), 400
+    key = request.headers.get("Idempotency-Key") or data.get("idempotency_key")
+    if key is not None and not isinstance(key, str):
+        return jsonify({"error": "İşlem anahtarı metin olmalıdır."}), 400
+
+    try:
+        req = _movement_request_from_json(data)
+        m, replayed = book_movement(req, key)
+    except StockError as e:
+        return jsonify({"error": str(e)}), 400
+
+    resp = jsonify(_movement_json(m))
+    resp.status_code = 200 if replayed else 201
+    if replayed:
+        resp.headers["Idempotent-Replayed"] = "true"
+    return resp
+
+
+@bp.route("/api/movements/batch", methods=["POST"])
+@staff_allowed
+def api_movements_batch():
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({"error": "İstek gövdesi bir JSON nesnesi olmalıdır."}), 400
+    lines = data.get("movements")
+    if not isinstance(lines, list) or not lines:
+        return jsonify({"error": "Hareket listesi boş."}), 400
+    max_lines = current_app.config.get("SYNC_BATCH_MAX_LINES", 5000)
+    if len(lines) > max_lines:
+        return jsonify({"error": f"En fazla {max_lines} satır gönderilebilir."}), 400
+    stop_on_error = data.get("on_error", "skip") == "stop"
+
+    results: list[dict | None] = [None] * len(lines)
+    reqs: list[StockMovementRequest] = []
+    keys: list[str | None] = []
+    positions: list[int] = []
+    for i, line in enumerate(lines):
+        try:
+            if not isinstance(line, dict):
+                raise StockError("Satır bir JSON nesnesi olmalıdır.")
+            key = line.get("idempotency_key")
+            if key is not None and not isinstance(key, str):
+                raise StockError("İşlem anahtarı metin olmalıdır.")
+            reqs.append(_movement_request_from_json(line))
+        except StockError as e:
+            results[i] = {"index": i, "status": "error", "error": str(e)}
+            if stop_on_error:
+                break
+            continue
+        keys.append(key)
+        positions.append(i)
+
+    try:
+        line_results = (
+            create_stock_movements_batch(reqs, keys, stop_on_error=stop_on_error) if reqs else []
+        )
+    except StockError as e:
+        return jsonify({"error": str(e)}), 400
+
+    for pos, r in zip(positions, line_results):
+        item = {"index": pos, "status": r.status}
+        if r.movement is not None:
+            item["id"] = r.movement.id
+        if r.error:
+            item["error"] = r.error
+        results[pos] = item
+    first_error = next(
+        (r["index"] for r in results if r is not None and r["status"] == "error"), len(results)
+    )
+    for i, r in enumerate(results):
+        if r is None or (stop_on_error and i > first_error):
+            results[i] = {"index": i, "status": "not_processed"}
+
+    return jsonify(
+        {
+            "ok": sum(1 for r in results if r["status"] in {"ok", "replayed"}),
+            "errors": sum(1 for r in results if r["status"] == "error"),
+            "results": results,
+        }
+    )
+
+
+@bp.route("/api/atp")
+@staff_allowed
+def api_atp():
+    product_id = request.args.get("product_id", type=int)
+    warehouse_id = request.args.get("warehouse_id", type=int)
+    if not product_id:
+        return jsonify({"error": "product_id zorunludur."}), 400
+    return jsonify(
+        {
+            "product_id": product_id,
+            "warehouse_id": warehouse_id,
+            "available": available_to_promise(product_id, warehouse_id),
+        }
+    )
+
+
+@bp.route("/api/levels")
+@staff_allowed
+def api_levels():
+    product_id = request.args.get("product_id", type=int)
+    warehouse_id = request.args.get("warehouse_id", type=int)
+    shelf_id = request.args.get("shelf_id", type=int)
+    code = (request.args.get("code") or "").strip()
+    if code:
+        product_id = (
+            read_session()
+            .query(Product.id)
+            .filter(db.or_(Product.sku == code, Product.barcode == code))
+            .order_by(Product.id.asc())
+            .limit(1)
+            .scalar()
+        )
+        if product_id is None:
+            return jsonify({"error": "Ürün bulunamadı."}), 404
+    if not product_id and not warehouse_id:
+        return jsonify({"error": "product_id, code veya warehouse_id zorunludur."}), 400
+
+    # seq: latest movement id the quantities reflect; pollers can skip
+    # responses whose seq they have already seen.
+    model = get_stock_read_model()
+    if model is not None:
+        levels, seq = model.levels(product_id, warehouse_id)
+    else:
+        levels, seq = query_levels(read_session(), product_id, warehouse_id)
+    if shelf_id:
+        levels = [item for item in levels if item[0][2] == shelf_id]
+    return jsonify(
+        {
+            "seq": seq,
+            "levels": [
+                {"product_id": p, "warehouse_id": w, "shelf_id": s, "quantity": qty}
+                for (p, w, s), qty in levels
+            ],
+        }
+    )
+
+
+def _datetime_arg(name: str) -> datetime | None:
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError as e:
+        raise StockError(f"Geçersiz tarih: {name}") from e
+
+
+@bp.route("/api/history")
+@staff_allowed
+def api_history():
+    product_id = request.args.get("product_id", type=int)
+    if not product_id:
+        return jsonify({"error": "product_id zorunludur."}), 400
+    try:
+        start, end = _datetime_arg("from"), _datetime_arg("to")
+    except StockError as e:
+        return jsonify({"error": str(e)}), 400
+
+    h = stock_history(
+        product_id,
+        request.args.get("warehouse_id", type=int),
+        start=start,
+        end=end,
+        points=request.args.get("points", 300, type=int),
+        session=read_session(),
+    )
+    return jsonify(
+        {
+            "product_id": h.product_id,
+            "warehouse_id": h.warehouse_id,
+            "from": h.start.isoformat() if h.start else None,
+            "to": h.end.isoformat() if h.end else None,
+            "opening": h.opening,
+            "closing": h.closing,
+            "movements": h.movements,
+            "points": [
+                {"t": b.start.isoformat(), "min": b.min, "max": b.max, "last": b.last, "n": b.movements}
+                for b in h.buckets
+            ],
+        }
+    )
+
+
+@bp.route("/reservations")
+@staff_allowed
+def reservations_list():
+    reservations = (
+        read_session()
+        .query(StockReservation)
+        .order_by(StockReservation.created_at.desc())
+        .limit(200)
+        .all()
+    )
+    warehouse_ids = {r.warehouse_id for r in reservations if r.status == "OPEN"}
+    shelves_by_wh: dict[int, list[Shelf]] = {}
+    if warehouse_ids:
+        for shelf in (
+            read_session()
+            .query(Shelf)
+            .filter(Shelf.warehouse_id.in_(warehouse_ids))
+            .order_by(Shelf.code.asc())
+            .all()
+        ):
+            shelves_by_wh.setdefault(shelf.warehouse_id, []).append(shelf)
+    return render_template(
+        "stock/reservations_list.html", reservations=reservations, shelves_by_wh=shelves_by_wh
+    )
+
+
+@bp.route("/reservations/new", methods=["GET", "POST"])
+@staff_allowed
+def reservations_new():
+    form = ReservationForm()
+    form.product_id.choices = product_choices()
+    form.warehouse_id.choices = warehouse_choices()
+    form.customer_id.choices = customer_choices()
+
+    if form.validate_on_submit():
+        try:
+            reserve_stock(
+                product_id=form.product_id.data,
+                warehouse_id=form.warehouse_id.data,
+                customer_id=form.customer_id.data,
+                quantity=form.quantity.data,
+                created_by=current_user.id,
+                note=form.note.data,
+            )
+        except StockError as e:
+            flash(str(e), "danger")
+            return render_template("stock/reservation_form.html", form=form)
+
+        flash("Rezervasyon oluşturuldu.", "success")
+        return redirect(url_for("stock.reservations_list"))
+
+    return render_template("stock/reservation_form.html", form=form)
+
+
+@bp.route("/reservations/<int:reservation_id>/release", methods=["POST"])
+@staff_allowed
+def reservations_release(reservation_id: int):
+    try:
+        release_reservation(reservation_id)
+        flash("Rezervasyon serbest bırakıldı.", "success")
+    except StockError as e:
+        flash(str(e), "danger")
+    return redirect(url_for("stock.reservations_list"))
+
+
+@bp.route("/reservations/<int:reservation_id>/consume", methods=["POST"])
+@staff_allowed
+def reservations_consume(reservation_id: int):
+    try:
+        shelf_id = int(request.form.get("shelf_id") or 0) or None
+    except ValueError:
+        shelf_id = None
+
+    try:
+        consume_reservation(reservation_id, created_by=current_user.id, shelf_id=shelf_id)
+        flash("Rezervasyon sevk edildi, stok çıkışı işlendi.", "success")
+    except StockError as e:
+        flash(str(e), "danger")
+    return redirect(url_for("stock.reservations_list"))
+
+
+VARIANCE_PAGE_LIMIT = 500
+
+
+@bp.route("/counts")
+@staff_allowed
+def counts_list():
+    rs = read_session()
+    counts = rs.query(CycleCount).order_by(CycleCount.created_at.desc()).limit(200).all()
+    line_counts: dict[int, int] = {}
+    if counts:
+        line_counts = dict(
+            rs.query(CycleCountLine.cycle_count_id, db.func.count(CycleCountLine.id))
+            .filter(CycleCountLine.cycle_count_id.in_([c.id for c in counts]))
+            .group_by(CycleCountLine.cycle_count_id)
+            .all()
+        )
+    return render_template("stock/counts_list.html", counts=counts, line_counts=line_counts)
+
+
+@bp.route("/counts/new", methods=["GET", "POST"])
+@admin_required
+def counts_new():
+    form = CycleCountForm()
+    form.warehouse_id.choices = warehouse_choices()
+
+    try:
+        selected_wh = int(request.form.get("warehouse_id") or form.warehouse_id.data or 0)
+    except ValueError:
+        selected_wh = None
+    form.shelf_id.choices = [(0, "-")] + (shelf_choices(selected_wh) if selected_wh else [])
+
+    if form.validate_on_submit():
+        try:
+            count = open_cycle_count(
+                form.warehouse_id.data,
+                form.shelf_id.data or None,
+                form.reason.data,
+                current_user.id,
+                note=form.note.data,
+            )
+        except StockError as e:
+            flash(str(e), "danger")
+            return render_template("stock/count_form.html", form=form)
+
+        flash("Sayım başlatıldı, beklenen miktarlar donduruldu.", "success")
+        return redirect(url_for("stock.counts_detail", count_id=count.id))
+
+    return render_template("stock/count_form.html", form=form)
+
+
+@bp.route("/counts/<int:count_id>")
+@staff_allowed
+def counts_detail(count_id: int):
+    count = CycleCount.query.get_or_404(count_id)
+    summary = count_summary(count.id)
+    variances = (
+        count_variances(count, limit=VARIANCE_PAGE_LIMIT) if current_user.is_admin else []
+    )
+    return render_template(
+        "stock/count_detail.html",
+        count=count,
+        summary=summary,
+        variances=variances,
+        variance_limit=VARIANCE_PAGE_LIMIT,
+        form=CountSubmitForm(),
+    )
+
+
+@bp.route("/counts/<int:count_id>/submit", methods=["POST"])
+@staff_allowed
+def counts_submit(count_id: int):
+    form = CountSubmitForm()
+    if form.validate_on_submit():
+        text = form.counts.data or ""
+        upload = form.csv_file.data
+        if upload:
+            text = upload.read().decode("utf-8-sig", errors="replace") + "\n" + text
+        try:
+            n = submit_counts(count_id, text, accumulate=form.accumulate.data)
+            flash(f"{n} lokasyon için sayım kaydedildi.", "success")
+        except StockError as e:
+            flash(str(e), "danger")
+    return redirect(url_for("stock.counts_detail", count_id=count_id))
+
+
+@bp.route("/counts/<int:count_id>/sheet.csv")
+@staff_allowed
+def counts_sheet(count_id: int):
+    count = CycleCount.query.get_or_404(count_id)
+    rows = count_sheet(count, session=read_session())
+
+    def generate():
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(["sku", "quantity", "shelf"])
+        for i, (sku, shelf_code) in enumerate(rows, 1):
+            writer.writerow([sku, "", shelf_code or ""])
+            if i % 1000 == 0:
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+        yield buf.getvalue()
+
+    return Response(
+        generate(),
+        mimetype="text/csv",
+        headers={"Content-Disposition": f"attachment; filename=sayim_{count.id}.csv"},
+    )
+
+
+@bp.route("/counts/<int:count_id>/post", methods=["POST"])
+@admin_required
+def counts_post(count_id: int):
+    try:
+        n = post_cycle_count(
+            count_id, current_user.id, uncounted_as_zero=request.form.get("uncounted_as_zero") == "1"
+        )
+        flash(f"Sayım işlendi, {n} düzeltme hareketi oluşturuldu.", "success")
+    except StockError as e:
+        flash(str(e), "danger")
+    return redirect(url_for("stock.counts_detail", count_id=count_id))
+
+
+@bp.route("/counts/<int:count_id>/cancel", methods=["POST"])
+@admin_required
+def counts_cancel(count_id: int):
+    try:
+        cancel_cycle_count(count_id)
+        flash("Sayım iptal edildi.", "success")
+    except StockError as e:
+        flash(str(e), "danger")
+    return redirect(url_for("stock.counts_detail", count_id=count_id))
@@ -1,5 +1,8 @@
 from flask import flash, redirect, render_template, url_for
 
+from ...caching import bump_cache_version
+from ...choices import SUPPLIERS
+from ...db_routing import read_session
 from ...extensions import db
 from ...models import Supplier
 from ...security import admin_required
@@ -10,7 +13,7 @@ from .forms import SupplierForm
 @bp.route("/suppliers")
 @admin_required
 def suppliers_list():
-    suppliers = Supplier.query.order_by(Supplier.name.asc()).all()
+    suppliers = read_session().query(Supplier).order_by(Supplier.name.asc()).all()
     return render_template("suppliers/suppliers_list.html", suppliers=suppliers)
 
 
@@ -34,6 +37,7 @@ def suppliers_new():
             is_active=bool(form.is_active.data),
         )
         db.session.add(s)
+        bump_cache_version(SUPPLIERS)
         db.session.commit()
 
         flash("Tedarikçi oluşturuldu.", "success")
@@ -65,6 +69,7 @@ def suppliers_edit(supplier_id: int):
         s.address = form.address.data
         s.is_active = bool(form.is_active.data)
 
+        bump_cache_version(SUPPLIERS)
         db.session.commit()
         flash("Tedarikçi güncellendi.", "success")
         return redirect(url_for("suppliers.suppliers_list"))
@@ -77,6 +82,7 @@ def suppliers_edit(supplier_id: int):
 def suppliers_toggle(supplier_id: int):
     s = Supplier.query.get_or_404(supplier_id)
     s.is_active = not s.is_active
+    bump_cache_version(SUPPLIERS)
     db.session.commit()
     flash("Tedarikçi durumu güncellendi.", "success")
     return redirect(url_for("suppliers.suppliers_list"))
@@ -1,5 +1,8 @@
 from flask import flash, redirect, render_template, url_for
 
+from ...caching import bump_cache_version
+from ...choices import UNITS
+from ...db_routing import read_session
 from ...extensions import db
 from ...models import Unit
 from ...security import admin_required
@@ -10,7 +13,7 @@ from .forms import UnitForm
 @bp.route("/units")
 @admin_required
 def units_list():
-    units = Unit.query.order_by(Unit.name.asc()).all()
+    units = read_session().query(Unit).order_by(Unit.name.asc()).all()
     return render_template("units/units_list.html", units=units)
 
 
@@ -32,6 +35,7 @@ def units_new():
 
         u = Unit(name=name, short_code=short_code, is_active=bool(form.is_active.data))
         db.session.add(u)
+        bump_cache_version(UNITS)
         db.session.commit()
 
         flash("Birim oluşturuldu.", "success")
@@ -45,6 +49,7 @@ def units_new():
 def units_toggle(unit_id: int):
     u = Unit.query.get_or_404(unit_id)
     u.is_active = not u.is_active
+    bump_cache_version(UNITS)
     db.session.commit()
     flash("Birim durumu güncellendi.", "success")
     return redirect(url_for("units.units_list"))
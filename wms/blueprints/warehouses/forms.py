@@ -1,6 +1,6 @@
 from flask_wtf import FlaskForm
-from wtforms import BooleanField, StringField, SubmitField, TextAreaField
-from wtforms.validators import DataRequired, Length, Optional
+from wtforms import BooleanField, IntegerField, StringField, SubmitField, TextAreaField
+from wtforms.validators import DataRequired, Length, NumberRange, Optional
 
 
 class WarehouseForm(FlaskForm):
@@ -13,4 +13,7 @@ class WarehouseForm(FlaskForm):
 class ShelfForm(FlaskForm):
     code = StringField("Kod", validators=[DataRequired(), Length(max=50)])
     description = TextAreaField("Açıklama", validators=[Optional()])
+    aisle = IntegerField("Koridor", validators=[Optional(), NumberRange(min=0)])
+    bay = IntegerField("Bölme", validators=[Optional(), NumberRange(min=0)])
+    level = IntegerField("Kat", validators=[Optional(), NumberRange(min=0)])
     submit = SubmitField("Kaydet")
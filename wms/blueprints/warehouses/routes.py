@@ -1,8 +1,24 @@
 from flask import flash, redirect, render_template, url_for
+from sqlalchemy.exc import IntegrityError
 
+from ...caching import bump_cache_version
+from ...choices import SHELVES, WAREHOUSES
+from ...db_routing import read_session
 from ...extensions import db
-from ...models import Shelf, StockLevel, StockMovement, Warehouse
+from ...models import (
+    CycleCount,
+    CycleCountLine,
+    Purchase,
+    SalesOrder,
+    Shelf,
+    StockLevel,
+    StockMovement,
+    StockMovementArchive,
+    StockOpeningBalance,
+    Warehouse,
+)
 from ...security import admin_required
+from ...services.route_service import bump_layout_version
 from . import bp
 from .forms import ShelfForm, WarehouseForm
 
@@ -10,7 +26,7 @@ from .forms import ShelfForm, WarehouseForm
 @bp.route("/warehouses")
 @admin_required
 def warehouses_list():
-    warehouses = Warehouse.query.order_by(Warehouse.name.asc()).all()
+    warehouses = read_session().query(Warehouse).order_by(Warehouse.name.asc()).all()
     return render_template("warehouses/warehouses_list.html", warehouses=warehouses)
 
 
@@ -27,6 +43,7 @@ def warehouses_new():
 
         w = Warehouse(name=name, address=form.address.data, is_active=bool(form.is_active.data))
         db.session.add(w)
+        bump_cache_version(WAREHOUSES)
         db.session.commit()
 
         flash("Depo oluşturuldu.", "success")
@@ -55,6 +72,7 @@ def warehouses_edit(warehouse_id: int):
         w.name = name
         w.address = form.address.data
         w.is_active = bool(form.is_active.data)
+        bump_cache_version(WAREHOUSES)
         db.session.commit()
 
         flash("Depo güncellendi.", "success")
@@ -68,6 +86,7 @@ def warehouses_edit(warehouse_id: int):
 def warehouses_toggle(warehouse_id: int):
     w = Warehouse.query.get_or_404(warehouse_id)
     w.is_active = not w.is_active
+    bump_cache_version(WAREHOUSES)
     db.session.commit()
     flash("Depo durumu güncellendi.", "success")
     return redirect(url_for("warehouses.warehouses_list"))
@@ -77,7 +96,13 @@ def warehouses_toggle(warehouse_id: int):
 @admin_required
 def shelves_list(warehouse_id: int):
     w = Warehouse.query.get_or_404(warehouse_id)
-    shelves = Shelf.query.filter_by(warehouse_id=w.id).order_by(Shelf.code.asc()).all()
+    shelves = (
+        read_session()
+        .query(Shelf)
+        .filter_by(warehouse_id=w.id)
+        .order_by(Shelf.code.asc())
+        .all()
+    )
     return render_template("warehouses/shelves_list.html", warehouse=w, shelves=shelves)
 
 
@@ -94,8 +119,17 @@ def shelves_new(warehouse_id: int):
             flash("Bu raf kodu bu depoda zaten mevcut.", "warning")
             return render_template("warehouses/shelf_form.html", form=form, warehouse=w)
 
-        s = Shelf(warehouse_id=w.id, code=code, description=form.description.data)
+        s = Shelf(
+            warehouse_id=w.id,
+            code=code,
+            description=form.description.data,
+            aisle=form.aisle.data,
+            bay=form.bay.data,
+            level=form.level.data,
+        )
         db.session.add(s)
+        bump_layout_version(w.id)
+        bump_cache_version(SHELVES)
         db.session.commit()
 
         flash("Raf oluşturuldu.", "success")
@@ -124,6 +158,11 @@ def shelves_edit(shelf_id: int):
 
         s.code = code
         s.description = form.description.data
+        s.aisle = form.aisle.data
+        s.bay = form.bay.data
+        s.level = form.level.data
+        bump_layout_version(w.id)
+        bump_cache_version(SHELVES)
         db.session.commit()
 
         flash("Raf güncellendi.", "success")
@@ -138,13 +177,32 @@ def shelves_delete(shelf_id: int):
     s = Shelf.query.get_or_404(shelf_id)
     w = Warehouse.query.get_or_404(s.warehouse_id)
 
-    used_in_levels = StockLevel.query.filter_by(shelf_id=s.id).count()
-    used_in_movements = StockMovement.query.filter_by(shelf_id=s.id).count()
-    if used_in_levels or used_in_movements:
+    used_in_levels = StockLevel.query.filter_by(shelf_id=s.id).first() is not None
+    used_in_movements = StockMovement.query.filter_by(shelf_id=s.id).first() is not None
+    used_in_archive = (
+        StockMovementArchive.query.filter_by(shelf_id=s.id).first() is not None
+        or StockOpeningBalance.query.filter_by(shelf_id=s.id).first() is not None
+    )
+    if used_in_levels or used_in_movements or used_in_archive:
         flash("Bu raf stok kayıtlarında kullanıldığı için silinemez.", "danger")
         return redirect(url_for("warehouses.shelves_list", warehouse_id=w.id))
+    used_in_documents = any(
+        model.query.filter_by(shelf_id=s.id).first() is not None
+        for model in (Purchase, SalesOrder, CycleCount, CycleCountLine)
+    )
+    if used_in_documents:
+        flash("Bu raf satın alma, satış veya sayım kayıtlarında kullanıldığı için silinemez.", "danger")
+        return redirect(url_for("warehouses.shelves_list", warehouse_id=w.id))
 
     db.session.delete(s)
-    db.session.commit()
+    bump_layout_version(w.id)
+    bump_cache_version(SHELVES)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Still referenced elsewhere; SQLite enforces the foreign keys.
+        db.session.rollback()
+        flash("Bu raf başka kayıtlarda kullanıldığı için silinemez.", "danger")
+        return redirect(url_for("warehouses.shelves_list", warehouse_id=w.id))
     flash("Raf silindi.", "success")
     return redirect(url_for("warehouses.shelves_list", warehouse_id=w.id))
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+from flask import Flask
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from .extensions import db
+from .models import CacheVersion
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Thread-safe LRU with an optional per-entry TTL."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 0.0) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is not _MISSING:
+                expires, value = item
+                if not expires or expires > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any) -> None:
+        expires = time.monotonic() + self.ttl if self.ttl else 0.0
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> bool:
+        with self._lock:
+            return self._data.pop(key, _MISSING) is not _MISSING
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+_registry: dict[str, LRUCache] = {}
+
+
+def register_cache(name: str, cache: LRUCache) -> LRUCache:
+    """Make a cache's hit/miss counters visible on the performance page."""
+    _registry[name] = cache
+    return cache
+
+
+def registered_caches() -> list[tuple[str, LRUCache]]:
+    return sorted(_registry.items())
+
+
+class VersionStamps:
+    """Per-process view of the cache_versions table.
+
+    A name's version is re-read from the database at most every
+    `check_interval` seconds, so a bump made by another worker is seen within
+    that interval. Bumps committed by this process are seen immediately."""
+
+    def __init__(self, check_interval: float = 2.0) -> None:
+        self.check_interval = check_interval
+        self._known: dict[str, tuple[float, int]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> int:
+        now = time.monotonic()
+        known = self._known.get(name)
+        if known is not None and now - known[0] < self.check_interval:
+            return known[1]
+        version = int(
+            db.session.query(CacheVersion.version).filter(CacheVersion.name == name).scalar() or 0
+        )
+        with self._lock:
+            self._known[name] = (now, version)
+        return version
+
+    def forget(self, *names: str) -> None:
+        with self._lock:
+            for name in names:
+                self._known.pop(name, None)
+
+
+versions = VersionStamps()
+
+
+def bump_cache_version(name: str, session: Session | None = None) -> None:
+    """Increment a cache version inside the caller's transaction.
+
+    The local stamp is dropped after commit so this worker re-reads it on the
+    next lookup."""
+    session = session or db.session()
+    updated = session.execute(
+        db.update(CacheVersion)
+        .where(CacheVersion.name == name)
+        .values(version=CacheVersion.version + 1)
+    ).rowcount
+    if not updated:
+        session.add(CacheVersion(name=name, version=1))
+    session.info.setdefault("bumped_cache_versions", set()).add(name)
+
+
+@event.listens_for(Session, "after_commit")
+def _forget_bumped_versions(session: Session) -> None:
+    names = session.info.pop("bumped_cache_versions", None)
+    if names:
+        versions.forget(*names)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_bumped_versions(session: Session) -> None:
+    session.info.pop("bumped_cache_versions", None)
+
+
+def versioned(cache: LRUCache, name: str, key: Hashable, build: Callable[[], Any]) -> Any:
+    """Return cache[key] if it was built at the current version of `name`."""
+    version = versions.get(name)
+    item = cache.get(key)
+    if item is not None and item[0] == version:
+        return item[1]
+    value = build()
+    cache.set(key, (version, value))
+    return value
+
+
+def init_caching(app: Flask) -> None:
+    versions.check_interval = float(app.config.get("CACHE_VERSION_CHECK_SECONDS", 2.0))
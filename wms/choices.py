@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from .caching import LRUCache, bump_cache_version, register_cache, versioned
+from .extensions import db
+from .models import Customer, Product, Shelf, Supplier, Unit, Warehouse
+
+# Cache version names; the CRUD routes of each master table bump theirs with
+# bump_cache_version() in the same transaction as the change.
+PRODUCTS = "products"
+CATEGORIES = "categories"
+UNITS = "units"
+WAREHOUSES = "warehouses"
+SHELVES = "shelves"
+SUPPLIERS = "suppliers"
+CUSTOMERS = "customers"
+
+ALL_VERSIONS = (PRODUCTS, CATEGORIES, UNITS, WAREHOUSES, SHELVES, SUPPLIERS, CUSTOMERS)
+
+Choices = list[tuple[int, str]]
+
+_cache = register_cache("choices", LRUCache(maxsize=512))
+
+# Bumped on any change to these models, wherever it is made (routes, CLI,
+# services), as the stock matrix labels depend on them.
+_MODEL_VERSIONS = ((Product, PRODUCTS), (Warehouse, WAREHOUSES))
+
+
+@event.listens_for(Session, "before_flush")
+def _bump_master_versions(session: Session, flush_context, instances) -> None:
+    bumped = session.info.get("bumped_cache_versions", ())
+    changed = list(session.new | session.deleted)
+    changed += [obj for obj in session.dirty if session.is_modified(obj, include_collections=False)]
+    for model, name in _MODEL_VERSIONS:
+        if name not in bumped and any(isinstance(obj, model) for obj in changed):
+            bump_cache_version(name, session)
+
+
+def _cached(name: str, key, build) -> Choices:
+    return list(versioned(_cache, name, key, lambda: tuple((int(k), str(v)) for k, v in build())))
+
+
+def product_choices() -> Choices:
+    return _cached(
+        PRODUCTS,
+        PRODUCTS,
+        lambda: (
+            (pid, f"{name} ({sku})")
+            for pid, name, sku in db.session.query(Product.id, Product.name, Product.sku)
+            .filter(Product.is_active.is_(True))
+            .order_by(Product.name.asc())
+            .all()
+        ),
+    )
+
+
+def category_choices() -> Choices:
+    # Imported here: category_service imports this module.
+    from .services.category_service import category_tree
+
+    return _cached(CATEGORIES, CATEGORIES, lambda: [(c.id, c.path) for c in category_tree()])
+
+
+def unit_choices() -> Choices:
+    return _cached(
+        UNITS,
+        UNITS,
+        lambda: (
+            (uid, f"{name} ({short_code})")
+            for uid, name, short_code in db.session.query(Unit.id, Unit.name, Unit.short_code)
+            .filter(Unit.is_active.is_(True))
+            .order_by(Unit.name.asc())
+            .all()
+        ),
+    )
+
+
+def warehouse_choices() -> Choices:
+    return _cached(
+        WAREHOUSES,
+        WAREHOUSES,
+        lambda: db.session.query(Warehouse.id, Warehouse.name)
+        .filter(Warehouse.is_active.is_(True))
+        .order_by(Warehouse.name.asc())
+        .all(),
+    )
+
+
+def shelf_choices(warehouse_id: int) -> Choices:
+    return _cached(
+        SHELVES,
+        (SHELVES, warehouse_id),
+        lambda: db.session.query(Shelf.id, Shelf.code)
+        .filter(Shelf.warehouse_id == warehouse_id)
+        .order_by(Shelf.code.asc())
+        .all(),
+    )
+
+
+def supplier_choices() -> Choices:
+    return _cached(
+        SUPPLIERS,
+        SUPPLIERS,
+        lambda: db.session.query(Supplier.id, Supplier.name)
+        .filter(Supplier.is_active.is_(True))
+        .order_by(Supplier.name.asc())
+        .all(),
+    )
+
+
+def customer_choices() -> Choices:
+    return _cached(
+        CUSTOMERS,
+        CUSTOMERS,
+        lambda: db.session.query(Customer.id, Customer.name)
+        .filter(Customer.is_active.is_(True))
+        .order_by(Customer.name.asc())
+        .all(),
+    )
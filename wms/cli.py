@@ -1,11 +1,16 @@
 from __future__ import annotations
 
+from datetime import timedelta
+
 import click
 from flask import Flask
 
+from .caching import bump_cache_version
+from .choices import ALL_VERSIONS
 from .extensions import db
 from .models import (
     Category,
+    CategoryClosure,
     Customer,
     Product,
     Shelf,
@@ -16,7 +21,30 @@ from .models import (
 )
 
 
+class _MigrateGroup(click.Group):
+    """`flask db`: Flask-Migrate (and alembic) are loaded only when it runs."""
+
+    def _commands(self) -> click.Group:
+        from flask import current_app
+        from flask_migrate.cli import db as migrate_group
+
+        from . import init_migrate
+
+        app = current_app._get_current_object()
+        if "migrate" not in app.extensions:
+            init_migrate(app)
+        return migrate_group
+
+    def list_commands(self, ctx: click.Context) -> list[str]:
+        return self._commands().list_commands(ctx)
+
+    def get_command(self, ctx: click.Context, name: str) -> click.Command | None:
+        return self._commands().get_command(ctx, name)
+
+
 def register_cli(app: Flask) -> None:
+    app.cli.add_command(_MigrateGroup("db", help="Perform database migrations."))
+
     @app.cli.command("seed")
     def seed_command() -> None:
         """Seed data for local development."""
@@ -63,6 +91,8 @@ def register_cli(app: Flask) -> None:
             db.session.add(wh2)
 
         db.session.flush()
+        if db.session.get(CategoryClosure, (cat.id, cat.id)) is None:
+            db.session.add(CategoryClosure(ancestor_id=cat.id, descendant_id=cat.id, depth=0))
 
         shelf_a1 = Shelf.query.filter_by(warehouse_id=wh1.id, code="A1").first()
         if not shelf_a1:
@@ -103,5 +133,187 @@ def register_cli(app: Flask) -> None:
             c = Customer(name="Genel Müşteri", is_active=True)
             db.session.add(c)
 
+        for name in ALL_VERSIONS:
+            bump_cache_version(name)
         db.session.commit()
         click.echo("Seed data created/updated. (admin/admin123, personel/personel123)")
+
+    @app.cli.command("forecast")
+    @click.option("--weeks", default=4, show_default=True, type=int)
+    @click.option("--history-days", default=730, show_default=True, type=int)
+    @click.option("--method", default="ses", show_default=True, type=click.Choice(["ses", "snaive"]))
+    @click.option("--alpha", default=0.2, show_default=True, type=float)
+    @click.option("--workers", default=1, show_default=True, type=int)
+    @click.option("--chunk-size", default=10_000, show_default=True, type=int)
+    def forecast_command(
+        weeks: int,
+        history_days: int,
+        method: str,
+        alpha: float,
+        workers: int,
+        chunk_size: int,
+    ) -> None:
+        """Fit weekly OUT forecasts for all products and store them."""
+        from .services.forecast_service import run_forecast
+
+        result = run_forecast(
+            weeks=weeks,
+            history_days=history_days,
+            method=method,
+            alpha=alpha,
+            workers=workers,
+            chunk_size=chunk_size,
+        )
+        click.echo(
+            f"{len(result.product_ids)} ürün x {history_days} gün, {weeks} hafta tahmin ({method})."
+        )
+        for name, seconds in result.timings.items():
+            click.echo(f"  {name}: {seconds:.3f}s")
+
+    @app.cli.command("bench-sqlite")
+    @click.option("--writers", default=4, show_default=True, type=int)
+    @click.option("--readers", default=4, show_default=True, type=int)
+    @click.option("--writes", default=200, show_default=True, type=int, help="Writes per writer.")
+    def bench_sqlite_command(writers: int, readers: int, writes: int) -> None:
+        """Compare write throughput/reader concurrency with and without the SQLite profile."""
+        from .sqlite_profile import benchmark_sqlite_profile
+
+        results = benchmark_sqlite_profile(
+            writers=writers, readers=readers, writes_per_writer=writes
+        )
+        for label, r in results.items():
+            click.echo(
+                f"{label:8s} writes/s={r['writes_per_sec']:.0f} "
+                f"reads/s={r['reads_per_sec']:.0f} "
+                f"write_errors={int(r['write_errors'])} "
+                f"({r['seconds']:.2f}s)"
+            )
+
+    @app.cli.command("bench-pick-route")
+    @click.option("--lines", default=1000, show_default=True, type=int)
+    @click.option("--aisles", default=20, show_default=True, type=int)
+    @click.option("--bays", default=50, show_default=True, type=int)
+    @click.option("--runs", default=20, show_default=True, type=int)
+    def bench_pick_route_command(lines: int, aisles: int, bays: int, runs: int) -> None:
+        """Time S-shape routing of random pick lists and compare walking distance."""
+        from .services.route_service import benchmark_pick_route
+
+        r = benchmark_pick_route(lines=lines, aisles=aisles, bays=bays, runs=runs)
+        click.echo(
+            f"{lines} satır: medyan {r['median_ms']:.2f} ms, en kötü {r['max_ms']:.2f} ms"
+        )
+        click.echo(
+            f"Yürüme mesafesi: kod sırası {r['code_order_distance']:.0f}, "
+            f"S-rota {r['s_shape_distance']:.0f}"
+        )
+
+    @app.cli.command("bench-startup")
+    @click.option("--runs", default=5, show_default=True, type=int)
+    @click.option("--top", default=10, show_default=True, type=int)
+    def bench_startup_command(runs: int, top: int) -> None:
+        """Compare app start-up time with and without the web blueprints."""
+        from .startup import benchmark_startup
+
+        for label, r in benchmark_startup(runs=runs, top=top).items():
+            click.echo(f"{label}: medyan {r['median_ms']:.0f} ms, {r['modules']} modül")
+            for name, ms in r["top"]:
+                click.echo(f"  {ms:8.1f} ms  {name}")
+
+    @app.cli.command("bench-group-commit")
+    @click.option("--threads", default=16, show_default=True, type=int)
+    @click.option("--per-thread", default=50, show_default=True, type=int)
+    @click.option("--max-wait-ms", default=5.0, show_default=True, type=float)
+    def bench_group_commit_command(threads: int, per_thread: int, max_wait_ms: float) -> None:
+        """Compare one commit per movement against the group-commit writer."""
+        from .services.group_commit import benchmark_group_commit
+
+        results = benchmark_group_commit(threads=threads, per_thread=per_thread, max_wait_ms=max_wait_ms)
+        for label, r in results.items():
+            click.echo(
+                f"{label}: {r['movements_per_sec']:.0f} hareket/sn, {r['booked']:.0f} kayıt, "
+                f"{r['commits']:.0f} commit, {r['errors']:.0f} hata, {r['seconds']:.2f} sn"
+            )
+
+    @app.cli.command("archive-movements")
+    @click.option("--before", "before", required=True, type=click.DateTime(formats=["%Y-%m-%d"]))
+    @click.option("--chunk-size", default=5000, show_default=True, type=int)
+    def archive_movements_command(before, chunk_size: int) -> None:
+        """Move movements older than --before into the archive table."""
+        from .services.archive_service import archive_movements
+
+        result = archive_movements(before, chunk_size=chunk_size)
+        click.echo(
+            f"{result.moved} hareket arşivlendi ({result.chunks} parça, "
+            f"{result.levels} stok seviyesi için açılış bakiyesi)."
+        )
+
+    @app.cli.command("verify-ledger")
+    def verify_ledger_command() -> None:
+        """Check stock levels against opening balances + movements."""
+        from .services.archive_service import verify_ledger
+
+        mismatches = verify_ledger()
+        for m in mismatches:
+            click.echo(
+                f"product={m.product_id} warehouse={m.warehouse_id} shelf={m.shelf_id} "
+                f"stock={m.stock_level:.2f} ledger={m.ledger:.2f}"
+            )
+        if mismatches:
+            raise SystemExit(1)
+        click.echo("Defter tutarlı.")
+
+    @app.cli.command("purge-idempotency-keys")
+    @click.option("--hours", type=int, default=None, help="Defaults to IDEMPOTENCY_KEY_TTL_HOURS.")
+    def purge_idempotency_keys_command(hours: int | None) -> None:
+        """Delete idempotency keys older than the TTL."""
+        from .services.stock_service import purge_idempotency_keys
+
+        ttl = hours if hours is not None else app.config["IDEMPOTENCY_KEY_TTL_HOURS"]
+        deleted = purge_idempotency_keys(timedelta(hours=ttl))
+        click.echo(f"{deleted} işlem anahtarı silindi.")
+
+    @app.cli.command("rebuild-availability")
+    def rebuild_availability_command() -> None:
+        """Recompute stock_availability from stock levels and open reservations."""
+        from .services.stock_service import rebuild_availability
+
+        count = rebuild_availability()
+        click.echo(f"{count} ürün/depo satırı yeniden hesaplandı.")
+
+    @app.cli.command("rebuild-valuation")
+    @click.option("--method", type=click.Choice(["average", "fifo"]), default=None, help="Defaults to VALUATION_METHOD.")
+    @click.option("--chunk-size", default=5000, show_default=True, type=int)
+    def rebuild_valuation_command(method: str | None, chunk_size: int) -> None:
+        """Recompute stock values and unit costs by replaying all movements."""
+        from .services.valuation_service import rebuild_valuation
+
+        result = rebuild_valuation(method=method, chunk_size=chunk_size)
+        click.echo(
+            f"{result.movements} hareket işlendi: {result.rows} ürün/depo satırı, "
+            f"{result.layers} açık FIFO katmanı, {result.backfilled} girişe satın alma maliyeti yazıldı."
+        )
+
+    @app.cli.command("refresh-report-rollups")
+    @click.option("--rebuild", is_flag=True, help="Drop and rebuild from the full movement history.")
+    def refresh_report_rollups_command(rebuild: bool) -> None:
+        """Fold new movements into the daily report rollups."""
+        from .services.report_engine import refresh_movement_rollups
+
+        n = refresh_movement_rollups(rebuild=rebuild)
+        click.echo(f"{n} hareket rapor özetine işlendi.")
+
+    @app.cli.command("rebuild-category-closure")
+    def rebuild_category_closure_command() -> None:
+        """Recreate the category closure table from parent links."""
+        from .services.category_service import rebuild_category_closure
+
+        n = rebuild_category_closure()
+        click.echo(f"{n} kategori ilişkisi yazıldı.")
+
+    @app.cli.command("rebuild-movement-search")
+    def rebuild_movement_search_command() -> None:
+        """Re-index all movements for full-text search (SQLite)."""
+        from .services.search_service import rebuild_movement_search
+
+        n = rebuild_movement_search()
+        click.echo(f"{n} hareket arama indeksine yazıldı.")
@@ -6,4 +6,72 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Optional read-only replica for reports, dashboard and list views.
+    SQLALCHEMY_REPLICA_URI = os.getenv("DATABASE_REPLICA_URL")
+
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "0"))
+    REPLICA_POOL_SIZE = int(os.getenv("REPLICA_POOL_SIZE", "10"))
+    REPLICA_MAX_OVERFLOW = int(os.getenv("REPLICA_MAX_OVERFLOW", "20"))
+    REPLICA_POOL_PRE_PING = os.getenv("REPLICA_POOL_PRE_PING", "1") == "1"
+    REPLICA_POOL_RECYCLE = int(os.getenv("REPLICA_POOL_RECYCLE", "0"))
+
+    SQLITE_PERFORMANCE_PROFILE = os.getenv("SQLITE_PERFORMANCE_PROFILE", "1") == "1"
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+    SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", "268435456"))
+    SQLITE_WAL_CHECKPOINT_SECONDS = int(os.getenv("SQLITE_WAL_CHECKPOINT_SECONDS", "300"))
+
+    IDEMPOTENCY_KEY_TTL_HOURS = int(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", "48"))
+    SYNC_BATCH_MAX_LINES = int(os.getenv("SYNC_BATCH_MAX_LINES", "5000"))
+
+    # Inventory valuation: "average" (running weighted average) or "fifo"
+    # (cost layers). Run `flask rebuild-valuation` after changing it.
+    VALUATION_METHOD = os.getenv("VALUATION_METHOD", "average")
+
+    # Movement form/API requests are queued to one writer thread per worker
+    # that books whatever arrives within GROUP_COMMIT_MAX_WAIT_MS in a single
+    # transaction. Off by default; each request still gets its own result.
+    GROUP_COMMIT_ENABLED = os.getenv("GROUP_COMMIT_ENABLED", "0") == "1"
+    GROUP_COMMIT_MAX_WAIT_MS = float(os.getenv("GROUP_COMMIT_MAX_WAIT_MS", "5"))
+    GROUP_COMMIT_MAX_BATCH = int(os.getenv("GROUP_COMMIT_MAX_BATCH", "500"))
+
+    # Per-worker in-memory copy of stock_levels serving /stock/api/levels.
+    # Other workers' bookings are picked up within STOCK_READ_MODEL_POLL_SECONDS
+    # (one primary-key probe per poll); this worker's own right after commit.
+    STOCK_READ_MODEL_ENABLED = os.getenv("STOCK_READ_MODEL_ENABLED", "0") == "1"
+    STOCK_READ_MODEL_POLL_SECONDS = float(os.getenv("STOCK_READ_MODEL_POLL_SECONDS", "1"))
+
+    # current_user is served from a per-worker LRU/TTL cache; role and
+    # deactivation changes reach other workers within CACHE_VERSION_CHECK_SECONDS.
+    AUTH_CACHE_ENABLED = os.getenv("AUTH_CACHE_ENABLED", "1") == "1"
+    AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "1024"))
+    AUTH_CACHE_TTL_SECONDS = int(os.getenv("AUTH_CACHE_TTL_SECONDS", "300"))
+    CACHE_VERSION_CHECK_SECONDS = float(os.getenv("CACHE_VERSION_CHECK_SECONDS", "2"))
+
+    # werkzeug method string, e.g. "scrypt" or "pbkdf2:sha256:260000".
+    # Existing hashes are upgraded/downgraded on the next successful login.
+    PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt")
+
+    # Responses above COMPRESS_MIN_SIZE bytes are gzip'ed (brotli when the
+    # optional "brotli" package is installed and the client accepts it).
+    COMPRESS_ENABLED = os.getenv("COMPRESS_ENABLED", "1") == "1"
+    COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "500"))
+    COMPRESS_LEVEL = int(os.getenv("COMPRESS_LEVEL", "6"))
+    COMPRESS_BROTLI = os.getenv("COMPRESS_BROTLI", "1") == "1"
+    COMPRESS_BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", "4"))
+
+    # Prometheus text format at /metrics. Under a pre-forking server each
+    # worker writes its counters to METRICS_DIR every METRICS_FLUSH_SECONDS
+    # and a scrape adds all workers up; without it only the answering
+    # worker is reported. METRICS_TOKEN requires "Authorization: Bearer ...".
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+    METRICS_DIR = os.getenv("METRICS_DIR")
+    METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+    JINJA_BYTECODE_CACHE = os.getenv("JINJA_BYTECODE_CACHE", "1") == "1"
+
     LOGIN_VIEW = "auth.login"
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+from flask import Flask, g
+from sqlalchemy.orm import Session
+
+from .extensions import db
+
+REPLICA_BIND_KEY = "replica"
+
+
+def _pool_options(
+    uri: str, *, pool_size: int, max_overflow: int, pre_ping: bool, recycle: int, name: str, timed: bool
+) -> dict:
+    options: dict = {"pool_pre_ping": pre_ping}
+    if uri.startswith("sqlite") and (":memory:" in uri or uri.rstrip("/") == "sqlite:"):
+        # In-memory SQLite uses a per-thread pool that has no size settings.
+        return options
+    if timed:
+        from .metrics import TimedQueuePool
+
+        # Records checkout wait times under the "pool" label `name`.
+        options["poolclass"] = TimedQueuePool
+        options["pool_logging_name"] = name
+    options["pool_size"] = pool_size
+    options["max_overflow"] = max_overflow
+    if recycle:
+        options["pool_recycle"] = recycle
+    return options
+
+
+def configure_engines(app: Flask) -> None:
+    """Fill SQLALCHEMY_ENGINE_OPTIONS/SQLALCHEMY_BINDS from the pool settings
+    before Flask-SQLAlchemy creates the engines."""
+    primary_uri = app.config["SQLALCHEMY_DATABASE_URI"]
+    engine_options = dict(app.config.get("SQLALCHEMY_ENGINE_OPTIONS") or {})
+    for key, value in _pool_options(
+        primary_uri,
+        pool_size=app.config.get("DB_POOL_SIZE", 5),
+        max_overflow=app.config.get("DB_MAX_OVERFLOW", 10),
+        pre_ping=app.config.get("DB_POOL_PRE_PING", True),
+        recycle=app.config.get("DB_POOL_RECYCLE", 0),
+        name="primary",
+        timed=app.config.get("METRICS_ENABLED", True),
+    ).items():
+        engine_options.setdefault(key, value)
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options
+
+    replica_uri = app.config.get("SQLALCHEMY_REPLICA_URI")
+    if replica_uri:
+        binds = dict(app.config.get("SQLALCHEMY_BINDS") or {})
+        binds[REPLICA_BIND_KEY] = {
+            "url": replica_uri,
+            **_pool_options(
+                replica_uri,
+                pool_size=app.config.get("REPLICA_POOL_SIZE", 10),
+                max_overflow=app.config.get("REPLICA_MAX_OVERFLOW", 20),
+                pre_ping=app.config.get("REPLICA_POOL_PRE_PING", True),
+                recycle=app.config.get("REPLICA_POOL_RECYCLE", 0),
+                name=REPLICA_BIND_KEY,
+                timed=app.config.get("METRICS_ENABLED", True),
+            ),
+        }
+        app.config["SQLALCHEMY_BINDS"] = binds
+
+
+def init_read_session(app: Flask) -> None:
+    @app.teardown_appcontext
+    def _close_read_session(exc: BaseException | None) -> None:
+        session = g.pop("read_session", None)
+        if session is not None:
+            session.close()
+
+
+def read_session() -> Session:
+    """Per-request session for report and list queries.
+
+    Bound to the replica when SQLALCHEMY_REPLICA_URI is set, otherwise to the
+    primary. Nothing is ever added to it; writes always go through db.session."""
+    session = g.get("read_session")
+    if session is None:
+        engine = db.engines.get(REPLICA_BIND_KEY) or db.engine
+        session = Session(bind=engine, autoflush=False, expire_on_commit=False)
+        g.read_session = session
+    return session
@@ -1,10 +1,6 @@
-from flask_login import LoginManager
-from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
-from flask_wtf import CSRFProtect
 
 
+# Flask-Login, Flask-WTF and Flask-Migrate are set up per app in create_app
+# (web layer / db command group only), so CLI jobs never import them.
 db = SQLAlchemy()
-migrate = Migrate()
-login_manager = LoginManager()
-csrf = CSRFProtect()
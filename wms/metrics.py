@@ -0,0 +1,386 @@
+from __future__ import annotations
+
+import glob
+import hmac
+import json
+import os
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from typing import Callable, Iterable
+
+from flask import Flask, Response, abort, g, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool
+
+from .caching import registered_caches
+from .models import StockMovement
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+POOL_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+Labels = tuple[str, ...]
+Sample = tuple[str, Labels]  # (metric name, label values)
+
+
+class Registry:
+    """Counters and histograms recorded without a shared lock.
+
+    Every thread writes to its own shard (a plain dict keyed by thread id),
+    so an increment is a dict update with no contention; the lock is only
+    taken the first time a thread records. Thread ids are reused once a
+    thread ends, which keeps the shard count at the number of concurrent
+    threads. Scrapes add the shards up."""
+
+    def __init__(self) -> None:
+        self.metrics: dict[str, Counter | Histogram] = {}
+        self.collectors: list[Callable[[], Iterable[tuple[str, Labels, float]]]] = []
+        self._shards: dict[int, dict[Sample, float | list[float]]] = {}
+        self._lock = threading.Lock()
+
+    def shard(self) -> dict[Sample, float | list[float]]:
+        ident = threading.get_ident()
+        shard = self._shards.get(ident)
+        if shard is None:
+            with self._lock:
+                shard = self._shards.setdefault(ident, {})
+        return shard
+
+    def reset(self) -> None:
+        with self._lock:
+            self._shards = {}
+
+    def snapshot(self) -> dict[Sample, float | list[float]]:
+        """This process' totals, including values read from the collectors."""
+        out: dict[Sample, float | list[float]] = {}
+        for shard in list(self._shards.values()):
+            _merge(out, shard.copy())
+        for collect in self.collectors:
+            for name, labels, value in collect():
+                out[(name, labels)] = out.get((name, labels), 0.0) + value
+        return out
+
+
+def _merge(into: dict, values: dict) -> None:
+    for key, value in values.items():
+        if isinstance(value, list):
+            acc = into.get(key)
+            if acc is None:
+                into[key] = list(value)
+            else:
+                for i, v in enumerate(value):
+                    acc[i] += v
+        else:
+            into[key] = into.get(key, 0.0) + value
+
+
+class Counter:
+    def __init__(self, registry: Registry, name: str, doc: str, labelnames: Labels = ()) -> None:
+        self.registry = registry
+        self.name = name
+        self.doc = doc
+        self.labelnames = labelnames
+        registry.metrics[name] = self
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        shard = self.registry.shard()
+        key = (self.name, labels)
+        shard[key] = shard.get(key, 0.0) + amount
+
+
+class Histogram:
+    def __init__(
+        self, registry: Registry, name: str, doc: str, labelnames: Labels = (), buckets=REQUEST_BUCKETS
+    ) -> None:
+        self.registry = registry
+        self.name = name
+        self.doc = doc
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        registry.metrics[name] = self
+
+    def observe(self, value: float, *labels: str) -> None:
+        # [count per bucket..., count above the last bucket, sum]
+        shard = self.registry.shard()
+        key = (self.name, labels)
+        h = shard.get(key)
+        if h is None:
+            h = shard[key] = [0.0] * (len(self.buckets) + 2)
+        h[bisect_left(self.buckets, value)] += 1
+        h[-1] += value
+
+
+registry = Registry()
+
+HTTP_REQUEST_SECONDS = Histogram(
+    registry,
+    "wms_http_request_duration_seconds",
+    "Request latency until the response body is sent.",
+    ("blueprint", "endpoint", "method"),
+)
+HTTP_REQUESTS = Counter(
+    registry, "wms_http_requests_total", "Requests by status code.", ("blueprint", "endpoint", "status")
+)
+MOVEMENTS = Counter(registry, "wms_stock_movements_total", "Committed stock movements.", ("type",))
+STOCK_ERRORS = Counter(registry, "wms_stock_errors_total", "Rejected stock operations.", ("reason",))
+POOL_WAIT_SECONDS = Histogram(
+    registry,
+    "wms_db_pool_checkout_wait_seconds",
+    "Time to get a connection from the pool (including opening a new one).",
+    ("pool",),
+    POOL_BUCKETS,
+)
+POOL_HELD_SECONDS = Histogram(
+    registry,
+    "wms_db_pool_connection_held_seconds",
+    "Time a connection was checked out.",
+    ("pool",),
+    POOL_BUCKETS,
+)
+# Read from the caches/pools at scrape time by the collectors below.
+COLLECTED = {
+    "wms_cache_hits_total": ("counter", "Cache lookups that found an entry.", ("cache",)),
+    "wms_cache_misses_total": ("counter", "Cache lookups that missed.", ("cache",)),
+    "wms_cache_entries": ("gauge", "Entries currently cached.", ("cache",)),
+    "wms_cache_hit_ratio": ("gauge", "Hits / lookups since the workers started.", ("cache",)),
+    "wms_db_pool_checked_out": ("gauge", "Connections currently checked out.", ("pool",)),
+}
+
+
+def _cache_samples():
+    for name, cache in registered_caches():
+        yield "wms_cache_hits_total", (name,), float(cache.hits)
+        yield "wms_cache_misses_total", (name,), float(cache.misses)
+        yield "wms_cache_entries", (name,), float(len(cache))
+
+
+registry.collectors.append(_cache_samples)
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records checkout wait and hold times, labelled with the pool's logging name."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        _pools.add(self)
+        event.listen(self, "checkout", _on_checkout)
+        event.listen(self, "checkin", self._on_checkin)
+
+    @property
+    def label(self) -> str:
+        return self._orig_logging_name or "primary"
+
+    def connect(self):
+        started = time.perf_counter()
+        conn = super().connect()
+        POOL_WAIT_SECONDS.observe(time.perf_counter() - started, self.label)
+        return conn
+
+    def _on_checkin(self, dbapi_connection, connection_record) -> None:
+        started = connection_record.info.pop("metrics_checkout", None)
+        if started is not None:
+            POOL_HELD_SECONDS.observe(time.perf_counter() - started, self.label)
+
+
+_pools: weakref.WeakSet[TimedQueuePool] = weakref.WeakSet()
+
+
+def _on_checkout(dbapi_connection, connection_record, connection_proxy) -> None:
+    connection_record.info["metrics_checkout"] = time.perf_counter()
+
+
+def _pool_samples():
+    for pool in list(_pools):
+        yield "wms_db_pool_checked_out", (pool.label,), float(pool.checkedout())
+
+
+registry.collectors.append(_pool_samples)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_movements(session: Session, flush_context) -> None:
+    types = [obj.movement_type for obj in session.new if isinstance(obj, StockMovement)]
+    if types:
+        session.info.setdefault("metrics_movements", []).extend(types)
+
+
+@event.listens_for(Session, "after_commit")
+def _count_movements(session: Session) -> None:
+    for movement_type in session.info.pop("metrics_movements", ()):
+        MOVEMENTS.inc(movement_type)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_movements(session: Session) -> None:
+    session.info.pop("metrics_movements", None)
+
+
+class _Flusher(threading.Thread):
+    """Writes this worker's snapshot to METRICS_DIR every `interval` seconds.
+
+    Under a pre-forking server /metrics is answered by whichever worker gets
+    the scrape; it adds up the files of all workers. Files of workers that
+    have exited keep their counters (they stay cumulative) but their gauges
+    are dropped once the file is older than three intervals."""
+
+    def __init__(self, directory: str, interval: float) -> None:
+        super().__init__(name="metrics-flush", daemon=True)
+        self.path = os.path.join(directory, f"{os.getpid()}.json")
+        self.interval = interval
+
+    def run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            try:
+                dump(self.path)
+            except OSError:
+                pass
+
+
+_flusher_pid: int | None = None
+_flusher_lock = threading.Lock()
+
+
+def _ensure_flusher(directory: str, interval: float) -> None:
+    global _flusher_pid
+    if _flusher_pid == os.getpid():
+        return
+    with _flusher_lock:
+        if _flusher_pid != os.getpid():
+            _Flusher(directory, interval).start()
+            _flusher_pid = os.getpid()
+
+
+def dump(path: str) -> None:
+    rows = [[name, list(labels), value] for (name, labels), value in registry.snapshot().items()]
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(rows, f)
+    os.replace(tmp, path)
+
+
+def collect(directory: str | None = None, interval: float = 5.0) -> dict[Sample, float | list[float]]:
+    """This process' samples plus, with a directory, those the other workers last wrote."""
+    out = registry.snapshot()
+    if not directory:
+        return out
+    own = os.path.join(directory, f"{os.getpid()}.json")
+    stale_before = time.time() - 3 * interval
+    for path in glob.glob(os.path.join(directory, "*.json")):
+        if path == own:
+            continue
+        try:
+            stale = os.path.getmtime(path) < stale_before
+            with open(path) as f:
+                rows = json.load(f)
+        except (OSError, ValueError):
+            continue
+        _merge(
+            out,
+            {
+                (name, tuple(labels)): value
+                for name, labels, value in rows
+                if not (stale and COLLECTED.get(name, ("",))[0] == "gauge")
+            },
+        )
+    return out
+
+
+def _labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    parts = [
+        f'{n}="' + str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for n, v in zip(names, values)
+    ]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render(samples: dict[Sample, float | list[float]]) -> str:
+    """Prometheus text exposition format (0.0.4)."""
+    by_name: dict[str, list[tuple[Labels, float | list[float]]]] = {}
+    for (name, labels), value in samples.items():
+        by_name.setdefault(name, []).append((labels, value))
+
+    hits = {labels: v for labels, v in by_name.get("wms_cache_hits_total", [])}
+    ratios = []
+    for labels, misses in by_name.get("wms_cache_misses_total", []):
+        lookups = hits.get(labels, 0.0) + misses
+        if lookups:
+            ratios.append((labels, hits.get(labels, 0.0) / lookups))
+    if ratios:
+        by_name["wms_cache_hit_ratio"] = ratios
+
+    lines: list[str] = []
+    for name in sorted(by_name):
+        metric = registry.metrics.get(name)
+        if metric is not None:
+            kind = "histogram" if isinstance(metric, Histogram) else "counter"
+            doc, labelnames = metric.doc, metric.labelnames
+        else:
+            kind, doc, labelnames = COLLECTED[name]
+        lines.append(f"# HELP {name} {doc}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in sorted(by_name[name], key=lambda item: item[0]):
+            if kind != "histogram":
+                lines.append(f"{name}{_labels(labelnames, labels)} {_number(value)}")
+                continue
+            cumulative = 0.0
+            for bound, count in zip(metric.buckets, value):
+                cumulative += count
+                le = _labels(labelnames, labels, 'le="%g"' % bound)
+                lines.append(f"{name}_bucket{le} {_number(cumulative)}")
+            cumulative += value[-2]
+            le = _labels(labelnames, labels, 'le="+Inf"')
+            lines.append(f"{name}_bucket{le} {_number(cumulative)}")
+            lines.append(f"{name}_sum{_labels(labelnames, labels)} {_number(value[-1])}")
+            lines.append(f"{name}_count{_labels(labelnames, labels)} {_number(cumulative)}")
+    return "\n".join(lines) + "\n"
+
+
+def init_metrics(app: Flask) -> None:
+    if not app.config.get("METRICS_ENABLED", True):
+        return
+    directory = app.config.get("METRICS_DIR")
+    interval = float(app.config.get("METRICS_FLUSH_SECONDS", 5))
+    token = app.config.get("METRICS_TOKEN")
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    @app.before_request
+    def _start_timer() -> None:
+        g.metrics_started = time.perf_counter()
+        if directory:
+            _ensure_flusher(directory, interval)
+
+    @app.after_request
+    def _keep_status(response):
+        g.metrics_status = response.status_code
+        return response
+
+    # Teardown runs after a streamed body has been sent, so stream_page
+    # views are timed in full.
+    @app.teardown_request
+    def _observe(exc: BaseException | None) -> None:
+        started = g.pop("metrics_started", None)
+        if started is None:
+            return
+        blueprint = request.blueprint or "-"
+        endpoint = request.endpoint or "unmatched"
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, blueprint, endpoint, request.method)
+        status = 500 if exc is not None else g.pop("metrics_status", 500)
+        HTTP_REQUESTS.inc(blueprint, endpoint, str(status))
+
+    @app.route("/metrics")
+    def metrics():
+        # No login; set METRICS_TOKEN to require "Authorization: Bearer <token>".
+        if token and not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+            abort(401)
+        body = render(collect(directory, interval))
+        return Response(body, mimetype="text/plain; version=0.0.4; charset=utf-8")
@@ -1,17 +1,34 @@
 from .core import (
+    CacheVersion,
     Category,
+    CategoryClosure,
+    CostLayer,
     Customer,
+    CycleCount,
+    CycleCountLine,
+    Forecast,
+    IdempotencyKey,
+    MovementRollup,
     Product,
     Purchase,
     PurchaseItem,
+    RollupState,
+    SalesOrder,
+    SalesOrderItem,
     Shelf,
+    StockAvailability,
     StockLevel,
     StockMovement,
+    StockMovementArchive,
+    StockOpeningBalance,
+    StockReservation,
+    StockValuation,
     Supplier,
     Unit,
     User,
     Warehouse,
 )
+from .search import SEARCH_TABLE
 
 __all__ = [
     "User",
@@ -22,8 +39,25 @@ __all__ = [
     "Shelf",
     "StockLevel",
     "StockMovement",
+    "StockMovementArchive",
+    "StockOpeningBalance",
     "Supplier",
     "Customer",
     "Purchase",
     "PurchaseItem",
+    "Forecast",
+    "IdempotencyKey",
+    "StockAvailability",
+    "StockReservation",
+    "SalesOrder",
+    "SalesOrderItem",
+    "CacheVersion",
+    "StockValuation",
+    "CostLayer",
+    "CycleCount",
+    "CycleCountLine",
+    "MovementRollup",
+    "RollupState",
+    "CategoryClosure",
+    "SEARCH_TABLE",
 ]
@@ -2,14 +2,28 @@ from __future__ import annotations
 
 from datetime import datetime
 from enum import Enum
+from functools import lru_cache
 
-from flask_login import UserMixin
+from flask import current_app, has_app_context
 from werkzeug.security import check_password_hash, generate_password_hash
 
 from ..extensions import db
 
 
-class User(UserMixin, db.Model):
+def _password_hash_method() -> str:
+    if has_app_context():
+        return current_app.config.get("PASSWORD_HASH_METHOD") or "scrypt"
+    return "scrypt"
+
+
+@lru_cache(maxsize=8)
+def _hash_prefix(method: str) -> str:
+    # Werkzeug fills in default parameters ("pbkdf2:sha256" is stored as
+    # "pbkdf2:sha256:600000"), so compare with a hash it actually made.
+    return generate_password_hash("", method=method).split("$", 1)[0]
+
+
+class User(db.Model):
     __tablename__ = "users"
 
     class Role(str, Enum):
@@ -23,8 +37,22 @@ class User(UserMixin, db.Model):
     is_active = db.Column(db.Boolean, nullable=False, default=True)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
+    # The Flask-Login user interface (login_user), without importing it here.
+    is_anonymous = False
+
+    @property
+    def is_authenticated(self) -> bool:
+        return bool(self.is_active)
+
+    def get_id(self) -> str:
+        return str(self.id)
+
     def set_password(self, password: str) -> None:
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = generate_password_hash(password, method=_password_hash_method())
+
+    def password_needs_rehash(self) -> bool:
+        """True when the stored hash was made with a different PASSWORD_HASH_METHOD."""
+        return (self.password_hash or "").split("$", 1)[0] != _hash_prefix(_password_hash_method())
 
     def check_password(self, password: str) -> bool:
         return check_password_hash(self.password_hash, password)
@@ -39,6 +67,23 @@ class Category(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(120), unique=True, nullable=False)
+    parent_id = db.Column(db.Integer, db.ForeignKey("categories.id"), nullable=True, index=True)
+
+    parent = db.relationship("Category", remote_side=[id])
+
+
+# Every ancestor/descendant pair of the category tree, each category paired
+# with itself at depth 0, so a subtree is one indexed join.
+class CategoryClosure(db.Model):
+    __tablename__ = "category_closure"
+
+    ancestor_id = db.Column(db.Integer, db.ForeignKey("categories.id"), primary_key=True)
+    descendant_id = db.Column(db.Integer, db.ForeignKey("categories.id"), primary_key=True)
+    depth = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index("ix_categoryclosure_descendant", "descendant_id", "ancestor_id"),
+    )
 
 
 class Unit(db.Model):
@@ -108,6 +153,7 @@ class PurchaseItem(db.Model):
     purchase_id = db.Column(db.Integer, db.ForeignKey("purchases.id"), nullable=False)
     product_id = db.Column(db.Integer, db.ForeignKey("products.id"), nullable=False)
     quantity = db.Column(db.Float, nullable=False)
+    unit_cost = db.Column(db.Float, nullable=True)
 
     purchase = db.relationship(
         "Purchase", backref=db.backref("items", lazy=True, cascade="all, delete-orphan")
@@ -126,6 +172,8 @@ class Warehouse(db.Model):
     name = db.Column(db.String(200), unique=True, nullable=False)
     address = db.Column(db.Text)
     is_active = db.Column(db.Boolean, nullable=False, default=True)
+    # Bumped whenever a shelf or its layout changes; pick routes are cached per version.
+    layout_version = db.Column(db.Integer, nullable=False, default=0, server_default="0")
 
 
 class Shelf(db.Model):
@@ -136,6 +184,11 @@ class Shelf(db.Model):
     code = db.Column(db.String(50), nullable=False)
     description = db.Column(db.Text)
 
+    # Optional physical position used for pick routing.
+    aisle = db.Column(db.Integer, nullable=True)
+    bay = db.Column(db.Integer, nullable=True)
+    level = db.Column(db.Integer, nullable=True)
+
     warehouse = db.relationship("Warehouse", backref=db.backref("shelves", lazy=True))
 
     __table_args__ = (
@@ -150,7 +203,7 @@ class Product(db.Model):
     name = db.Column(db.String(200), nullable=False)
     sku = db.Column(db.String(100), unique=True, nullable=False)
     barcode = db.Column(db.String(100), unique=True)
-    category_id = db.Column(db.Integer, db.ForeignKey("categories.id"))
+    category_id = db.Column(db.Integer, db.ForeignKey("categories.id"), index=True)
 
     unit_id = db.Column(db.Integer, db.ForeignKey("units.id"), nullable=False)
 
@@ -196,15 +249,316 @@ class StockMovement(db.Model):
 
     movement_type = db.Column(db.String(10), nullable=False)  # IN, OUT, ADJUST
     quantity = db.Column(db.Float, nullable=False)
+    # Cost per unit: purchase cost for receipts, consumed cost for issues.
+    unit_cost = db.Column(db.Float, nullable=True)
 
     reference_type = db.Column(db.String(50), nullable=False)  # purchase, sale, transfer, adjustment
     reason = db.Column(db.String(200), nullable=True)
     note = db.Column(db.Text)
 
     created_by = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
-    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
 
     product = db.relationship("Product")
     warehouse = db.relationship("Warehouse")
     shelf = db.relationship("Shelf")
     user = db.relationship("User", foreign_keys=[created_by])
+
+    __table_args__ = (
+        db.Index("ix_stockmovement_product_created", "product_id", "created_at"),
+        # Ids are never reused once archiving deletes the newest rows: they
+        # key the archive, the search index and the max(id) watermarks.
+        {"sqlite_autoincrement": True},
+    )
+
+
+class StockMovementArchive(db.Model):
+    __tablename__ = "stock_movements_archive"
+
+    # Same id as the original stock_movements row.
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+
+    product_id = db.Column(db.Integer, db.ForeignKey("products.id"), nullable=False)
+    warehouse_id = db.Column(db.Integer, db.ForeignKey("warehouses.id"), nullable=False)
+    shelf_id = db.Column(db.Integer, db.ForeignKey("shelves.id"), nullable=True)
+
+    movement_type = db.Column(db.String(10), nullable=False)
+    quantity = db.Column(db.Float, nullable=False)
+    unit_cost = db.Column(db.Float, nullable=True)
+
+    reference_type = db.Column(db.String(50), nullable=False)
+    reason = db.Column(db.String(200), nullable=True)
+    note = db.Column(db.Text)
+
+    created_by = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, index=True)
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    product = db.relationship("Product")
+    warehouse = db.relationship("Warehouse")
+    shelf = db.relationship("Shelf")
+    user = db.relationship("User", foreign_keys=[created_by])
+
+    __table_args__ = (
+        db.Index("ix_stockmovementarchive_product_created", "product_id", "created_at"),
+    )
+
+
+class StockOpeningBalance(db.Model):
+    __tablename__ = "stock_opening_balances"
+
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey("products.id"), nullable=False)
+    warehouse_id = db.Column(db.Integer, db.ForeignKey("warehouses.id"), nullable=False)
+    shelf_id = db.Column(db.Integer, db.ForeignKey("shelves.id"), nullable=True)
+    # Balance of the level at as_of, i.e. the sum of all archived movements before it.
+    as_of = db.Column(db.DateTime, nullable=False)
+    quantity = db.Column(db.Float, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint(
+            "product_id",
+            "warehouse_id",
+            "shelf_id",
+            "as_of",
+            name="uq_openingbalance_level_as_of",
+        ),
+    )
+
+
+class Forecast(db.Model):
+    __tablename__ = "forecasts"
+
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey("products.id"), nullable=False)
+    week_start = db.Column(db.Date, nullable=False)
+    quantity = db.Column(db.Float, nullable=False, default=0)
+    method = db.Column(db.String(20), nullable=False)  # ses, snaive
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    product = db.relationship("Product")
+
+    __table_args__ = (
+        db.UniqueConstraint("product_id", "week_start", name="uq_forecast_product_week"),
+    )
+
+
+class IdempotencyKey(db.Model):
+    __tablename__ = "idempotency_keys"
+
+    key = db.Column(db.String(64), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    # No FK so movements can still be archived while a key is alive.
+    movement_id = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+
+class StockAvailability(db.Model):
+    # Per product/warehouse totals kept in step with stock_levels and open
+    # reservations, so available-to-promise is a primary-key read.
+    __tablename__ = "stock_availability"
+
+    product_id = db.Column(db.Integer, db.ForeignKey("products.id"), primary_key=True)
+    warehouse_id = db.Column(db.Integer, db.ForeignKey("warehouses.id"), primary_key=True)
+    on_hand = db.Column(db.Float, nullable=False, default=0)
+    reserved = db.Column(db.Float, nullable=False, default=0)
+
+    @property
+    def available(self) -> float:
+        return float(self.on_hand or 0) - float(self.reserved or 0)
+
+
+class StockValuation(db.Model):
+    # Running inventory value per product/warehouse, updated by the stock
+    # service with every movement; `flask rebuild-valuation` recomputes it
+    # from the movement history.
+    __tablename__ = "stock_valuation"
+
+    product_id = db.Column(db.Integer, db.ForeignKey("products.id"), primary_key=True)
+    warehouse_id = db.Column(db.Integer, db.ForeignKey("warehouses.id"), primary_key=True, index=True)
+    quantity = db.Column(db.Float, nullable=False, default=0)
+    avg_cost = db.Column(db.Float, nullable=False, default=0)
+    total_value = db.Column(db.Float, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=True)
+
+    product = db.relationship("Product")
+    warehouse = db.relationship("Warehouse")
+
+
+class CostLayer(db.Model):
+    # Open FIFO receipt layers; only maintained when VALUATION_METHOD is "fifo".
+    __tablename__ = "cost_layers"
+
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey("products.id"), nullable=False)
+    warehouse_id = db.Column(db.Integer, db.ForeignKey("warehouses.id"), nullable=False)
+    received_at = db.Column(db.DateTime, nullable=False)
+    unit_cost = db.Column(db.Float, nullable=False)
+    quantity = db.Column(db.Float, nullable=False)
+    remaining = db.Column(db.Float, nullable=False)
+
+    __table_args__ = (
+        db.Index("ix_costlayer_product_warehouse", "product_id", "warehouse_id", "id"),
+    )
+
+
+class StockReservation(db.Model):
+    __tablename__ = "stock_reservations"
+
+    class Status(str, Enum):
+        OPEN = "OPEN"
+        RELEASED = "RELEASED"
+        CONSUMED = "CONSUMED"
+
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey("products.id"), nullable=False)
+    warehouse_id = db.Column(db.Integer, db.ForeignKey("warehouses.id"), nullable=False)
+    customer_id = db.Column(db.Integer, db.ForeignKey("customers.id"), nullable=False)
+    quantity = db.Column(db.Float, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default=Status.OPEN.value, index=True)
+    note = db.Column(db.Text)
+
+    created_by = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    closed_at = db.Column(db.DateTime, nullable=True)
+    movement_id = db.Column(db.Integer, nullable=True)
+
+    product = db.relationship("Product")
+    warehouse = db.relationship("Warehouse")
+    customer = db.relationship("Customer")
+    user = db.relationship("User", foreign_keys=[created_by])
+
+
+class SalesOrder(db.Model):
+    __tablename__ = "sales_orders"
+
+    class Status(str, Enum):
+        DRAFT = "DRAFT"
+        SHIPPED = "SHIPPED"
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    customer_id = db.Column(db.Integer, db.ForeignKey("customers.id"), nullable=False)
+    warehouse_id = db.Column(db.Integer, db.ForeignKey("warehouses.id"), nullable=False)
+    shelf_id = db.Column(db.Integer, db.ForeignKey("shelves.id"), nullable=True)
+
+    status = db.Column(db.String(20), nullable=False, default=Status.DRAFT.value, index=True)
+    note = db.Column(db.Text)
+
+    created_by = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    shipped_by = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True)
+    shipped_at = db.Column(db.DateTime, nullable=True)
+
+    customer = db.relationship("Customer")
+    warehouse = db.relationship("Warehouse")
+    shelf = db.relationship("Shelf")
+    created_user = db.relationship("User", foreign_keys=[created_by])
+    shipped_user = db.relationship("User", foreign_keys=[shipped_by])
+
+
+class SalesOrderItem(db.Model):
+    __tablename__ = "sales_order_items"
+
+    id = db.Column(db.Integer, primary_key=True)
+    sales_order_id = db.Column(db.Integer, db.ForeignKey("sales_orders.id"), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey("products.id"), nullable=False)
+    quantity = db.Column(db.Float, nullable=False)
+
+    sales_order = db.relationship(
+        "SalesOrder", backref=db.backref("items", lazy=True, cascade="all, delete-orphan")
+    )
+    product = db.relationship("Product")
+
+    __table_args__ = (
+        db.UniqueConstraint("sales_order_id", "product_id", name="uq_salesorderitem_order_product"),
+    )
+
+
+# Change counter per cached dataset, shared by all workers.
+class CacheVersion(db.Model):
+    __tablename__ = "cache_versions"
+
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+class CycleCount(db.Model):
+    __tablename__ = "cycle_counts"
+
+    class Status(str, Enum):
+        OPEN = "OPEN"
+        POSTED = "POSTED"
+        CANCELLED = "CANCELLED"
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    warehouse_id = db.Column(db.Integer, db.ForeignKey("warehouses.id"), nullable=False)
+    # Null counts the whole warehouse.
+    shelf_id = db.Column(db.Integer, db.ForeignKey("shelves.id"), nullable=True)
+
+    status = db.Column(db.String(20), nullable=False, default=Status.OPEN.value, index=True)
+    reason = db.Column(db.String(200), nullable=False)
+    note = db.Column(db.Text)
+
+    created_by = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    posted_by = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True)
+    posted_at = db.Column(db.DateTime, nullable=True)
+
+    warehouse = db.relationship("Warehouse")
+    shelf = db.relationship("Shelf")
+    created_user = db.relationship("User", foreign_keys=[created_by])
+    posted_user = db.relationship("User", foreign_keys=[posted_by])
+
+
+class CycleCountLine(db.Model):
+    __tablename__ = "cycle_count_lines"
+
+    id = db.Column(db.Integer, primary_key=True)
+    cycle_count_id = db.Column(db.Integer, db.ForeignKey("cycle_counts.id"), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey("products.id"), nullable=False)
+    shelf_id = db.Column(db.Integer, db.ForeignKey("shelves.id"), nullable=True)
+    # Level quantity frozen when the count was opened; null counted = not counted yet.
+    expected = db.Column(db.Float, nullable=False, default=0)
+    counted = db.Column(db.Float, nullable=True)
+
+    product = db.relationship("Product")
+    shelf = db.relationship("Shelf")
+
+    __table_args__ = (
+        db.UniqueConstraint(
+            "cycle_count_id", "product_id", "shelf_id", name="uq_cyclecountline_count_product_shelf"
+        ),
+    )
+
+
+# Movement totals per day and (as-booked) category, warehouse and type; the
+# report engine reads it instead of scanning movements when it can.
+class MovementRollup(db.Model):
+    __tablename__ = "movement_rollups"
+
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey("categories.id"), nullable=True)
+    warehouse_id = db.Column(db.Integer, db.ForeignKey("warehouses.id"), nullable=False)
+    movement_type = db.Column(db.String(10), nullable=False)
+    reference_type = db.Column(db.String(50), nullable=False)
+
+    movements = db.Column(db.Integer, nullable=False, default=0)
+    quantity = db.Column(db.Float, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index("ix_movementrollup_day_warehouse", "day", "warehouse_id"),
+    )
+
+
+# Highest movement id folded into a rollup.
+class RollupState(db.Model):
+    __tablename__ = "rollup_state"
+
+    name = db.Column(db.String(50), primary_key=True)
+    last_movement_id = db.Column(db.Integer, nullable=False, default=0)
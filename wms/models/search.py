@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+from sqlalchemy import DDL, event
+
+from ..extensions import db
+
+# Full-text index over movement note/reason and the product's name/SKU, keyed
+# by movement id. SQLite only (FTS5); rows are written by triggers so every
+# insert path (ORM, bulk, group commit) keeps it in sync. Archiving moves a
+# movement without changing its id, so the index covers hot and archived rows.
+# The tokenizer strips accents (ş -> s, ü -> u) but has no mapping for the
+# dotless ı, so text is indexed with ı folded to i as well.
+SEARCH_TABLE = "movement_search"
+
+
+def fold(expr: str) -> str:
+    return f"replace({expr}, 'ı', 'i')"
+
+
+SEARCH_DDL = (
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+        note, reason, product, sku, tokenize = 'unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_ai AFTER INSERT ON stock_movements BEGIN
+        INSERT INTO {SEARCH_TABLE} (rowid, note, reason, product, sku)
+        SELECT new.id, {fold('new.note')}, {fold('new.reason')}, {fold('p.name')}, {fold('p.sku')}
+        FROM products p WHERE p.id = new.product_id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_au AFTER UPDATE OF note, reason ON stock_movements BEGIN
+        UPDATE {SEARCH_TABLE} SET note = {fold('new.note')}, reason = {fold('new.reason')} WHERE rowid = new.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_product_au AFTER UPDATE OF name, sku ON products BEGIN
+        UPDATE {SEARCH_TABLE} SET product = {fold('new.name')}, sku = {fold('new.sku')}
+        WHERE rowid IN (
+            SELECT id FROM stock_movements WHERE product_id = new.id
+            UNION ALL SELECT id FROM stock_movements_archive WHERE product_id = new.id
+        );
+    END""",
+)
+
+for _statement in SEARCH_DDL:
+    event.listen(db.metadata, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+event.listen(
+    db.metadata, "before_drop", DDL(f"DROP TABLE IF EXISTS {SEARCH_TABLE}").execute_if(dialect="sqlite")
+)
+
+
+def include_name(name, type_, parent_names) -> bool:
+    """Alembic filter for objects the search migration creates outside the metadata:
+    the FTS table with its shadow tables, and the PostgreSQL trigram indexes."""
+    if type_ == "table":
+        return not (name or "").startswith(SEARCH_TABLE)
+    if type_ == "index":
+        return not (name or "").endswith("_trgm")
+    return True
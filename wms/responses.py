@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import os
+import zlib
+from typing import Iterable, Iterator
+
+from flask import Flask, Response, get_flashed_messages, request, stream_template
+from flask_wtf.csrf import generate_csrf
+from jinja2 import FileSystemBytecodeCache
+
+try:  # optional; gzip is always available
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    "text/html",
+    "text/css",
+    "text/csv",
+    "text/plain",
+    "text/javascript",
+    "application/javascript",
+    "application/json",
+    "image/svg+xml",
+}
+
+
+def _buffered(chunks: Iterable[str], size: int) -> Iterator[str]:
+    buf: list[str] = []
+    n = 0
+    for chunk in chunks:
+        buf.append(chunk)
+        n += len(chunk)
+        if n >= size:
+            yield "".join(buf)
+            buf = []
+            n = 0
+    if buf:
+        yield "".join(buf)
+
+
+def stream_page(template_name: str, *, buffer_size: int = 16384, **context) -> Response:
+    """stream_template for large tables, sent in buffer_size chunks.
+
+    The session is saved before the body is streamed, so flashed messages and
+    the CSRF token are pulled into the request context up front; otherwise the
+    template would consume them after the cookie has already been written."""
+    get_flashed_messages(with_categories=True)
+    generate_csrf()
+    return Response(_buffered(stream_template(template_name, **context), buffer_size), mimetype="text/html")
+
+
+class _Encoder:
+    def __init__(self, encoding: str, level: int, brotli_quality: int) -> None:
+        self.encoding = encoding
+        if encoding == "br":
+            self._c = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._c = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._c.process(data)
+        return self._c.compress(data)
+
+    def flush(self) -> bytes:
+        if self.encoding == "br":
+            return self._c.flush()
+        return self._c.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._c.finish() if self.encoding == "br" else self._c.flush()
+
+
+def _pick_encoding(app: Flask) -> str | None:
+    offered = ["br", "gzip"] if brotli is not None and app.config.get("COMPRESS_BROTLI", True) else ["gzip"]
+    return request.accept_encodings.best_match(offered)
+
+
+def _compress_stream(body: Iterable[bytes], encoder: _Encoder) -> Iterator[bytes]:
+    for chunk in body:
+        if not chunk:
+            continue
+        if isinstance(chunk, str):
+            chunk = chunk.encode("utf-8")
+        # Flush per chunk so streamed pages keep their time-to-first-byte.
+        out = encoder.compress(chunk) + encoder.flush()
+        if out:
+            yield out
+    yield encoder.finish()
+
+
+def init_compression(app: Flask) -> None:
+    if not app.config.get("COMPRESS_ENABLED", True):
+        return
+
+    min_size = app.config.get("COMPRESS_MIN_SIZE", 500)
+    level = app.config.get("COMPRESS_LEVEL", 6)
+    brotli_quality = app.config.get("COMPRESS_BROTLI_QUALITY", 4)
+
+    @app.after_request
+    def _compress_response(response: Response) -> Response:
+        if (
+            response.status_code < 200
+            or response.status_code in (204, 206, 304)
+            or response.direct_passthrough
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES
+        ):
+            return response
+
+        response.vary.add("Accept-Encoding")
+        encoding = _pick_encoding(app)
+        if encoding is None:
+            return response
+
+        encoder = _Encoder(encoding, level, brotli_quality)
+        if response.is_streamed:
+            response.response = _compress_stream(response.response, encoder)
+            response.headers.pop("Content-Length", None)
+        else:
+            data = response.get_data()
+            if len(data) < min_size:
+                return response
+            response.set_data(encoder.compress(data) + encoder.finish())
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+
+def init_template_cache(app: Flask) -> None:
+    """Keep compiled templates in <instance>/jinja_cache across restarts."""
+    if not app.config.get("JINJA_BYTECODE_CACHE", True):
+        return
+    directory = os.path.join(app.instance_path, "jinja_cache")
+    os.makedirs(directory, exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
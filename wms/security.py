@@ -2,11 +2,105 @@ from __future__ import annotations
 
 from functools import wraps
 
-from flask import abort
-from flask_login import current_user, login_required
+from flask import abort, current_app
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
 
+from .caching import LRUCache, bump_cache_version, register_cache, versions
+from .extensions import db
+from .models import User
 
+USERS_CACHE_VERSION = "users"
+_AUTH_FIELDS = ("username", "role", "is_active", "password_hash")
+
+
+class AuthUser:
+    """Read-only snapshot of a User for current_user.
+
+    Views only need id, username and role; anything that writes goes through a
+    fresh User row."""
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, user: User) -> None:
+        self.id = user.id
+        self.username = user.username
+        self.role = user.role
+        self.is_active = bool(user.is_active)
+
+    @property
+    def is_admin(self) -> bool:
+        return self.role == User.Role.ADMIN.value
+
+    def get_id(self) -> str:
+        return str(self.id)
+
+
+_user_cache: LRUCache | None = None
+
+
+def _get_user_cache() -> LRUCache:
+    global _user_cache
+    if _user_cache is None:
+        _user_cache = register_cache(
+            "auth_users",
+            LRUCache(
+                maxsize=current_app.config.get("AUTH_CACHE_SIZE", 1024),
+                ttl=current_app.config.get("AUTH_CACHE_TTL_SECONDS", 300),
+            ),
+        )
+    return _user_cache
+
+
+def load_user(user_id: str) -> AuthUser | None:
+    """Flask-Login user_loader."""
+    return load_cached_user(int(user_id))
+
+
+def load_cached_user(user_id: int) -> AuthUser | None:
+    """User loader backed by an LRU/TTL cache.
+
+    Entries are stamped with the "users" cache version; any change to a user's
+    role, active flag or password bumps it, so stale entries are dropped in this
+    worker at once and in other workers within the version check interval."""
+    if not current_app.config.get("AUTH_CACHE_ENABLED", True):
+        user = db.session.get(User, user_id)
+        return AuthUser(user) if user and user.is_active else None
+
+    cache = _get_user_cache()
+    version = versions.get(USERS_CACHE_VERSION)
+    item = cache.get(user_id)
+    if item is not None and item[0] == version:
+        auth_user = item[1]
+    else:
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        auth_user = AuthUser(user)
+        cache.set(user_id, (version, auth_user))
+    # Deactivated users lose their session on the next request.
+    return auth_user if auth_user.is_active else None
+
+
+@event.listens_for(Session, "before_flush")
+def _bump_users_version(session: Session, flush_context, instances) -> None:
+    for obj in session.dirty:
+        if not isinstance(obj, User):
+            continue
+        state = inspect(obj)
+        if any(state.attrs[f].history.has_changes() for f in _AUTH_FIELDS):
+            bump_cache_version(USERS_CACHE_VERSION, session)
+            return
+    if any(isinstance(obj, User) for obj in session.deleted):
+        bump_cache_version(USERS_CACHE_VERSION, session)
+
+
+# Flask-Login is imported when a view is decorated, i.e. by the web layer only;
+# CLI apps import this module for the listener above.
 def admin_required(view_func):
+    from flask_login import current_user, login_required
+
     @wraps(view_func)
     @login_required
     def wrapper(*args, **kwargs):
@@ -18,6 +112,8 @@ def admin_required(view_func):
 
 
 def staff_allowed(view_func):
+    from flask_login import login_required
+
     @wraps(view_func)
     @login_required
     def wrapper(*args, **kwargs):
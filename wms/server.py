@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import atexit
+import signal
+import threading
+import time
+
+from flask import Flask, jsonify
+
+from .db_routing import REPLICA_BIND_KEY
+from .extensions import db
+
+
+class ServerState:
+    def __init__(self) -> None:
+        self.draining = False
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._shut_down = False
+
+
+def _state(app: Flask) -> ServerState:
+    return app.extensions["server"]
+
+
+def after_fork(app: Flask) -> None:
+    """Per-worker reset after a pre-forking server copied the preloaded app.
+
+    Pooled connections opened in the master are dropped without closing them
+    (the master still owns them), so every worker opens its own. Threads do
+    not survive fork: the group-commit writer is forgotten and restarts on
+    first use; the WAL checkpointer keeps running in the master only.
+    Metrics recorded in the master are not carried into the workers."""
+    from .metrics import registry
+
+    registry.reset()
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+    app.extensions.pop("group_commit", None)
+    app.extensions["server"] = ServerState()
+
+
+def start_draining(app: Flask) -> None:
+    """Make /healthz report 503 "draining" while in-flight requests finish."""
+    _state(app).draining = True
+
+
+def drain_on_signal(app: Flask, signum: int = signal.SIGTERM) -> None:
+    """Start draining as soon as the worker receives `signum`.
+
+    The handler already installed (the server's graceful stop) still runs
+    afterwards; call this after the server set up its own signal handlers."""
+    previous = signal.getsignal(signum)
+
+    def handler(sig, frame):
+        start_draining(app)
+        if callable(previous):
+            previous(sig, frame)
+
+    signal.signal(signum, handler)
+
+
+def shutdown(app: Flask, timeout: float = 10.0) -> None:
+    """Drain and release the worker's resources; safe to call more than once.
+
+    /healthz reports 503 from here on (if drain_on_signal did not already
+    make it). Movements already queued for the
+    group-commit writer are booked before it stops (new submissions are
+    refused), then the connection pools are closed."""
+    state = _state(app)
+    with state._lock:
+        if state._shut_down:
+            return
+        state._shut_down = True
+        state.draining = True
+
+    writer = app.extensions.get("group_commit")
+    if writer is not None and writer.is_alive():
+        writer.stop(timeout)
+
+    checkpointer = app.extensions.get("wal_checkpointer")
+    if checkpointer is not None and checkpointer.is_alive():
+        checkpointer.stop()
+        checkpointer.checkpoint()
+
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+def _ping(engine) -> float:
+    started = time.perf_counter()
+    with engine.connect() as conn:
+        conn.exec_driver_sql("SELECT 1")
+    return (time.perf_counter() - started) * 1000
+
+
+def init_server(app: Flask) -> None:
+    app.extensions["server"] = ServerState()
+    atexit.register(shutdown, app)
+
+    @app.route("/healthz")
+    def healthz():
+        # No login: polled by the load balancer / process manager.
+        state = _state(app)
+        body: dict = {"status": "ok", "uptime_s": round(time.time() - state.started_at, 1)}
+        ok = not state.draining
+        if state.draining:
+            body["status"] = "draining"
+
+        for name, engine in (("db", db.engine), ("replica", db.engines.get(REPLICA_BIND_KEY))):
+            if engine is None:
+                continue
+            try:
+                body[f"{name}_ms"] = round(_ping(engine), 2)
+            except Exception as e:
+                ok = False
+                body["status"] = "error"
+                body[f"{name}_error"] = type(e).__name__
+            pool = engine.pool
+            if hasattr(pool, "checkedout"):
+                body[f"{name}_pool"] = {"size": pool.size(), "checked_out": pool.checkedout()}
+
+        writer = app.extensions.get("group_commit")
+        if writer is not None:
+            body["group_commit_pending"] = writer.pending
+
+        return jsonify(body), 200 if ok else 503
@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime
+
+from ..extensions import db
+from ..models import StockLevel, StockMovement, StockMovementArchive, StockOpeningBalance
+from ..sqlite_profile import begin_immediate
+from .stock_service import signed_quantity
+
+_ARCHIVE_COLUMNS = (
+    "id",
+    "product_id",
+    "warehouse_id",
+    "shelf_id",
+    "movement_type",
+    "quantity",
+    "unit_cost",
+    "reference_type",
+    "reason",
+    "note",
+    "created_by",
+    "created_at",
+)
+
+
+@dataclass
+class ArchiveResult:
+    moved: int = 0
+    chunks: int = 0
+    levels: int = 0
+
+
+@dataclass(frozen=True)
+class LedgerMismatch:
+    product_id: int
+    warehouse_id: int
+    shelf_id: int | None
+    stock_level: float
+    ledger: float
+
+
+def _level_key(product_id: int, warehouse_id: int, shelf_id: int | None) -> tuple[int, int, int | None]:
+    return (product_id, warehouse_id, shelf_id)
+
+
+def _opening_row(
+    key: tuple[int, int, int | None], before: datetime, cache: dict
+) -> StockOpeningBalance:
+    row = cache.get(key)
+    if row is not None:
+        return row
+
+    product_id, warehouse_id, shelf_id = key
+    row = StockOpeningBalance.query.filter_by(
+        product_id=product_id, warehouse_id=warehouse_id, shelf_id=shelf_id, as_of=before
+    ).first()
+    if row is None:
+        previous = (
+            StockOpeningBalance.query.filter_by(
+                product_id=product_id, warehouse_id=warehouse_id, shelf_id=shelf_id
+            )
+            .filter(StockOpeningBalance.as_of < before)
+            .order_by(StockOpeningBalance.as_of.desc())
+            .first()
+        )
+        row = StockOpeningBalance(
+            product_id=product_id,
+            warehouse_id=warehouse_id,
+            shelf_id=shelf_id,
+            as_of=before,
+            quantity=float(previous.quantity) if previous else 0.0,
+        )
+        db.session.add(row)
+    cache[key] = row
+    return row
+
+
+def archive_movements(before: datetime, *, chunk_size: int = 5000) -> ArchiveResult:
+    """Move movements created before `before` into stock_movements_archive.
+
+    Each chunk is its own transaction: the chunk's signed quantities are
+    folded into the opening-balance rows as of `before`, the rows are copied
+    to the archive and deleted from the hot table. An interrupted run can
+    simply be restarted with the same date."""
+    result = ArchiveResult()
+    touched: set[tuple[int, int, int | None]] = set()
+
+    while True:
+        # The chunk is chosen under the write lock, so movements booked
+        # meanwhile cannot change it before it is folded and moved.
+        begin_immediate(db.session())
+        try:
+            moved = _archive_chunk(before, chunk_size, touched)
+        except Exception:
+            db.session.rollback()
+            raise
+        if not moved:
+            break
+        result.moved += moved
+        result.chunks += 1
+
+    result.levels = len(touched)
+    return result
+
+
+def _archive_chunk(before: datetime, chunk_size: int, touched: set[tuple[int, int, int | None]]) -> int:
+    """Fold, copy and delete the oldest chunk; returns how many movements it moved."""
+    ids = [
+        mid
+        for (mid,) in db.session.query(StockMovement.id)
+        .filter(StockMovement.created_at < before)
+        .order_by(StockMovement.id.asc())
+        .limit(chunk_size)
+        .all()
+    ]
+    if not ids:
+        db.session.rollback()
+        return 0
+
+    sums = (
+        db.session.query(
+            StockMovement.product_id,
+            StockMovement.warehouse_id,
+            StockMovement.shelf_id,
+            db.func.sum(signed_quantity()),
+        )
+        .filter(StockMovement.id.in_(ids))
+        .group_by(StockMovement.product_id, StockMovement.warehouse_id, StockMovement.shelf_id)
+        .all()
+    )
+    cache: dict = {}
+    for product_id, warehouse_id, shelf_id, qty in sums:
+        key = _level_key(product_id, warehouse_id, shelf_id)
+        row = _opening_row(key, before, cache)
+        row.quantity = float(row.quantity or 0) + float(qty or 0)
+        touched.add(key)
+    db.session.flush()
+
+    columns = [getattr(StockMovement, c) for c in _ARCHIVE_COLUMNS]
+    db.session.execute(
+        db.insert(StockMovementArchive).from_select(
+            list(_ARCHIVE_COLUMNS) + ["archived_at"],
+            db.select(*columns, db.literal(datetime.utcnow(), db.DateTime)).where(
+                StockMovement.id.in_(ids)
+            ),
+        )
+    )
+    db.session.execute(db.delete(StockMovement).where(StockMovement.id.in_(ids)))
+    db.session.commit()
+    return len(ids)
+
+
+def verify_ledger() -> list[LedgerMismatch]:
+    """Check that latest opening balance + hot movements equals every StockLevel."""
+    latest = (
+        db.session.query(
+            StockOpeningBalance.product_id,
+            StockOpeningBalance.warehouse_id,
+            StockOpeningBalance.shelf_id,
+            db.func.max(StockOpeningBalance.as_of).label("as_of"),
+        )
+        .group_by(
+            StockOpeningBalance.product_id,
+            StockOpeningBalance.warehouse_id,
+            StockOpeningBalance.shelf_id,
+        )
+        .subquery()
+    )
+    ledger: dict[tuple[int, int, int | None], float] = {}
+    for ob in (
+        db.session.query(StockOpeningBalance)
+        .join(
+            latest,
+            db.and_(
+                latest.c.product_id == StockOpeningBalance.product_id,
+                latest.c.warehouse_id == StockOpeningBalance.warehouse_id,
+                db.func.coalesce(latest.c.shelf_id, 0) == db.func.coalesce(StockOpeningBalance.shelf_id, 0),
+                latest.c.as_of == StockOpeningBalance.as_of,
+            ),
+        )
+        .all()
+    ):
+        ledger[_level_key(ob.product_id, ob.warehouse_id, ob.shelf_id)] = float(ob.quantity)
+
+    for product_id, warehouse_id, shelf_id, qty in (
+        db.session.query(
+            StockMovement.product_id,
+            StockMovement.warehouse_id,
+            StockMovement.shelf_id,
+            db.func.sum(signed_quantity()),
+        )
+        .group_by(StockMovement.product_id, StockMovement.warehouse_id, StockMovement.shelf_id)
+        .all()
+    ):
+        key = _level_key(product_id, warehouse_id, shelf_id)
+        ledger[key] = ledger.get(key, 0.0) + float(qty or 0)
+
+    mismatches: list[LedgerMismatch] = []
+    seen: set[tuple[int, int, int | None]] = set()
+    for sl in StockLevel.query.all():
+        key = _level_key(sl.product_id, sl.warehouse_id, sl.shelf_id)
+        seen.add(key)
+        expected = ledger.get(key, 0.0)
+        if abs(float(sl.quantity or 0) - expected) > 1e-6:
+            mismatches.append(LedgerMismatch(*key, float(sl.quantity or 0), expected))
+    for key, expected in ledger.items():
+        if key not in seen and abs(expected) > 1e-6:
+            mismatches.append(LedgerMismatch(*key, 0.0, expected))
+    return mismatches
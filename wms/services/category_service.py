@@ -0,0 +1,250 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date
+
+from ..caching import bump_cache_version
+from ..choices import CATEGORIES
+from ..extensions import db
+from ..models import Category, CategoryClosure, MovementRollup, Product, StockLevel
+from ..sqlite_profile import begin_immediate
+
+PATH_SEPARATOR = " / "
+
+
+class CategoryError(ValueError):
+    pass
+
+
+@dataclass
+class CategoryNode:
+    id: int
+    name: str
+    parent_id: int | None
+    depth: int
+    path: str
+
+
+@dataclass
+class CategoryTotals:
+    own: float = 0.0
+    subtree: float = 0.0
+    own_products: int = 0
+    subtree_products: int = 0
+
+
+@dataclass
+class CategoryMovements:
+    qty_in: float = 0.0
+    qty_out: float = 0.0
+    adjust: float = 0.0
+    movements: int = 0
+
+    @property
+    def net(self) -> float:
+        return self.qty_in - self.qty_out + self.adjust
+
+
+def category_tree(*, session=None) -> list[CategoryNode]:
+    """All categories in depth-first order, siblings by name, with their full path."""
+    session = session or db.session
+    rows = session.query(Category.id, Category.name, Category.parent_id).order_by(Category.name.asc()).all()
+    children: dict[int | None, list[tuple[int, str]]] = {}
+    for cid, name, parent_id in rows:
+        children.setdefault(parent_id, []).append((cid, name))
+
+    out: list[CategoryNode] = []
+    stack = [(cid, name, None, 0, name) for cid, name in reversed(children.get(None, []))]
+    while stack:
+        cid, name, parent_id, depth, path = stack.pop()
+        out.append(CategoryNode(cid, name, parent_id, depth, path))
+        for child_id, child_name in reversed(children.get(cid, [])):
+            stack.append((child_id, child_name, cid, depth + 1, path + PATH_SEPARATOR + child_name))
+    return out
+
+
+def subtree_ids(category_id: int):
+    """Select of the category's id and all its descendants' ids."""
+    return db.select(CategoryClosure.descendant_id).where(CategoryClosure.ancestor_id == category_id)
+
+
+def _link(category_id: int, parent_id: int | None) -> None:
+    """Closure rows joining a single new category to itself and its ancestors."""
+    db.session.add(CategoryClosure(ancestor_id=category_id, descendant_id=category_id, depth=0))
+    if parent_id is not None:
+        db.session.execute(
+            db.insert(CategoryClosure).from_select(
+                ["ancestor_id", "descendant_id", "depth"],
+                db.select(
+                    CategoryClosure.ancestor_id, db.literal(category_id), CategoryClosure.depth + 1
+                ).where(CategoryClosure.descendant_id == parent_id),
+            )
+        )
+
+
+def _check_name(name: str, category_id: int | None = None) -> str:
+    name = (name or "").strip()
+    if not name:
+        raise CategoryError("Kategori adı zorunludur.")
+    q = Category.query.filter(Category.name == name)
+    if category_id is not None:
+        q = q.filter(Category.id != category_id)
+    if q.first() is not None:
+        raise CategoryError("Bu kategori zaten mevcut.")
+    return name
+
+
+def create_category(name: str, parent_id: int | None = None) -> Category:
+    begin_immediate(db.session())
+    try:
+        name = _check_name(name)
+        if parent_id is not None and db.session.get(Category, parent_id) is None:
+            raise CategoryError("Üst kategori bulunamadı.")
+        category = Category(name=name, parent_id=parent_id)
+        db.session.add(category)
+        db.session.flush()
+        _link(category.id, parent_id)
+        bump_cache_version(CATEGORIES)
+        db.session.commit()
+        return category
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def update_category(category_id: int, name: str, parent_id: int | None) -> Category:
+    """Rename a category and/or move it (with its subtree) under another parent."""
+    begin_immediate(db.session())
+    try:
+        category = db.session.get(Category, category_id)
+        if category is None:
+            raise CategoryError("Kategori bulunamadı.")
+        category.name = _check_name(name, category_id)
+
+        if parent_id != category.parent_id:
+            if parent_id is not None:
+                if db.session.get(Category, parent_id) is None:
+                    raise CategoryError("Üst kategori bulunamadı.")
+                inside = db.session.get(CategoryClosure, (category_id, parent_id))
+                if inside is not None:
+                    raise CategoryError("Kategori kendi alt kategorisinin altına taşınamaz.")
+
+            subtree = subtree_ids(category_id)
+            db.session.execute(
+                db.delete(CategoryClosure).where(
+                    CategoryClosure.descendant_id.in_(subtree),
+                    CategoryClosure.ancestor_id.not_in(subtree),
+                )
+            )
+            if parent_id is not None:
+                above = db.aliased(CategoryClosure)
+                below = db.aliased(CategoryClosure)
+                db.session.execute(
+                    db.insert(CategoryClosure).from_select(
+                        ["ancestor_id", "descendant_id", "depth"],
+                        # Every ancestor of the new parent x every node of the subtree.
+                        db.select(above.ancestor_id, below.descendant_id, above.depth + below.depth + 1)
+                        .select_from(above)
+                        .join(below, db.true())
+                        .where(above.descendant_id == parent_id, below.ancestor_id == category_id),
+                    )
+                )
+            category.parent_id = parent_id
+
+        bump_cache_version(CATEGORIES)
+        db.session.commit()
+        return category
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def rebuild_category_closure() -> int:
+    """Recreate category_closure from parent_id; returns the number of rows."""
+    begin_immediate(db.session())
+    try:
+        db.session.execute(db.delete(CategoryClosure))
+        parents = dict(db.session.query(Category.id, Category.parent_id).all())
+        rows = []
+        for cid in parents:
+            rows.append({"ancestor_id": cid, "descendant_id": cid, "depth": 0})
+            depth, seen, parent = 1, {cid}, parents[cid]
+            while parent is not None and parent not in seen:
+                rows.append({"ancestor_id": parent, "descendant_id": cid, "depth": depth})
+                seen.add(parent)
+                parent, depth = parents.get(parent), depth + 1
+        if rows:
+            db.session.execute(db.insert(CategoryClosure), rows)
+        db.session.commit()
+        return len(rows)
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def _ancestors(session) -> dict[int, list[int]]:
+    """Each category's ancestors, itself included, read from the closure table."""
+    out: dict[int, list[int]] = {}
+    for ancestor_id, descendant_id in session.query(CategoryClosure.ancestor_id, CategoryClosure.descendant_id):
+        out.setdefault(descendant_id, []).append(ancestor_id)
+    return out
+
+
+def category_stock(warehouse_id: int | None = None, *, session=None) -> dict[int | None, CategoryTotals]:
+    """Stock quantity and product count per category, own and including subcategories.
+
+    Levels and products are summed per category in SQL; the (small) closure
+    table then adds each category's totals to all of its ancestors."""
+    session = session or db.session
+    stock = (
+        session.query(Product.category_id, db.func.sum(StockLevel.quantity))
+        .join(StockLevel, StockLevel.product_id == Product.id)
+        .group_by(Product.category_id)
+    )
+    if warehouse_id is not None:
+        stock = stock.filter(StockLevel.warehouse_id == warehouse_id)
+    products = session.query(Product.category_id, db.func.count(Product.id)).group_by(Product.category_id)
+
+    totals: dict[int | None, CategoryTotals] = {}
+    ancestors = _ancestors(session)
+    for cid, qty in stock.all():
+        qty = float(qty or 0)
+        totals.setdefault(cid, CategoryTotals()).own = qty
+        for aid in ancestors.get(cid, [cid]):
+            totals.setdefault(aid, CategoryTotals()).subtree += qty
+    for cid, n in products.all():
+        totals.setdefault(cid, CategoryTotals()).own_products = int(n)
+        for aid in ancestors.get(cid, [cid]):
+            totals.setdefault(aid, CategoryTotals()).subtree_products += int(n)
+    return totals
+
+
+def category_movements(
+    start: date, end: date, warehouse_id: int | None = None, *, session=None
+) -> dict[int | None, CategoryMovements]:
+    """IN/OUT/ADJUST totals per category subtree from movement_rollups.
+
+    Call report_engine.refresh_movement_rollups() first to include the
+    latest movements."""
+    session = session or db.session
+    own = session.query(
+        MovementRollup.category_id,
+        *[
+            db.func.sum(db.case((MovementRollup.movement_type == t, MovementRollup.quantity), else_=0))
+            for t in ("IN", "OUT", "ADJUST")
+        ],
+        db.func.sum(MovementRollup.movements),
+    ).filter(MovementRollup.day >= start, MovementRollup.day <= end)
+    if warehouse_id is not None:
+        own = own.filter(MovementRollup.warehouse_id == warehouse_id)
+
+    out: dict[int | None, CategoryMovements] = {}
+    ancestors = _ancestors(session)
+    for cid, qty_in, qty_out, adjust, movements in own.group_by(MovementRollup.category_id).all():
+        for aid in ancestors.get(cid, [cid]):
+            acc = out.setdefault(aid, CategoryMovements())
+            acc.qty_in += float(qty_in or 0)
+            acc.qty_out += float(qty_out or 0)
+            acc.adjust += float(adjust or 0)
+            acc.movements += int(movements or 0)
+    return out
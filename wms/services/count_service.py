@@ -0,0 +1,374 @@
+from __future__ import annotations
+
+import csv
+import io
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+
+from ..extensions import db
+from ..models import CycleCount, CycleCountLine, Product, Shelf, StockLevel, Warehouse
+from ..sqlite_profile import begin_immediate
+from .stock_service import StockError, StockMovementRequest, create_stock_movements_batch
+
+_HEADER_WORDS = {"sku", "barcode", "barkod", "kod", "code", "ürün"}
+_MAX_REPORTED_ERRORS = 5
+
+
+@dataclass
+class CountSummary:
+    lines: int
+    counted: int
+    variances: int
+
+
+@dataclass
+class VarianceRow:
+    product_id: int
+    sku: str
+    product: str
+    shelf_id: int | None
+    shelf: str | None
+    expected: float
+    counted: float
+    current: float
+
+    @property
+    def difference(self) -> float:
+        return self.counted - self.expected
+
+    @property
+    def target(self) -> float:
+        # Movements booked while the count was running are kept: only the
+        # counted difference is applied to today's level.
+        return self.current + self.difference
+
+
+def _get_count(count_id: int, *, open_only: bool = True) -> CycleCount:
+    count = db.session.get(CycleCount, count_id)
+    if count is None:
+        raise StockError("Sayım bulunamadı.")
+    if open_only and count.status != CycleCount.Status.OPEN.value:
+        raise StockError("Sayım açık değil.")
+    return count
+
+
+def open_cycle_count(
+    warehouse_id: int, shelf_id: int | None, reason: str, created_by: int, note: str | None = None
+) -> CycleCount:
+    """Open a count for a shelf (or a whole warehouse) and freeze its expected quantities."""
+    reason = (reason or "").strip()
+    if not reason:
+        raise StockError("Sayım için sebep zorunludur.")
+
+    begin_immediate(db.session())
+    try:
+        wh = db.session.get(Warehouse, warehouse_id)
+        if not wh or not wh.is_active:
+            raise StockError("Depo pasif veya bulunamadı.")
+        if shelf_id is not None:
+            shelf = db.session.get(Shelf, shelf_id)
+            if not shelf or shelf.warehouse_id != warehouse_id:
+                raise StockError("Seçilen raf bu depoya ait değil.")
+
+        overlapping = CycleCount.query.filter(
+            CycleCount.warehouse_id == warehouse_id,
+            CycleCount.status == CycleCount.Status.OPEN.value,
+        )
+        if shelf_id is not None:
+            overlapping = overlapping.filter(
+                db.or_(CycleCount.shelf_id.is_(None), CycleCount.shelf_id == shelf_id)
+            )
+        if overlapping.first() is not None:
+            raise StockError("Bu depo/raf için açık bir sayım var.")
+
+        count = CycleCount(
+            warehouse_id=warehouse_id,
+            shelf_id=shelf_id,
+            status=CycleCount.Status.OPEN.value,
+            reason=reason,
+            note=note,
+            created_by=created_by,
+        )
+        db.session.add(count)
+        db.session.flush()
+
+        levels = db.select(
+            db.literal(count.id), StockLevel.product_id, StockLevel.shelf_id, StockLevel.quantity
+        ).where(StockLevel.warehouse_id == warehouse_id)
+        if shelf_id is not None:
+            levels = levels.where(StockLevel.shelf_id == shelf_id)
+        db.session.execute(
+            db.insert(CycleCountLine).from_select(
+                ["cycle_count_id", "product_id", "shelf_id", "expected"], levels
+            )
+        )
+        db.session.commit()
+        return count
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def _parse_rows(text: str) -> list[tuple[int, str, float | None, str | None]]:
+    """(line number, product code, quantity, shelf code) per non-empty row.
+
+    Rows are "code[,quantity[,shelf]]" with "," ";" or tab separators. A row
+    with only a code is one scan and counts 1; an empty quantity is skipped."""
+    try:
+        dialect = csv.Sniffer().sniff(text[:4096], delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+
+    rows: list[tuple[int, str, float | None, str | None]] = []
+    for n, row in enumerate(csv.reader(io.StringIO(text), dialect), 1):
+        cells = [c.strip() for c in row]
+        if not cells or not cells[0]:
+            continue
+        if n == 1 and cells[0].lower() in _HEADER_WORDS:
+            continue
+        if len(cells) == 1:
+            qty: float | None = 1.0
+        elif not cells[1]:
+            continue
+        else:
+            try:
+                qty = float(cells[1].replace(",", "."))
+            except ValueError:
+                qty = None
+        shelf = cells[2] if len(cells) > 2 and cells[2] else None
+        rows.append((n, cells[0], qty, shelf))
+    return rows
+
+
+def submit_counts(count_id: int, text: str, *, accumulate: bool = False) -> int:
+    """Record counted quantities from scanner or CSV text; returns the number of locations.
+
+    Codes are SKUs or barcodes, resolved with one query. Quantities for the
+    same product and shelf are summed; with accumulate they are added to what
+    was counted before (e.g. several scanner sessions), otherwise they replace
+    it. Any bad row rejects the whole submission."""
+    count = _get_count(count_id)
+    rows = _parse_rows(text or "")
+    if not rows:
+        raise StockError("Sayım verisi boş.")
+
+    codes = {code for _, code, _, _ in rows}
+    products: dict[str, int] = {}
+    for pid, sku, barcode in db.session.query(Product.id, Product.sku, Product.barcode).filter(
+        db.or_(Product.sku.in_(codes), Product.barcode.in_(codes))
+    ):
+        products[sku] = pid
+        if barcode:
+            products.setdefault(barcode, pid)
+
+    shelf_codes = {shelf for _, _, _, shelf in rows if shelf}
+    shelves = (
+        {
+            code: sid
+            for sid, code in db.session.query(Shelf.id, Shelf.code).filter(
+                Shelf.warehouse_id == count.warehouse_id, Shelf.code.in_(shelf_codes)
+            )
+        }
+        if shelf_codes
+        else {}
+    )
+
+    totals: dict[tuple[int, int | None], float] = defaultdict(float)
+    errors: list[str] = []
+    for n, code, qty, shelf_code in rows:
+        pid = products.get(code)
+        if pid is None:
+            errors.append(f"Satır {n}: ürün bulunamadı ({code}).")
+            continue
+        if qty is None or qty < 0:
+            errors.append(f"Satır {n}: geçersiz miktar.")
+            continue
+        shelf_id = count.shelf_id
+        if shelf_code is not None:
+            shelf_id = shelves.get(shelf_code)
+            if shelf_id is None:
+                errors.append(f"Satır {n}: raf bulunamadı ({shelf_code}).")
+                continue
+            if count.shelf_id is not None and shelf_id != count.shelf_id:
+                errors.append(f"Satır {n}: raf bu sayıma ait değil ({shelf_code}).")
+                continue
+        totals[(pid, shelf_id)] += qty
+
+    if errors:
+        more = len(errors) - _MAX_REPORTED_ERRORS
+        message = " ".join(errors[:_MAX_REPORTED_ERRORS])
+        raise StockError(message + (f" (+{more} hata)" if more > 0 else ""))
+
+    begin_immediate(db.session())
+    try:
+        count = _get_count(count_id)
+        existing = {
+            (pid, sid): (line_id, counted)
+            for line_id, pid, sid, counted in db.session.query(
+                CycleCountLine.id,
+                CycleCountLine.product_id,
+                CycleCountLine.shelf_id,
+                CycleCountLine.counted,
+            ).filter(CycleCountLine.cycle_count_id == count.id)
+        }
+        updates: list[dict] = []
+        inserts: list[dict] = []
+        for (pid, sid), qty in totals.items():
+            line = existing.get((pid, sid))
+            if line is None:
+                # Found where the frozen snapshot had nothing.
+                inserts.append(
+                    {"cycle_count_id": count.id, "product_id": pid, "shelf_id": sid, "expected": 0.0, "counted": qty}
+                )
+            else:
+                line_id, counted = line
+                if accumulate and counted is not None:
+                    qty += float(counted)
+                updates.append({"id": line_id, "counted": qty})
+
+        if updates:
+            db.session.execute(db.update(CycleCountLine), updates)
+        if inserts:
+            db.session.execute(db.insert(CycleCountLine), inserts)
+        db.session.commit()
+        return len(totals)
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def count_summary(count_id: int, *, session=None) -> CountSummary:
+    session = session or db.session
+    lines, counted, variances = (
+        session.query(
+            db.func.count(CycleCountLine.id),
+            db.func.count(CycleCountLine.counted),
+            db.func.coalesce(
+                db.func.sum(
+                    db.case(
+                        (
+                            db.and_(
+                                CycleCountLine.counted.isnot(None),
+                                CycleCountLine.counted != CycleCountLine.expected,
+                            ),
+                            1,
+                        ),
+                        else_=0,
+                    )
+                ),
+                0,
+            ),
+        )
+        .filter(CycleCountLine.cycle_count_id == count_id)
+        .one()
+    )
+    return CountSummary(int(lines), int(counted), int(variances))
+
+
+def count_variances(
+    count: CycleCount, *, uncounted_as_zero: bool = False, limit: int | None = None, session=None
+) -> list[VarianceRow]:
+    """Counted vs. frozen quantities with today's level, as one joined query."""
+    session = session or db.session
+    counted = (
+        db.func.coalesce(CycleCountLine.counted, 0) if uncounted_as_zero else CycleCountLine.counted
+    )
+    q = (
+        session.query(
+            CycleCountLine.product_id,
+            Product.sku,
+            Product.name,
+            CycleCountLine.shelf_id,
+            Shelf.code,
+            CycleCountLine.expected,
+            counted,
+            db.func.coalesce(StockLevel.quantity, 0),
+        )
+        .join(Product, Product.id == CycleCountLine.product_id)
+        .outerjoin(Shelf, Shelf.id == CycleCountLine.shelf_id)
+        .outerjoin(
+            StockLevel,
+            db.and_(
+                StockLevel.product_id == CycleCountLine.product_id,
+                StockLevel.warehouse_id == count.warehouse_id,
+                StockLevel.shelf_id.is_not_distinct_from(CycleCountLine.shelf_id),
+            ),
+        )
+        .filter(CycleCountLine.cycle_count_id == count.id)
+        .filter(counted.isnot(None), counted != CycleCountLine.expected)
+        .order_by(Shelf.code.asc(), Product.name.asc())
+    )
+    if limit is not None:
+        q = q.limit(limit)
+    return [
+        VarianceRow(pid, sku, name, sid, code, float(expected), float(qty), float(current))
+        for pid, sku, name, sid, code, expected, qty, current in q.all()
+    ]
+
+
+def post_cycle_count(count_id: int, posted_by: int, *, uncounted_as_zero: bool = False) -> int:
+    """Book every variance as an ADJUST movement in one transaction; returns the count.
+
+    All movements share the count's reason. If any of them fails nothing is
+    booked."""
+    begin_immediate(db.session())
+    try:
+        count = _get_count(count_id)
+        rows = count_variances(count, uncounted_as_zero=uncounted_as_zero)
+
+        results = create_stock_movements_batch(
+            [
+                StockMovementRequest(
+                    product_id=r.product_id,
+                    warehouse_id=count.warehouse_id,
+                    shelf_id=r.shelf_id,
+                    movement_type="ADJUST",
+                    quantity=r.target,
+                    reference_type="adjustment",
+                    reason=count.reason,
+                    note=f"cycle_count:{count.id}",
+                    created_by=posted_by,
+                )
+                for r in rows
+            ],
+            manage_transaction=False,
+        )
+        errors = [f"{rows[r.index].sku}: {r.error}" for r in results if r.status == "error"]
+        if errors:
+            raise StockError("Sayım işlenemedi. " + " ".join(errors[:_MAX_REPORTED_ERRORS]))
+
+        if uncounted_as_zero:
+            db.session.execute(
+                db.update(CycleCountLine)
+                .where(CycleCountLine.cycle_count_id == count.id, CycleCountLine.counted.is_(None))
+                .values(counted=0)
+            )
+        count.status = CycleCount.Status.POSTED.value
+        count.posted_by = posted_by
+        count.posted_at = datetime.utcnow()
+        db.session.commit()
+        return len(rows)
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def cancel_cycle_count(count_id: int) -> None:
+    count = _get_count(count_id)
+    count.status = CycleCount.Status.CANCELLED.value
+    db.session.commit()
+
+
+def count_sheet(count: CycleCount, *, session=None):
+    """(sku, shelf code) per frozen location, for a blind count sheet."""
+    session = session or db.session
+    return (
+        session.query(Product.sku, Shelf.code)
+        .select_from(CycleCountLine)
+        .join(Product, Product.id == CycleCountLine.product_id)
+        .outerjoin(Shelf, Shelf.id == CycleCountLine.shelf_id)
+        .filter(CycleCountLine.cycle_count_id == count.id)
+        .order_by(Shelf.code.asc(), Product.sku.asc())
+        .yield_per(1000)
+    )
@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from ..extensions import db
+from ..models import Forecast, Product, StockMovement, StockMovementArchive
+
+FORECAST_METHODS = {"ses", "snaive"}
+
+
+@dataclass
+class ForecastResult:
+    product_ids: np.ndarray
+    weekly: np.ndarray  # products x weeks
+    week_starts: list[date]
+    timings: dict[str, float] = field(default_factory=dict)
+
+
+def _as_date(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def build_demand_matrix(start: date, days: int) -> tuple[np.ndarray, np.ndarray]:
+    """Return (product_ids, matrix) where matrix[i, d] is the OUT quantity of
+    product_ids[i] on start + d days, from hot and archived movements."""
+    product_ids = np.array(
+        [pid for (pid,) in db.session.query(Product.id).order_by(Product.id.asc()).all()],
+        dtype=np.int64,
+    )
+    matrix = np.zeros((len(product_ids), days), dtype=np.float32)
+    if not len(product_ids):
+        return product_ids, matrix
+
+    end = start + timedelta(days=days)
+    # Archived movements keep their created_at, so the window may span both tables.
+    rows = []
+    for model in (StockMovement, StockMovementArchive):
+        day_col = db.func.date(model.created_at)
+        rows += (
+            db.session.query(
+                model.product_id,
+                day_col,
+                db.func.sum(model.quantity),
+            )
+            .filter(model.movement_type == "OUT")
+            .filter(model.created_at >= datetime.combine(start, datetime.min.time()))
+            .filter(model.created_at < datetime.combine(end, datetime.min.time()))
+            .group_by(model.product_id, day_col)
+            .all()
+        )
+    if not rows:
+        return product_ids, matrix
+
+    pids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+    cols = np.fromiter(((_as_date(r[1]) - start).days for r in rows), dtype=np.int64, count=len(rows))
+    qty = np.fromiter((float(r[2] or 0) for r in rows), dtype=np.float32, count=len(rows))
+
+    row_idx = np.minimum(np.searchsorted(product_ids, pids), len(product_ids) - 1)
+    valid = (product_ids[row_idx] == pids) & (cols >= 0) & (cols < days)
+    np.add.at(matrix, (row_idx[valid], cols[valid]), qty[valid])
+    return product_ids, matrix
+
+
+def fit_weekly(matrix: np.ndarray, weeks: int, method: str = "ses", alpha: float = 0.2) -> np.ndarray:
+    """Vectorized fit over all rows; returns a (products x weeks) forecast."""
+    n = matrix.shape[0]
+    if n == 0 or matrix.shape[1] == 0:
+        return np.zeros((n, weeks), dtype=np.float32)
+
+    if method == "snaive":
+        last_week = matrix[:, -7:].sum(axis=1, dtype=np.float64)
+        return np.repeat(last_week[:, None], weeks, axis=1).astype(np.float32)
+
+    if method != "ses":
+        raise ValueError(f"Unknown forecast method: {method}")
+
+    level = matrix[:, 0].astype(np.float64)
+    for d in range(1, matrix.shape[1]):
+        level *= 1.0 - alpha
+        level += alpha * matrix[:, d]
+    return np.repeat((level * 7.0)[:, None], weeks, axis=1).astype(np.float32)
+
+
+def _fit_chunk(args: tuple[np.ndarray, int, str, float]) -> np.ndarray:
+    chunk, weeks, method, alpha = args
+    return fit_weekly(chunk, weeks, method, alpha)
+
+
+def fit_weekly_chunked(
+    matrix: np.ndarray,
+    weeks: int,
+    method: str = "ses",
+    alpha: float = 0.2,
+    *,
+    workers: int = 1,
+    chunk_size: int = 10_000,
+) -> np.ndarray:
+    if workers <= 1 or matrix.shape[0] <= chunk_size:
+        return fit_weekly(matrix, weeks, method, alpha)
+
+    chunks = [matrix[i : i + chunk_size] for i in range(0, matrix.shape[0], chunk_size)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        parts = list(pool.map(_fit_chunk, [(c, weeks, method, alpha) for c in chunks]))
+    return np.vstack(parts)
+
+
+def run_forecast(
+    *,
+    weeks: int = 4,
+    history_days: int = 730,
+    method: str = "ses",
+    alpha: float = 0.2,
+    workers: int = 1,
+    chunk_size: int = 10_000,
+    today: date | None = None,
+) -> ForecastResult:
+    if method not in FORECAST_METHODS:
+        raise ValueError(f"Unknown forecast method: {method}")
+
+    today = today or date.today()
+    start = today - timedelta(days=history_days)
+    timings: dict[str, float] = {}
+
+    t0 = time.perf_counter()
+    product_ids, matrix = build_demand_matrix(start, history_days)
+    timings["matrix"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    weekly = fit_weekly_chunked(
+        matrix, weeks, method, alpha, workers=workers, chunk_size=chunk_size
+    )
+    timings["fit"] = time.perf_counter() - t0
+
+    week_starts = [today + timedelta(weeks=w) for w in range(weeks)]
+    result = ForecastResult(product_ids=product_ids, weekly=weekly, week_starts=week_starts)
+
+    t0 = time.perf_counter()
+    store_forecasts(result, method)
+    timings["store"] = time.perf_counter() - t0
+
+    result.timings = timings
+    return result
+
+
+def store_forecasts(result: ForecastResult, method: str, batch_size: int = 5_000) -> None:
+    db.session.query(Forecast).delete(synchronize_session=False)
+
+    now = datetime.utcnow()
+    batch: list[dict] = []
+    for i, pid in enumerate(result.product_ids.tolist()):
+        for w, week_start in enumerate(result.week_starts):
+            batch.append(
+                {
+                    "product_id": pid,
+                    "week_start": week_start,
+                    "quantity": float(result.weekly[i, w]),
+                    "method": method,
+                    "created_at": now,
+                }
+            )
+        if len(batch) >= batch_size:
+            db.session.execute(db.insert(Forecast), batch)
+            batch = []
+    if batch:
+        db.session.execute(db.insert(Forecast), batch)
+
+    db.session.commit()
+
+
+def get_forecast_totals(
+    product_ids: list[int] | None = None,
+    weeks: int | None = None,
+    *,
+    session=None,
+) -> dict[int, float]:
+    """Forecast OUT quantity per product summed over the first `weeks` stored weeks."""
+    session = session or db.session
+    q = session.query(Forecast.product_id, db.func.sum(Forecast.quantity))
+    if product_ids is not None:
+        if not product_ids:
+            return {}
+        q = q.filter(Forecast.product_id.in_(product_ids))
+    if weeks is not None:
+        first = session.query(db.func.min(Forecast.week_start)).scalar()
+        if first is None:
+            return {}
+        first = _as_date(first)
+        q = q.filter(Forecast.week_start < first + timedelta(weeks=weeks))
+    return {pid: float(qty or 0) for pid, qty in q.group_by(Forecast.product_id).all()}
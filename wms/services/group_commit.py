@@ -0,0 +1,272 @@
+from __future__ import annotations
+
+import atexit
+import os
+import queue
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+from dataclasses import dataclass
+
+from flask import Flask, current_app
+
+from ..extensions import db
+from ..models import StockMovement, StockMovementArchive
+from ..sqlite_profile import begin_immediate, end_read_transaction
+from .stock_service import (
+    StockError,
+    StockMovementRequest,
+    create_stock_movement_idempotent,
+    create_stock_movements_batch,
+)
+
+
+@dataclass
+class _Item:
+    req: StockMovementRequest
+    key: str | None
+    future: Future
+
+
+class GroupCommitWriter(threading.Thread):
+    """Single writer thread that books queued movements in shared transactions.
+
+    Callers block in submit() while the writer collects whatever arrives within
+    max_wait_ms (up to max_batch items) and books it with
+    create_stock_movements_batch, so every item keeps its own validation and
+    error while the batch pays for one commit. If the shared transaction fails
+    as a whole, the items are retried one transaction each."""
+
+    def __init__(self, app: Flask, *, max_batch: int = 500, max_wait_ms: float = 5.0) -> None:
+        super().__init__(name="group-commit", daemon=True)
+        self.app = app
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: queue.Queue[_Item | None] = queue.Queue()
+        self._stopping = False
+        self.batches = 0
+        self.items = 0
+
+    def submit(
+        self, req: StockMovementRequest, idempotency_key: str | None = None, *, timeout: float = 30.0
+    ) -> tuple[int, bool]:
+        """Queue one movement and wait for it; returns (movement_id, replayed).
+
+        A movement still queued after `timeout` seconds is withdrawn and never
+        booked; one the writer already picked up is waited for."""
+        if self._stopping:
+            raise StockError("Stok yazıcısı kapanıyor, lütfen tekrar deneyin.", "shutting_down")
+        item = _Item(req, (idempotency_key or "").strip() or None, Future())
+        self._queue.put(item)
+        try:
+            return item.future.result(timeout=timeout)
+        except TimeoutError:
+            if item.future.cancel():
+                raise StockError("Stok yazıcısı yoğun, hareket kaydedilmedi; lütfen tekrar deneyin.", "timeout")
+            return item.future.result()
+
+    @property
+    def pending(self) -> int:
+        """Movements queued and not yet picked up by the writer."""
+        return self._queue.qsize()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Book what is already queued, then end the thread."""
+        self._stopping = True
+        self._queue.put(None)
+        self.join(timeout)
+
+    def run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            items = [first]
+            deadline = time.monotonic() + self.max_wait
+            stop = False
+            while len(items) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                items.append(item)
+
+            with self.app.app_context():
+                self._flush(items)
+            if stop:
+                return
+
+    def _flush(self, items: list[_Item]) -> None:
+        # Marks the rest running, so submit() can no longer withdraw them.
+        items = [it for it in items if it.future.set_running_or_notify_cancel()]
+        if not items:
+            return
+        self.batches += 1
+        self.items += len(items)
+        try:
+            begin_immediate(db.session())
+            results = create_stock_movements_batch(
+                [it.req for it in items], [it.key for it in items], manage_transaction=False
+            )
+            outcomes = [
+                (r.status, r.movement.id if r.movement is not None else None, r.error, r.reason) for r in results
+            ]
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            self._flush_one_by_one(items)
+            return
+
+        for it, (status, movement_id, error, reason) in zip(items, outcomes):
+            if status == "error":
+                it.future.set_exception(StockError(error, reason))
+            else:
+                it.future.set_result((movement_id, status == "replayed"))
+
+    def _flush_one_by_one(self, items: list[_Item]) -> None:
+        for it in items:
+            try:
+                m, replayed = create_stock_movement_idempotent(it.req, it.key)
+                it.future.set_result((m.id, replayed))
+            except Exception as e:
+                db.session.rollback()
+                it.future.set_exception(e)
+
+
+_writer_lock = threading.Lock()
+
+
+def get_group_commit_writer(app: Flask | None = None) -> GroupCommitWriter | None:
+    """The app's writer, started on first use; None unless GROUP_COMMIT_ENABLED."""
+    app = app or current_app._get_current_object()
+    if not app.config.get("GROUP_COMMIT_ENABLED", False):
+        return None
+    writer = app.extensions.get("group_commit")
+    if writer is None:
+        with _writer_lock:
+            writer = app.extensions.get("group_commit")
+            if writer is None:
+                writer = GroupCommitWriter(
+                    app,
+                    max_batch=app.config.get("GROUP_COMMIT_MAX_BATCH", 500),
+                    max_wait_ms=app.config.get("GROUP_COMMIT_MAX_WAIT_MS", 5.0),
+                )
+                writer.start()
+                atexit.register(writer.stop)
+                app.extensions["group_commit"] = writer
+    return writer
+
+
+def book_movement(
+    req: StockMovementRequest, idempotency_key: str | None = None
+) -> tuple[StockMovement | StockMovementArchive, bool]:
+    """create_stock_movement_idempotent, through the group-commit writer when enabled."""
+    writer = get_group_commit_writer()
+    if writer is None:
+        return create_stock_movement_idempotent(req, idempotency_key)
+
+    movement_id, replayed = writer.submit(req, idempotency_key)
+    # The writer committed on its own connection; a read transaction this
+    # session opened before submitting would still see the old snapshot.
+    end_read_transaction(db.session())
+    movement = db.session.get(StockMovement, movement_id) or db.session.get(
+        StockMovementArchive, movement_id
+    )
+    return movement, replayed
+
+
+def benchmark_group_commit(
+    *, threads: int = 16, per_thread: int = 50, max_wait_ms: float = 5.0
+) -> dict[str, dict[str, float]]:
+    """Book threads x per_thread IN movements concurrently on a scratch database,
+    once with one commit per request and once through the group-commit writer."""
+    from .. import create_app
+    from ..config import Config
+    from ..models import Product, Unit, User, Warehouse
+
+    results: dict[str, dict[str, float]] = {}
+    for label, grouped in (("per_request", False), ("group_commit", True)):
+        with tempfile.TemporaryDirectory() as tmp:
+
+            class BenchConfig(Config):
+                SQLALCHEMY_DATABASE_URI = "sqlite:///" + os.path.join(tmp, "bench.sqlite3")
+                SQLITE_WAL_CHECKPOINT_SECONDS = 0
+                GROUP_COMMIT_ENABLED = grouped
+                GROUP_COMMIT_MAX_WAIT_MS = max_wait_ms
+
+            app = create_app(BenchConfig, web=False)
+            with app.app_context():
+                db.create_all()
+                user = User(username="bench", role=User.Role.ADMIN.value)
+                user.set_password("bench")
+                unit = Unit(name="Adet", short_code="pcs", is_active=True)
+                wh = Warehouse(name="Bench", is_active=True)
+                db.session.add_all([user, unit, wh])
+                db.session.flush()
+                products = [
+                    Product(name=f"P{i}", sku=f"P{i}", unit_id=unit.id, is_active=True) for i in range(threads)
+                ]
+                db.session.add_all(products)
+                db.session.commit()
+                ids = (user.id, wh.id, [p.id for p in products])
+
+            errors = [0]
+            lock = threading.Lock()
+
+            def worker(n: int) -> None:
+                user_id, warehouse_id, product_ids = ids
+                failed = 0
+                with app.app_context():
+                    for i in range(per_thread):
+                        req = StockMovementRequest(
+                            product_id=product_ids[n],
+                            warehouse_id=warehouse_id,
+                            shelf_id=None,
+                            movement_type="IN",
+                            quantity=1,
+                            reference_type="purchase",
+                            reason=None,
+                            note=None,
+                            created_by=user_id,
+                        )
+                        try:
+                            book_movement(req, f"bench-{n}-{i}")
+                        except Exception:
+                            failed += 1
+                        db.session.remove()
+                with lock:
+                    errors[0] += failed
+
+            pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+            started = time.perf_counter()
+            for t in pool:
+                t.start()
+            for t in pool:
+                t.join()
+            elapsed = time.perf_counter() - started
+
+            writer = app.extensions.get("group_commit")
+            if writer is not None:
+                writer.stop()
+            with app.app_context():
+                booked = db.session.query(StockMovement).count()
+                db.engine.dispose()
+            checkpointer = app.extensions.get("wal_checkpointer")
+            if checkpointer is not None:
+                checkpointer.stop()
+
+            results[label] = {
+                "seconds": elapsed,
+                "movements_per_sec": booked / elapsed if elapsed else 0.0,
+                "booked": float(booked),
+                "errors": float(errors[0]),
+                "commits": float(writer.batches) if writer is not None else float(booked),
+            }
+    return results
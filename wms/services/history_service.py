@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import heapq
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from ..extensions import db
+from ..models import StockMovement, StockMovementArchive
+from .stock_service import signed_quantity
+
+MIN_POINTS = 2
+MAX_POINTS = 2000
+
+
+@dataclass
+class HistoryBucket:
+    start: datetime
+    min: float
+    max: float
+    last: float
+    movements: int = 1
+
+
+@dataclass
+class StockHistory:
+    product_id: int
+    warehouse_id: int | None
+    start: datetime | None
+    end: datetime | None
+    opening: float = 0.0
+    closing: float = 0.0
+    movements: int = 0
+    buckets: list[HistoryBucket] = field(default_factory=list)
+
+
+def _filtered(q, model, product_id: int, warehouse_id: int | None):
+    q = q.filter(model.product_id == product_id)
+    if warehouse_id is not None:
+        q = q.filter(model.warehouse_id == warehouse_id)
+    return q
+
+
+def _balance_before(session, product_id: int, warehouse_id: int | None, before: datetime) -> float:
+    total = 0.0
+    for model in (StockMovement, StockMovementArchive):
+        q = session.query(db.func.coalesce(db.func.sum(signed_quantity(model)), 0))
+        q = _filtered(q, model, product_id, warehouse_id).filter(model.created_at < before)
+        total += float(q.scalar() or 0)
+    return total
+
+
+def _first_movement_at(session, product_id: int, warehouse_id: int | None) -> datetime | None:
+    firsts = [
+        _filtered(session.query(db.func.min(model.created_at)), model, product_id, warehouse_id).scalar()
+        for model in (StockMovement, StockMovementArchive)
+    ]
+    firsts = [f for f in firsts if f is not None]
+    return min(firsts) if firsts else None
+
+
+def _stream(
+    session, model, product_id: int, warehouse_id: int | None, start: datetime, end: datetime, chunk_size: int
+):
+    q = db.select(model.created_at, signed_quantity(model)).where(
+        model.product_id == product_id, model.created_at >= start, model.created_at <= end
+    )
+    if warehouse_id is not None:
+        q = q.where(model.warehouse_id == warehouse_id)
+    # Plain Core rows: ORM row processing would dominate on long histories.
+    return session.connection().execution_options(yield_per=chunk_size).execute(
+        q.order_by(model.created_at.asc(), model.id.asc())
+    )
+
+
+def stock_history(
+    product_id: int,
+    warehouse_id: int | None = None,
+    *,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    points: int = 300,
+    session=None,
+    chunk_size: int = 5000,
+) -> StockHistory:
+    """Running stock balance of a product, downsampled to at most `points` buckets.
+
+    Hot and archived movements are read in (product_id, created_at) index
+    order and summed while streaming; each equal-width time bucket keeps the
+    min, max and last balance seen in it. Buckets without movements are
+    omitted, so the series is a step function."""
+    session = session or db.session
+    points = max(MIN_POINTS, min(int(points), MAX_POINTS))
+
+    if start is None:
+        start = _first_movement_at(session, product_id, warehouse_id)
+    if end is None:
+        end = datetime.utcnow()
+    history = StockHistory(product_id, warehouse_id, start, end)
+    if start is None or end < start:
+        return history
+
+    balance = _balance_before(session, product_id, warehouse_id, start)
+    history.opening = balance
+
+    width = max((end - start).total_seconds() / points, 1e-6)
+    bucket: HistoryBucket | None = None
+    bucket_index = -1
+    rows = heapq.merge(
+        _stream(session, StockMovement, product_id, warehouse_id, start, end, chunk_size),
+        _stream(session, StockMovementArchive, product_id, warehouse_id, start, end, chunk_size),
+        key=lambda r: r[0],
+    )
+    for created_at, qty in rows:
+        balance += float(qty or 0)
+        history.movements += 1
+        index = min(int((created_at - start).total_seconds() / width), points - 1)
+        if index != bucket_index:
+            bucket_index = index
+            bucket = HistoryBucket(
+                start=start + timedelta(seconds=index * width), min=balance, max=balance, last=balance
+            )
+            history.buckets.append(bucket)
+        else:
+            bucket.min = min(bucket.min, balance)
+            bucket.max = max(bucket.max, balance)
+            bucket.last = balance
+            bucket.movements += 1
+
+    history.closing = balance
+    return history
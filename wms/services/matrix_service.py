@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+
+from ..caching import versions
+from ..choices import PRODUCTS, WAREHOUSES
+from ..extensions import db
+from ..models import Product, StockLevel, StockMovement, Warehouse
+from .stock_service import signed_quantity
+
+MatrixRow = tuple[int, str, str, tuple[float, ...], float]
+
+
+@dataclass(frozen=True)
+class StockMatrix:
+    version: int
+    master: tuple[int, int]  # product and warehouse cache versions
+    warehouses: list[tuple[int, str]]
+    order: list[int]  # product ids sorted by name
+    products: dict[int, tuple[str, str]]  # id -> (name, sku)
+    cells: dict[int, tuple[float, ...]]  # id -> quantity per warehouse column
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def _row(self, pid: int) -> MatrixRow:
+        name, sku = self.products[pid]
+        cells = self.cells[pid]
+        return (pid, name, sku, cells, sum(cells))
+
+    def page(self, page: int, per_page: int) -> list[MatrixRow]:
+        start = (page - 1) * per_page
+        return [self._row(pid) for pid in self.order[start : start + per_page]]
+
+    def rows(self):
+        for pid in self.order:
+            yield self._row(pid)
+
+
+_cache: dict[str, StockMatrix] = {}
+_cache_lock = threading.Lock()
+
+
+def stock_version(session=None) -> int:
+    """Latest movement id; every stock level change books a movement."""
+    session = session or db.session
+    return int(session.query(db.func.max(StockMovement.id)).scalar() or 0)
+
+
+def master_version() -> tuple[int, int]:
+    """Cache versions of the products and warehouses the matrix labels and columns come from."""
+    return versions.get(PRODUCTS), versions.get(WAREHOUSES)
+
+
+def build_stock_matrix(session=None, master: tuple[int, int] | None = None) -> StockMatrix:
+    session = session or db.session
+    version = stock_version(session)
+    master = master or master_version()
+
+    warehouses = [
+        (wid, name)
+        for wid, name in session.query(Warehouse.id, Warehouse.name).order_by(Warehouse.name.asc()).all()
+    ]
+    col = {wid: i for i, (wid, _) in enumerate(warehouses)}
+
+    pivot: dict[int, list[float]] = {}
+    for product_id, warehouse_id, qty in (
+        session.query(
+            StockLevel.product_id,
+            StockLevel.warehouse_id,
+            db.func.sum(StockLevel.quantity),
+        )
+        .group_by(StockLevel.product_id, StockLevel.warehouse_id)
+        .all()
+    ):
+        i = col.get(warehouse_id)
+        if i is None:
+            continue
+        cells = pivot.get(product_id)
+        if cells is None:
+            cells = pivot[product_id] = [0.0] * len(warehouses)
+        cells[i] += float(qty or 0)
+
+    order: list[int] = []
+    products: dict[int, tuple[str, str]] = {}
+    if pivot:
+        for pid, name, sku in (
+            session.query(Product.id, Product.name, Product.sku).order_by(Product.name.asc()).all()
+        ):
+            if pid in pivot:
+                order.append(pid)
+                products[pid] = (name, sku)
+
+    return StockMatrix(
+        version=version,
+        master=master,
+        warehouses=warehouses,
+        order=order,
+        products=products,
+        cells={pid: tuple(c) for pid, c in pivot.items() if pid in products},
+    )
+
+
+def _apply_movements(matrix: StockMatrix, version: int, session) -> StockMatrix | None:
+    """Patch the cached matrix with movements booked after it was built.
+
+    Returns None when the delta touches a product or warehouse the matrix does
+    not have yet; the caller then rebuilds from stock_levels."""
+    col = {wid: i for i, (wid, _) in enumerate(matrix.warehouses)}
+    deltas = (
+        session.query(
+            StockMovement.product_id,
+            StockMovement.warehouse_id,
+            db.func.sum(signed_quantity()),
+        )
+        .filter(StockMovement.id > matrix.version)
+        .filter(StockMovement.id <= version)
+        .group_by(StockMovement.product_id, StockMovement.warehouse_id)
+        .all()
+    )
+
+    cells = dict(matrix.cells)
+    for product_id, warehouse_id, qty in deltas:
+        if product_id not in cells or warehouse_id not in col:
+            return None
+        row = list(cells[product_id])
+        row[col[warehouse_id]] += float(qty or 0)
+        cells[product_id] = tuple(row)
+
+    return StockMatrix(
+        version=version,
+        master=matrix.master,
+        warehouses=matrix.warehouses,
+        order=matrix.order,
+        products=matrix.products,
+        cells=cells,
+    )
+
+
+def get_stock_matrix(session=None) -> StockMatrix:
+    """Cached matrix; new movements are applied incrementally.
+
+    Product or warehouse changes (names, new warehouses) rebuild it."""
+    session = session or db.session
+    version = stock_version(session)
+    master = master_version()
+    cached = _cache.get("matrix")
+    if cached is not None and (cached.version, cached.master) == (version, master):
+        return cached
+
+    with _cache_lock:
+        cached = _cache.get("matrix")
+        if cached is not None and (cached.version, cached.master) == (version, master):
+            return cached
+
+        matrix = None
+        if cached is not None and cached.master == master and cached.version < version:
+            matrix = _apply_movements(cached, version, session)
+        if matrix is None:
+            matrix = build_stock_matrix(session, master)
+        _cache["matrix"] = matrix
+        return matrix
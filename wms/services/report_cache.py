@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import heapq
+import threading
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import NamedTuple
+
+from ..caching import LRUCache, register_cache
+from ..extensions import db
+from ..models import Product, StockMovement, StockMovementArchive
+
+TOP_PRODUCTS = 10
+
+
+class DailyCount(NamedTuple):
+    d: str
+    cnt: int
+
+
+class TopProduct(NamedTuple):
+    name: str
+    sku: str
+    qty: float
+
+
+@dataclass
+class DayBucket:
+    movements: int = 0
+    qty_in: dict[int, float] = field(default_factory=dict)
+    qty_out: dict[int, float] = field(default_factory=dict)
+
+
+@dataclass
+class DailyReport:
+    daily: list[DailyCount]
+    top_in: list[TopProduct]
+    top_out: list[TopProduct]
+    recomputed: int
+
+
+def _as_date(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _runs(days: list[date]) -> list[tuple[date, date]]:
+    """Consecutive days collapsed into (first, last) ranges."""
+    runs: list[tuple[date, date]] = []
+    for d in sorted(days):
+        if runs and runs[-1][1] + timedelta(days=1) == d:
+            runs[-1] = (runs[-1][0], d)
+        else:
+            runs.append((d, d))
+    return runs
+
+
+class DayBucketCache:
+    """Per-day movement counts and product IN/OUT totals for the reports page.
+
+    Closed days stay cached until a movement is booked onto them later (a
+    back-dated booking, or one that crossed midnight in flight): every lookup
+    first reads the days of the movements above the last seen id and drops
+    those buckets. Today is always recomputed. Hot and archived movements are
+    both read, so archiving does not change a day."""
+
+    def __init__(self, maxsize: int = 400) -> None:
+        self.buckets = register_cache("report_days", LRUCache(maxsize=maxsize))
+        self.watermark: int | None = None
+        self.invalidated = 0
+        self.recomputed = 0
+        self._lock = threading.Lock()
+
+    def _invalidate(self, session) -> None:
+        hi = max(
+            session.query(db.func.max(StockMovement.id)).scalar() or 0,
+            session.query(db.func.max(StockMovementArchive.id)).scalar() or 0,
+        )
+        with self._lock:
+            lo = self.watermark
+            if lo is not None and hi <= lo:
+                return
+            self.watermark = hi
+        if lo is None:
+            return
+
+        touched: set[date] = set()
+        for model in (StockMovement, StockMovementArchive):
+            touched.update(
+                _as_date(d)
+                for (d,) in session.query(db.func.date(model.created_at))
+                .filter(model.id > lo, model.id <= hi)
+                .distinct()
+            )
+        dropped = sum(1 for d in touched if self.buckets.pop(d))
+        if dropped:
+            with self._lock:
+                self.invalidated += dropped
+
+    def _compute(self, session, days: list[date]) -> dict[date, DayBucket]:
+        out = {d: DayBucket() for d in days}
+        for first, last in _runs(days):
+            start = datetime.combine(first, datetime.min.time())
+            end = datetime.combine(last + timedelta(days=1), datetime.min.time())
+            for model in (StockMovement, StockMovementArchive):
+                day = db.func.date(model.created_at)
+                rows = (
+                    session.query(
+                        day, model.product_id, model.movement_type, db.func.count(model.id), db.func.sum(model.quantity)
+                    )
+                    .filter(model.created_at >= start, model.created_at < end)
+                    .group_by(day, model.product_id, model.movement_type)
+                )
+                for d, product_id, movement_type, count, qty in rows:
+                    bucket = out[_as_date(d)]
+                    bucket.movements += int(count)
+                    if movement_type == "IN":
+                        bucket.qty_in[product_id] = bucket.qty_in.get(product_id, 0.0) + float(qty or 0)
+                    elif movement_type == "OUT":
+                        bucket.qty_out[product_id] = bucket.qty_out.get(product_id, 0.0) + float(qty or 0)
+        return out
+
+    def get(self, session, days: list[date]) -> tuple[dict[date, DayBucket], int]:
+        """Buckets for the given days and how many of them had to be computed."""
+        self._invalidate(session)
+        today = date.today()
+        found: dict[date, DayBucket] = {}
+        missing: list[date] = []
+        for d in days:
+            bucket = self.buckets.get(d) if d < today else None
+            if bucket is None:
+                missing.append(d)
+            else:
+                found[d] = bucket
+        if missing:
+            computed = self._compute(session, missing)
+            for d, bucket in computed.items():
+                if d < today:
+                    self.buckets.set(d, bucket)
+            found.update(computed)
+            with self._lock:
+                self.recomputed += len(missing)
+        return found, len(missing)
+
+
+day_buckets = DayBucketCache()
+
+
+def _top(session, totals: dict[int, float]) -> list[TopProduct]:
+    best = heapq.nlargest(TOP_PRODUCTS, totals.items(), key=lambda kv: kv[1])
+    if not best:
+        return []
+    labels = {
+        pid: (name, sku)
+        for pid, name, sku in session.query(Product.id, Product.name, Product.sku).filter(
+            Product.id.in_([pid for pid, _ in best])
+        )
+    }
+    return [TopProduct(*labels[pid], qty) for pid, qty in best if pid in labels]
+
+
+def daily_report(days: int, *, session=None) -> DailyReport:
+    """Movement counts per day and top IN/OUT products for the last `days` days."""
+    session = session or db.session
+    today = date.today()
+    wanted = [today - timedelta(days=n) for n in range(days - 1, -1, -1)]
+    buckets, recomputed = day_buckets.get(session, wanted)
+
+    qty_in: dict[int, float] = {}
+    qty_out: dict[int, float] = {}
+    daily: list[DailyCount] = []
+    for d in wanted:
+        bucket = buckets[d]
+        if bucket.movements:
+            daily.append(DailyCount(d.isoformat(), bucket.movements))
+        for pid, qty in bucket.qty_in.items():
+            qty_in[pid] = qty_in.get(pid, 0.0) + qty
+        for pid, qty in bucket.qty_out.items():
+            qty_out[pid] = qty_out.get(pid, 0.0) + qty
+
+    return DailyReport(daily, _top(session, qty_in), _top(session, qty_out), recomputed)
@@ -0,0 +1,471 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from ..caching import LRUCache, register_cache, versions
+from ..choices import CATEGORIES, PRODUCTS, SHELVES, WAREHOUSES
+from ..extensions import db
+from ..models import (
+    Category,
+    MovementRollup,
+    Product,
+    RollupState,
+    Shelf,
+    StockMovement,
+    StockMovementArchive,
+    User,
+    Warehouse,
+)
+from ..security import USERS_CACHE_VERSION
+from ..sqlite_profile import begin_immediate
+from .category_service import subtree_ids
+
+DIMENSIONS = {
+    "product": "Ürün",
+    "category": "Kategori",
+    "warehouse": "Depo",
+    "shelf": "Raf",
+    "movement_type": "Hareket Tipi",
+    "reference_type": "Referans",
+    "user": "Kullanıcı",
+    "day": "Gün",
+    "week": "Hafta",
+    "month": "Ay",
+}
+TIME_GRAINS = ("day", "week", "month")
+MEASURES = {
+    "movements": "Hareket",
+    "qty_in": "Giriş",
+    "qty_out": "Çıkış",
+    "adjust": "Düzeltme",
+    "net": "Net",
+}
+MAX_RANGE_DAYS = 3660
+
+ROLLUP_TABLE = "movement_rollups"
+ROLLUP_NAME = "movements"
+ROLLUP_DIMENSIONS = {"category", "warehouse", "movement_type", "reference_type", *TIME_GRAINS}
+
+_SOURCES = {"stock_movements": StockMovement, "stock_movements_archive": StockMovementArchive}
+_LABEL_VERSIONS = (PRODUCTS, CATEGORIES, WAREHOUSES, SHELVES, USERS_CACHE_VERSION)
+
+_cache = register_cache("reports", LRUCache(maxsize=256))
+
+
+class ReportError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class ReportSpec:
+    start: date
+    end: date
+    dimensions: tuple[str, ...]
+    warehouse_id: int | None = None
+    product_id: int | None = None
+    movement_type: str | None = None
+    # Includes the category's subcategories.
+    category_id: int | None = None
+
+    def __post_init__(self) -> None:
+        if self.end < self.start:
+            raise ReportError("Bitiş tarihi başlangıçtan önce olamaz.")
+        if (self.end - self.start).days + 1 > MAX_RANGE_DAYS:
+            raise ReportError(f"En fazla {MAX_RANGE_DAYS} günlük rapor alınabilir.")
+        unknown = [d for d in self.dimensions if d not in DIMENSIONS]
+        if unknown:
+            raise ReportError(f"Bilinmeyen kırılım: {', '.join(unknown)}")
+        if len(set(self.dimensions)) != len(self.dimensions):
+            raise ReportError("Bir kırılım birden fazla seçilemez.")
+        if self.movement_type is not None and self.movement_type not in {"IN", "OUT", "ADJUST"}:
+            raise ReportError("Geçersiz hareket tipi.")
+
+    def cache_key(self) -> str:
+        payload = json.dumps(asdict(self), default=str, sort_keys=True)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class ReportPlan:
+    sources: list[str] = field(default_factory=list)
+    joins: list[str] = field(default_factory=list)
+    group_by: list[str] = field(default_factory=list)
+    index: str = ""
+    notes: list[str] = field(default_factory=list)
+
+
+@dataclass
+class ReportResult:
+    spec: ReportSpec
+    plan: ReportPlan
+    columns: list[str]
+    rows: list[tuple]
+    totals: dict[str, float]
+    elapsed_ms: float
+    cached: bool = False
+
+
+def _period(col, grain: str, dialect: str):
+    """SQL expression for the start of the day/week (Monday)/month of a
+    date(time) column, or None when Python has to fold days for the dialect."""
+    if dialect == "sqlite":
+        if grain == "day":
+            return db.func.date(col)
+        if grain == "week":
+            return db.func.date(col, "weekday 0", "-6 days")
+        return db.func.strftime("%Y-%m-01", col)
+    if dialect == "postgresql":
+        return db.cast(db.func.date_trunc(grain, col), db.Date)
+    return db.func.date(col) if grain == "day" else None
+
+
+def _fold_period(value, grain: str) -> str:
+    d = _as_date(value)
+    if grain == "week":
+        d = d - timedelta(days=d.weekday())
+    elif grain == "month":
+        d = d.replace(day=1)
+    return d.isoformat()
+
+
+def _as_date(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def refresh_movement_rollups(*, rebuild: bool = False) -> int:
+    """Fold movements booked since the last refresh into movement_rollups.
+
+    Movements are picked up by id, so back-dated bookings land on their own
+    day. Archiving keeps ids and does not change the totals. Rows carry the
+    product's category at fold time; recategorizing a product clears them
+    (see _reset_rollups). Returns the number of movements folded in."""
+    hi = max(
+        db.session.query(db.func.max(StockMovement.id)).scalar() or 0,
+        db.session.query(db.func.max(StockMovementArchive.id)).scalar() or 0,
+    )
+    state = db.session.get(RollupState, ROLLUP_NAME)
+    if not rebuild and hi <= (state.last_movement_id if state else 0):
+        db.session.rollback()
+        return 0
+
+    begin_immediate(db.session())
+    try:
+        state = db.session.get(RollupState, ROLLUP_NAME, populate_existing=True)
+        if state is None:
+            state = RollupState(name=ROLLUP_NAME, last_movement_id=0)
+            db.session.add(state)
+        if rebuild:
+            db.session.execute(db.delete(MovementRollup))
+            state.last_movement_id = 0
+        lo = state.last_movement_id
+
+        delta: dict[tuple, list[float]] = {}
+        folded = 0
+        for model in (StockMovement, StockMovementArchive):
+            rows = (
+                db.session.query(
+                    db.func.date(model.created_at),
+                    Product.category_id,
+                    model.warehouse_id,
+                    model.movement_type,
+                    model.reference_type,
+                    db.func.count(model.id),
+                    db.func.sum(model.quantity),
+                )
+                .join(Product, Product.id == model.product_id)
+                .filter(model.id > lo, model.id <= hi)
+                .group_by(
+                    db.func.date(model.created_at),
+                    Product.category_id,
+                    model.warehouse_id,
+                    model.movement_type,
+                    model.reference_type,
+                )
+                .all()
+            )
+            for day, category_id, warehouse_id, movement_type, reference_type, count, qty in rows:
+                acc = delta.setdefault(
+                    (_as_date(day), category_id, warehouse_id, movement_type, reference_type), [0, 0.0]
+                )
+                acc[0] += int(count)
+                acc[1] += float(qty or 0)
+                folded += int(count)
+
+        existing = {}
+        if lo and delta:
+            days = {key[0] for key in delta}
+            for row in db.session.query(
+                MovementRollup.id,
+                MovementRollup.day,
+                MovementRollup.category_id,
+                MovementRollup.warehouse_id,
+                MovementRollup.movement_type,
+                MovementRollup.reference_type,
+                MovementRollup.movements,
+                MovementRollup.quantity,
+            ).filter(MovementRollup.day.between(min(days), max(days))):
+                existing[tuple(row[1:6])] = (row[0], row[6], row[7])
+
+        updates: list[dict] = []
+        inserts: list[dict] = []
+        for key, (count, qty) in delta.items():
+            row = existing.get(key)
+            if row is None:
+                day, category_id, warehouse_id, movement_type, reference_type = key
+                inserts.append(
+                    {
+                        "day": day,
+                        "category_id": category_id,
+                        "warehouse_id": warehouse_id,
+                        "movement_type": movement_type,
+                        "reference_type": reference_type,
+                        "movements": count,
+                        "quantity": qty,
+                    }
+                )
+            else:
+                row_id, movements, quantity = row
+                updates.append({"id": row_id, "movements": movements + count, "quantity": quantity + qty})
+
+        if updates:
+            db.session.execute(db.update(MovementRollup), updates)
+        if inserts:
+            db.session.execute(db.insert(MovementRollup), inserts)
+        state.last_movement_id = hi
+        db.session.commit()
+        if rebuild:
+            _cache.clear()
+        return folded
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+@event.listens_for(Session, "before_flush")
+def _reset_rollups(session: Session, flush_context, instances) -> None:
+    # Moving a product to another category would leave its folded movements
+    # under the old one; empty the rollups in the same transaction so the
+    # next report refolds everything.
+    for obj in session.dirty:
+        if isinstance(obj, Product) and inspect(obj).attrs.category_id.history.has_changes():
+            session.execute(db.delete(MovementRollup))
+            session.execute(
+                db.update(RollupState).where(RollupState.name == ROLLUP_NAME).values(last_movement_id=0)
+            )
+            return
+
+
+def _bounds(session, model) -> tuple[datetime | None, datetime | None]:
+    return session.query(db.func.min(model.created_at), db.func.max(model.created_at)).one()
+
+
+def plan_report(spec: ReportSpec, *, session=None) -> ReportPlan:
+    """Pick the tables, joins and grouping columns for a spec.
+
+    movement_rollups answers every spec that only uses its dimensions and
+    filters. Otherwise movements are aggregated on their own id columns and
+    labels are looked up afterwards for the result rows; only category needs
+    a join, to products by primary key. Hot or archived tables are skipped
+    when their created_at bounds (two index lookups) miss the range."""
+    session = session or db.session
+    plan = ReportPlan()
+
+    if set(spec.dimensions) <= ROLLUP_DIMENSIONS and spec.product_id is None:
+        plan.sources.append(ROLLUP_TABLE)
+        plan.index = "ix_movementrollup_day_warehouse"
+        for dim in spec.dimensions:
+            if dim in TIME_GRAINS:
+                plan.group_by.append(f"{dim}(day)")
+            else:
+                plan.group_by.append("category_id" if dim == "category" else dim)
+        if spec.category_id is not None:
+            plan.joins.append("category_closure")
+        if "category" in spec.dimensions or spec.category_id is not None:
+            plan.notes.append("Kategori, hareketin kaydedildiği andaki ürün kategorisidir.")
+        return plan
+
+    start = datetime.combine(spec.start, datetime.min.time())
+    end = datetime.combine(spec.end + timedelta(days=1), datetime.min.time())
+    for name, model in (("stock_movements", StockMovement), ("stock_movements_archive", StockMovementArchive)):
+        first, last = _bounds(session, model)
+        if first is None or last < start or first >= end:
+            plan.notes.append(f"{name}: aralık dışında, atlandı")
+            continue
+        plan.sources.append(name)
+
+    plan.index = "(product_id, created_at)" if spec.product_id is not None else "created_at"
+    for dim in spec.dimensions:
+        if dim == "category":
+            plan.joins.append("products")
+            plan.group_by.append("products.category_id")
+        elif dim == "user":
+            plan.group_by.append("created_by")
+        elif dim in ("product", "warehouse", "shelf"):
+            plan.group_by.append(f"{dim}_id")
+        else:
+            plan.group_by.append(dim)
+    if spec.category_id is not None:
+        if "products" not in plan.joins:
+            plan.joins.append("products")
+        plan.joins.append("category_closure")
+    return plan
+
+
+def _aggregate(session, source: str, spec: ReportSpec) -> tuple[list, list[str | None]]:
+    """Rows of (dimension values..., count, in, out, adjust) from one source.
+
+    The second value lists, per dimension, the grain Python still has to fold
+    (dialects without a week/month expression)."""
+    dialect = session.get_bind().dialect.name
+    rollup = source == ROLLUP_TABLE
+    model = MovementRollup if rollup else _SOURCES[source]
+    when = model.day if rollup else model.created_at
+
+    keys = []
+    folds: list[str | None] = []
+    for dim in spec.dimensions:
+        fold = None
+        if dim == "category":
+            expr = model.category_id if rollup else Product.category_id
+        elif dim == "user":
+            expr = model.created_by
+        elif dim in ("product", "warehouse", "shelf"):
+            expr = getattr(model, f"{dim}_id")
+        elif dim in ("movement_type", "reference_type"):
+            expr = getattr(model, dim)
+        else:
+            expr = _period(when, dim, dialect)
+            if expr is None:
+                expr, fold = db.func.date(when), dim
+        keys.append(expr)
+        folds.append(fold)
+
+    count = db.func.sum(model.movements) if rollup else db.func.count(model.id)
+    measures = [count] + [
+        db.func.sum(db.case((model.movement_type == t, model.quantity), else_=0)) for t in ("IN", "OUT", "ADJUST")
+    ]
+    if rollup:
+        q = session.query(*keys, *measures).filter(model.day >= spec.start, model.day <= spec.end)
+    else:
+        start = datetime.combine(spec.start, datetime.min.time())
+        end = datetime.combine(spec.end + timedelta(days=1), datetime.min.time())
+        q = session.query(*keys, *measures).filter(model.created_at >= start, model.created_at < end)
+        if "category" in spec.dimensions:
+            q = q.join(Product, Product.id == model.product_id)
+        if spec.product_id is not None:
+            q = q.filter(model.product_id == spec.product_id)
+    if spec.warehouse_id is not None:
+        q = q.filter(model.warehouse_id == spec.warehouse_id)
+    if spec.movement_type is not None:
+        q = q.filter(model.movement_type == spec.movement_type)
+    if spec.category_id is not None:
+        category = model.category_id if rollup else Product.category_id
+        if not rollup and "category" not in spec.dimensions:
+            q = q.join(Product, Product.id == model.product_id)
+        q = q.filter(category.in_(subtree_ids(spec.category_id)))
+    if keys:
+        q = q.group_by(*keys)
+    return q.all(), folds
+
+
+def _labels(session, spec: ReportSpec, rows: dict[tuple, list[float]]) -> list[dict]:
+    """Display label per dimension value, fetched only for ids in the result."""
+    maps: list[dict] = []
+    for i, dim in enumerate(spec.dimensions):
+        ids = {key[i] for key in rows if key[i] is not None}
+        if dim == "product" and ids:
+            found = {
+                pid: f"{name} ({sku})"
+                for pid, name, sku in session.query(Product.id, Product.name, Product.sku).filter(Product.id.in_(ids))
+            }
+        elif dim == "category" and ids:
+            found = dict(session.query(Category.id, Category.name).filter(Category.id.in_(ids)).all())
+        elif dim == "warehouse" and ids:
+            found = dict(session.query(Warehouse.id, Warehouse.name).filter(Warehouse.id.in_(ids)).all())
+        elif dim == "shelf" and ids:
+            found = dict(session.query(Shelf.id, Shelf.code).filter(Shelf.id.in_(ids)).all())
+        elif dim == "user" and ids:
+            found = dict(session.query(User.id, User.username).filter(User.id.in_(ids)).all())
+        else:
+            found = {}
+        empty = "(Kategorisiz)" if dim == "category" else "-"
+        maps.append({v: (found.get(v, str(v)) if v is not None else empty) for v in ids | {None}})
+    return maps
+
+
+def _compute(spec: ReportSpec, session) -> tuple[ReportPlan, list[tuple], dict[str, float]]:
+    plan = plan_report(spec, session=session)
+    merged: dict[tuple, list[float]] = {}
+    n = len(spec.dimensions)
+    for source in plan.sources:
+        rows, folds = _aggregate(session, source, spec)
+        for row in rows:
+            key = tuple(
+                _fold_period(v, folds[i] or dim) if dim in TIME_GRAINS and v is not None else v
+                for i, (dim, v) in enumerate(zip(spec.dimensions, row[:n]))
+            )
+            acc = merged.setdefault(key, [0.0, 0.0, 0.0, 0.0])
+            for j, value in enumerate(row[n:]):
+                acc[j] += float(value or 0)
+
+    labels = _labels(session, spec, merged)
+    out: list[tuple] = []
+    for key, (count, qty_in, qty_out, adjust) in merged.items():
+        dims = tuple(labels[i][v] if spec.dimensions[i] not in TIME_GRAINS and spec.dimensions[i] not in (
+            "movement_type", "reference_type") else (v if v is not None else "-") for i, v in enumerate(key))
+        out.append(dims + (int(count), qty_in, qty_out, adjust, qty_in - qty_out + adjust))
+    out.sort(key=lambda r: tuple(str(v) for v in r[:n]))
+
+    totals = {
+        "movements": float(sum(r[n] for r in out)),
+        "qty_in": sum(r[n + 1] for r in out),
+        "qty_out": sum(r[n + 2] for r in out),
+        "adjust": sum(r[n + 3] for r in out),
+    }
+    totals["net"] = totals["qty_in"] - totals["qty_out"] + totals["adjust"]
+    return plan, out, totals
+
+
+def _data_stamp(session) -> tuple:
+    """Changes whenever a movement is booked (or archived) or a label table is edited."""
+    last_id = session.query(db.func.max(StockMovement.id)).scalar()
+    return (last_id, tuple(versions.get(name) for name in _LABEL_VERSIONS))
+
+
+def run_report(spec: ReportSpec, *, session=None, use_cache: bool = True) -> ReportResult:
+    """Aggregate movements for a spec; results are cached by spec hash + data stamp.
+
+    The rollups are brought up to date (on the primary session) before a
+    spec that can use them is computed."""
+    session = session or db.session
+    t0 = time.perf_counter()
+    key = (spec.cache_key(), _data_stamp(session))
+    if use_cache:
+        hit = _cache.get(key)
+        if hit is not None:
+            plan, rows, totals = hit
+            return ReportResult(
+                spec, plan, _columns(spec), rows, totals, (time.perf_counter() - t0) * 1000, cached=True
+            )
+
+    if set(spec.dimensions) <= ROLLUP_DIMENSIONS and spec.product_id is None:
+        refresh_movement_rollups()
+    plan, rows, totals = _compute(spec, session)
+    if use_cache:
+        _cache.set(key, (plan, rows, totals))
+    return ReportResult(spec, plan, _columns(spec), rows, totals, (time.perf_counter() - t0) * 1000)
+
+
+def _columns(spec: ReportSpec) -> list[str]:
+    return [DIMENSIONS[d] for d in spec.dimensions] + list(MEASURES.values())
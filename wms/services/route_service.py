@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Iterable, TypeVar
+
+from ..extensions import db
+from ..models import Shelf, Warehouse
+
+T = TypeVar("T")
+
+Position = tuple[int, int, int]  # aisle, bay, level
+
+_CODE_RE = re.compile(r"^\s*([A-Za-z]+)[-_ ]?0*(\d+)")
+
+
+def position_from_code(code: str) -> Position | None:
+    """Best-effort position for shelves without a layout: "B2" and "B-02"
+    become aisle 2, bay 2. Codes that do not look like that return None."""
+    m = _CODE_RE.match(code or "")
+    if not m:
+        return None
+    aisle = 0
+    for ch in m.group(1).upper():
+        aisle = aisle * 26 + (ord(ch) - ord("A") + 1)
+    return (aisle, int(m.group(2)), 0)
+
+
+@dataclass(frozen=True)
+class WarehouseLayout:
+    warehouse_id: int
+    version: int
+    positions: dict[int, Position]  # shelf id -> position
+    unplaced: dict[int, int]  # shelf id -> rank by code, for shelves without a position
+
+
+def build_layout(warehouse_id: int, version: int, session=None) -> WarehouseLayout:
+    session = session or db.session
+    positions: dict[int, Position] = {}
+    unplaced_codes: list[tuple[str, int]] = []
+    for sid, code, aisle, bay, level in (
+        session.query(Shelf.id, Shelf.code, Shelf.aisle, Shelf.bay, Shelf.level)
+        .filter(Shelf.warehouse_id == warehouse_id)
+        .all()
+    ):
+        if aisle is not None:
+            positions[sid] = (int(aisle), int(bay or 0), int(level or 0))
+            continue
+        pos = position_from_code(code)
+        if pos is not None:
+            positions[sid] = pos
+        else:
+            unplaced_codes.append((code, sid))
+
+    unplaced_codes.sort()
+    return WarehouseLayout(
+        warehouse_id=warehouse_id,
+        version=version,
+        positions=positions,
+        unplaced={sid: i for i, (_, sid) in enumerate(unplaced_codes)},
+    )
+
+
+_layouts: dict[int, WarehouseLayout] = {}
+_layouts_lock = threading.Lock()
+
+
+def get_layouts(warehouse_ids: Iterable[int], session=None) -> dict[int, WarehouseLayout]:
+    """Cached layouts keyed by Warehouse.layout_version.
+
+    Only the version numbers are read per call, so every worker notices shelf
+    changes made by another one without rebuilding unchanged layouts."""
+    session = session or db.session
+    ids = set(warehouse_ids)
+    if not ids:
+        return {}
+
+    versions = dict(
+        session.query(Warehouse.id, Warehouse.layout_version).filter(Warehouse.id.in_(ids)).all()
+    )
+    result: dict[int, WarehouseLayout] = {}
+    for wid, version in versions.items():
+        layout = _layouts.get(wid)
+        if layout is None or layout.version != version:
+            layout = build_layout(wid, version, session)
+            with _layouts_lock:
+                _layouts[wid] = layout
+        result[wid] = layout
+    return result
+
+
+def bump_layout_version(warehouse_id: int) -> None:
+    """Call in the same transaction as any shelf insert, update or delete."""
+    db.session.query(Warehouse).filter(Warehouse.id == warehouse_id).update(
+        {Warehouse.layout_version: Warehouse.layout_version + 1}, synchronize_session=False
+    )
+
+
+def s_shape_order(positions: list[Position | None]) -> list[int]:
+    """Indices of `positions` in S-shape (serpentine) walking order.
+
+    Aisles with at least one pick are visited in ascending order, alternating
+    the walking direction along the bays, so the picker never walks an aisle
+    twice. Positions that are None come last in their given order."""
+    by_aisle: dict[int, list[int]] = {}
+    tail: list[int] = []
+    for i, pos in enumerate(positions):
+        if pos is None:
+            tail.append(i)
+        else:
+            by_aisle.setdefault(pos[0], []).append(i)
+
+    order: list[int] = []
+    for n, aisle in enumerate(sorted(by_aisle)):
+        idx = by_aisle[aisle]
+        if n % 2 == 0:
+            idx.sort(key=lambda i: (positions[i][1], positions[i][2]))
+        else:
+            idx.sort(key=lambda i: (-positions[i][1], positions[i][2]))
+        order.extend(idx)
+    return order + tail
+
+
+def route_sort(
+    items: list[T],
+    warehouse_id: Callable[[T], int],
+    shelf_id: Callable[[T], int | None],
+    *,
+    session=None,
+) -> list[T]:
+    """Order items by warehouse, then by S-shape route over that warehouse's layout.
+
+    Items without a shelf or on shelves with no known position are picked last,
+    ordered by shelf code."""
+    layouts = get_layouts({warehouse_id(it) for it in items}, session)
+
+    by_warehouse: dict[int, list[T]] = {}
+    for it in items:
+        by_warehouse.setdefault(warehouse_id(it), []).append(it)
+
+    routed: list[T] = []
+    for wid in sorted(by_warehouse):
+        group = by_warehouse[wid]
+        layout = layouts.get(wid)
+        if layout is None:
+            routed.extend(group)
+            continue
+        positions = [layout.positions.get(shelf_id(it)) for it in group]
+        order = s_shape_order(positions)
+        placed = [group[i] for i in order if positions[i] is not None]
+        rest = [group[i] for i in order if positions[i] is None]
+        rest.sort(key=lambda it: layout.unplaced.get(shelf_id(it), len(layout.unplaced)))
+        routed.extend(placed + rest)
+    return routed
+
+
+def route_length(positions: list[Position], aisle_width: float = 3.0, bays: int = 0) -> float:
+    """Walking distance of a pick sequence in a single-block warehouse.
+
+    Moving inside an aisle costs the bay difference; changing aisles means
+    leaving through the nearer end (bay 0 or bays + 1) and walking across."""
+    total = 0.0
+    for (a1, b1, _), (a2, b2, _) in zip(positions, positions[1:]):
+        if a1 == a2:
+            total += abs(b1 - b2)
+        else:
+            total += min(b1 + b2, 2 * (bays + 1) - b1 - b2) + abs(a1 - a2) * aisle_width
+    return total
+
+
+def benchmark_pick_route(
+    *, lines: int = 1000, aisles: int = 20, bays: int = 50, levels: int = 4, runs: int = 20, seed: int = 1
+) -> dict[str, float]:
+    """Route random pick lists over a synthetic layout and compare the walk
+    against picking in shelf-code order."""
+    rng = random.Random(seed)
+    timings: list[float] = []
+    naive_len = routed_len = 0.0
+
+    for _ in range(runs):
+        picks = [
+            (rng.randint(1, aisles), rng.randint(1, bays), rng.randint(1, levels)) for _ in range(lines)
+        ]
+        t0 = time.perf_counter()
+        order = s_shape_order(list(picks))
+        timings.append(time.perf_counter() - t0)
+
+        by_code = sorted(picks, key=lambda p: f"{p[0]:03d}-{p[1]}-{p[2]}")
+        naive_len += route_length(by_code, bays=bays)
+        routed_len += route_length([picks[i] for i in order], bays=bays)
+
+    timings.sort()
+    return {
+        "lines": float(lines),
+        "median_ms": timings[len(timings) // 2] * 1000,
+        "max_ms": timings[-1] * 1000,
+        "code_order_distance": naive_len / runs,
+        "s_shape_distance": routed_len / runs,
+    }
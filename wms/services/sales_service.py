@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime
+
+from ..extensions import db
+from ..models import Product, SalesOrder, SalesOrderItem, Shelf, StockLevel, Warehouse
+from ..sqlite_profile import begin_immediate
+from .route_service import route_sort
+from .stock_service import StockError, StockMovementRequest, create_stock_movements_batch
+
+
+@dataclass(frozen=True)
+class PickLine:
+    order_id: int
+    product_id: int
+    warehouse_id: int
+    shelf_id: int | None
+    quantity: float
+
+
+@dataclass
+class PickListRow:
+    warehouse: str
+    shelf: str
+    product: str
+    sku: str
+    quantity: float
+    order_ids: list[int]
+
+
+def _load_orders(order_ids: list[int], session) -> list[SalesOrder]:
+    orders = session.query(SalesOrder).filter(SalesOrder.id.in_(order_ids)).order_by(SalesOrder.id.asc()).all()
+    found = {o.id for o in orders}
+    missing = [oid for oid in order_ids if oid not in found]
+    if missing:
+        raise StockError(f"Satış siparişi bulunamadı: {', '.join(str(m) for m in missing)}")
+    return orders
+
+
+def allocate_pick_lines(orders: list[SalesOrder], *, session=None) -> list[PickLine]:
+    """Split every order line across shelves.
+
+    Orders with a fixed shelf pick everything from it. Otherwise the line is
+    taken from the warehouse's stock levels, largest first, and the remaining
+    quantity is tracked in memory so orders in the same wave do not allocate
+    the same units twice. Whatever cannot be covered is left on the order's
+    own location so the movement fails with the usual stock error."""
+    session = session or db.session
+    if not orders:
+        return []
+
+    items = (
+        session.query(SalesOrderItem)
+        .filter(SalesOrderItem.sales_order_id.in_([o.id for o in orders]))
+        .order_by(SalesOrderItem.id.asc())
+        .all()
+    )
+    by_order: dict[int, list[SalesOrderItem]] = {}
+    for it in items:
+        by_order.setdefault(it.sales_order_id, []).append(it)
+
+    product_ids = {it.product_id for it in items}
+    warehouse_ids = {o.warehouse_id for o in orders}
+    remaining: dict[tuple[int, int], list[list]] = {}
+    if product_ids:
+        for sl in (
+            session.query(StockLevel)
+            .filter(StockLevel.product_id.in_(product_ids))
+            .filter(StockLevel.warehouse_id.in_(warehouse_ids))
+            .filter(StockLevel.quantity > 0)
+            .order_by(StockLevel.quantity.desc(), StockLevel.id.asc())
+            .all()
+        ):
+            remaining.setdefault((sl.product_id, sl.warehouse_id), []).append(
+                [sl.shelf_id, float(sl.quantity)]
+            )
+
+    lines: list[PickLine] = []
+    for o in orders:
+        for it in by_order.get(o.id, []):
+            qty = float(it.quantity)
+            if o.shelf_id is not None:
+                lines.append(PickLine(o.id, it.product_id, o.warehouse_id, o.shelf_id, qty))
+                for slot in remaining.get((it.product_id, o.warehouse_id), []):
+                    if slot[0] == o.shelf_id:
+                        slot[1] -= qty
+                continue
+
+            for slot in remaining.get((it.product_id, o.warehouse_id), []):
+                if qty <= 0:
+                    break
+                take = min(qty, slot[1])
+                if take <= 0:
+                    continue
+                lines.append(PickLine(o.id, it.product_id, o.warehouse_id, slot[0], take))
+                slot[1] -= take
+                qty -= take
+            if qty > 0:
+                lines.append(PickLine(o.id, it.product_id, o.warehouse_id, None, qty))
+    return lines
+
+
+def build_pick_list(order_ids: list[int], *, session=None) -> list[PickListRow]:
+    """Consolidated pick list for a wave of orders in walking order."""
+    session = session or db.session
+    orders = _load_orders(order_ids, session)
+    lines = allocate_pick_lines(orders, session=session)
+
+    grouped: dict[tuple[int, int | None, int], tuple[float, set[int]]] = {}
+    for ln in lines:
+        key = (ln.warehouse_id, ln.shelf_id, ln.product_id)
+        qty, ids = grouped.get(key, (0.0, set()))
+        ids.add(ln.order_id)
+        grouped[key] = (qty + ln.quantity, ids)
+
+    if not grouped:
+        return []
+
+    warehouses = {
+        w.id: w.name for w in session.query(Warehouse).filter(Warehouse.id.in_({k[0] for k in grouped})).all()
+    }
+    shelves = {
+        s.id: s.code
+        for s in session.query(Shelf).filter(Shelf.id.in_({k[1] for k in grouped if k[1] is not None})).all()
+    }
+    products = {
+        p.id: (p.name, p.sku)
+        for p in session.query(Product).filter(Product.id.in_({k[2] for k in grouped})).all()
+    }
+
+    rows: list[PickListRow] = []
+    for key in route_sort(list(grouped), lambda k: k[0], lambda k: k[1], session=session):
+        wid, sid, pid = key
+        qty, ids = grouped[key]
+        rows.append(
+            PickListRow(
+                warehouse=warehouses.get(wid, "-"),
+                shelf=shelves.get(sid, "-"),
+                product=products[pid][0],
+                sku=products[pid][1],
+                quantity=qty,
+                order_ids=sorted(ids),
+            )
+        )
+    return rows
+
+
+def ship_sales_orders(order_ids: list[int], shipped_by: int) -> list[SalesOrder]:
+    """Ship a wave of orders in one transaction.
+
+    All OUT movements go through create_stock_movements_batch, so stock levels
+    are read once and written once for the whole wave. Shipping is
+    all-or-nothing: any failing line rolls everything back."""
+    begin_immediate(db.session())
+    try:
+        orders = _load_orders(order_ids, db.session)
+        shipped = [o.id for o in orders if o.status == SalesOrder.Status.SHIPPED.value]
+        if shipped:
+            raise StockError(f"Zaten sevk edilmiş sipariş: {', '.join(str(i) for i in shipped)}")
+
+        lines = allocate_pick_lines(orders)
+        with_items = {ln.order_id for ln in lines}
+        empty = [o.id for o in orders if o.id not in with_items]
+        if empty:
+            raise StockError(f"Kalemi olmayan sipariş: {', '.join(str(i) for i in empty)}")
+
+        results = create_stock_movements_batch(
+            [
+                StockMovementRequest(
+                    product_id=ln.product_id,
+                    warehouse_id=ln.warehouse_id,
+                    shelf_id=ln.shelf_id,
+                    movement_type="OUT",
+                    quantity=ln.quantity,
+                    reference_type="sale",
+                    reason=None,
+                    note=f"sale:{ln.order_id}",
+                    created_by=shipped_by,
+                )
+                for ln in lines
+            ],
+            manage_transaction=False,
+        )
+        errors = [
+            f"Sipariş #{lines[r.index].order_id}: {r.error}" for r in results if r.status == "error"
+        ]
+        if errors:
+            raise StockError(" ".join(errors[:5]) + (" ..." if len(errors) > 5 else ""))
+
+        now = datetime.utcnow()
+        for o in orders:
+            o.status = SalesOrder.Status.SHIPPED.value
+            o.shipped_by = shipped_by
+            o.shipped_at = now
+
+        db.session.commit()
+        return orders
+    except Exception:
+        db.session.rollback()
+        raise
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import re
+from datetime import datetime
+
+from ..extensions import db
+from ..models import SEARCH_TABLE, Product, StockMovement, StockMovementArchive
+from ..models.search import fold
+from ..sqlite_profile import begin_immediate
+
+MAX_TERMS = 8
+MAX_RESULTS = 200
+# Date ranges spanning more movements than this are not turned into an id
+# range (reading the exact bounds would cost more than it saves).
+BOUNDS_SCAN_ROWS = 250_000
+
+
+class SearchError(ValueError):
+    pass
+
+
+def search_terms(q: str) -> list[str]:
+    """Whitespace-separated search words; words without any letter or digit are dropped."""
+    terms = [t for t in (q or "").split() if re.search(r"\w", t)]
+    if not terms:
+        raise SearchError("Arama metni boş.")
+    if len(terms) > MAX_TERMS:
+        raise SearchError(f"En fazla {MAX_TERMS} kelime ile arama yapılabilir.")
+    return terms
+
+
+def fts_query(terms: list[str]) -> str:
+    """FTS5 MATCH expression: every term must match as a quoted phrase.
+
+    Quoting keeps user input from being read as FTS syntax, and a term like
+    'purchase:1234' becomes the phrase 'purchase 1234' the tokenizer
+    produces. Whole words are matched unless the term ends in '*' (prefix
+    queries merge many doclists and are several times slower). Dotless ı is
+    folded to i as in the index."""
+    parts = []
+    for t in terms:
+        prefix = t.endswith("*")
+        phrase = '"' + t.rstrip("*").replace("ı", "i").replace('"', '""') + '"'
+        parts.append(phrase + "*" if prefix else phrase)
+    return " ".join(parts)
+
+
+def _id_bounds(session, model, start: datetime | None, end: datetime | None) -> tuple[int, int] | None:
+    """Smallest and largest movement id booked in [start, end), or None for an unbounded scan.
+
+    Ids only roughly follow created_at (back-dated or concurrent bookings),
+    but every row in the range lies within these bounds, so they are a safe
+    rowid range for the FTS scan. The first/last row of the range by
+    created_at estimate its size; wide ranges are left unbounded. An empty
+    range comes back as (1, 0)."""
+    first = session.query(model.id).order_by(model.created_at.asc())
+    last = session.query(model.id).order_by(model.created_at.desc())
+    if start is not None:
+        first = first.filter(model.created_at >= start)
+        last = last.filter(model.created_at >= start)
+    if end is not None:
+        first = first.filter(model.created_at < end)
+        last = last.filter(model.created_at < end)
+    first_id, last_id = first.limit(1).scalar(), last.limit(1).scalar()
+    if first_id is None:
+        return 1, 0
+    if abs(last_id - first_id) > BOUNDS_SCAN_ROWS:
+        return None
+
+    q = session.query(db.func.min(model.id), db.func.max(model.id))
+    if start is not None:
+        q = q.filter(model.created_at >= start)
+    if end is not None:
+        q = q.filter(model.created_at < end)
+    return q.one()
+
+
+def _like(term: str) -> str:
+    return "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def search_movements(
+    q: str,
+    *,
+    archived: bool = False,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    warehouse_id: int | None = None,
+    limit: int = MAX_RESULTS,
+    session=None,
+) -> list[int]:
+    """Ids of the newest movements whose note, reason, product name or SKU match `q`.
+
+    SQLite walks the FTS index newest-first, narrowed to the id range of a
+    short date filter, and stops at `limit`. Other databases fall back to ILIKE on
+    the movement columns plus a product subquery (backed by trigram indexes on
+    PostgreSQL, see the migration)."""
+    session = session or db.session
+    terms = search_terms(q)
+    model = StockMovementArchive if archived else StockMovement
+
+    filters = []
+    if start is not None:
+        filters.append(model.created_at >= start)
+    if end is not None:
+        filters.append(model.created_at < end)
+    if warehouse_id is not None:
+        filters.append(model.warehouse_id == warehouse_id)
+
+    if session.get_bind().dialect.name == "sqlite":
+        fts = db.table(SEARCH_TABLE, db.column("rowid"))
+        stmt = (
+            db.select(fts.c.rowid)
+            .join(model, model.id == fts.c.rowid)
+            .where(db.literal_column(SEARCH_TABLE).op("MATCH")(fts_query(terms)), *filters)
+        )
+        if start is not None or end is not None:
+            bounds = _id_bounds(session, model, start, end)
+            if bounds is not None:
+                stmt = stmt.where(fts.c.rowid.between(*bounds))
+        stmt = stmt.order_by(fts.c.rowid.desc())
+    else:
+        for term in terms:
+            pattern = _like(term)
+            products = db.select(Product.id).where(
+                db.or_(Product.name.ilike(pattern, escape="\\"), Product.sku.ilike(pattern, escape="\\"))
+            )
+            filters.append(
+                db.or_(
+                    model.note.ilike(pattern, escape="\\"),
+                    model.reason.ilike(pattern, escape="\\"),
+                    model.product_id.in_(products),
+                )
+            )
+        stmt = db.select(model.id).where(*filters).order_by(model.id.desc())
+
+    return list(session.execute(stmt.limit(limit)).scalars())
+
+
+def rebuild_movement_search() -> int:
+    """Re-index all hot and archived movements; returns the number of rows (SQLite only)."""
+    if db.session.get_bind().dialect.name != "sqlite":
+        raise SearchError("Tam metin indeksi yalnızca SQLite üzerinde kullanılır.")
+    begin_immediate(db.session())
+    try:
+        db.session.execute(db.text(f"DELETE FROM {SEARCH_TABLE}"))
+        total = 0
+        for model in (StockMovement, StockMovementArchive):
+            total += db.session.execute(
+                db.text(
+                    f"INSERT INTO {SEARCH_TABLE} (rowid, note, reason, product, sku) "
+                    f"SELECT m.id, {fold('m.note')}, {fold('m.reason')}, {fold('p.name')}, {fold('p.sku')} "
+                    f"FROM {model.__tablename__} m "
+                    "JOIN products p ON p.id = m.product_id"
+                )
+            ).rowcount
+        db.session.execute(db.text(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')"))
+        db.session.commit()
+        return total
+    except Exception:
+        db.session.rollback()
+        raise
@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+import threading
+import time
+
+from flask import Flask, current_app
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.orm import Session
+
+from ..extensions import db
+from ..models import StockLevel, StockMovement, StockMovementArchive
+
+Key = tuple[int, int, int | None]  # (product_id, warehouse_id, shelf_id)
+
+
+class StockReadModel:
+    """Current stock per (product, warehouse, shelf), held in memory.
+
+    The change sequence is the latest movement id: every stock level change
+    books a movement in the same transaction. The model is loaded with one
+    statement that also reads the sequence, so its quantities are exactly
+    those of stock_levels at `seq`. Transactions committed by this process
+    are applied right after commit when their movements directly follow
+    `seq`; anything else (other workers, out-of-order commits) is picked up
+    by `refresh`, which costs one primary-key probe when nothing changed and
+    re-reads only the touched levels otherwise.
+
+    Movement ids follow commit order on SQLite, where writers are
+    serialized. On PostgreSQL a transaction that commits after a later id
+    is only seen on the next full `load`."""
+
+    def __init__(self, poll_interval: float = 1.0) -> None:
+        self.poll_interval = poll_interval
+        self.seq = -1  # -1: not loaded
+        self._levels: dict[Key, float] = {}
+        self._by_product: dict[int, set[Key]] = {}
+        self._by_warehouse: dict[int, set[Key]] = {}
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._checked_at = 0.0
+        self._stale = False
+
+    @property
+    def loaded(self) -> bool:
+        return self.seq >= 0
+
+    def __len__(self) -> int:
+        return len(self._levels)
+
+    def _set(self, key: Key, quantity: float) -> None:
+        if key not in self._levels:
+            self._by_product.setdefault(key[0], set()).add(key)
+            self._by_warehouse.setdefault(key[1], set()).add(key)
+        self._levels[key] = quantity
+
+    def load(self, connection=None) -> int:
+        """Read every stock level; returns the sequence they were read at."""
+        if connection is None:
+            with db.engine.connect() as connection:
+                return self.load(connection)
+        latest = db.select(db.func.max(StockMovement.id)).scalar_subquery()
+        rows = connection.execute(
+            db.select(
+                StockLevel.product_id, StockLevel.warehouse_id, StockLevel.shelf_id, StockLevel.quantity, latest
+            )
+        ).all()
+        seq = int(rows[0][4] or 0) if rows else _latest_movement_id(connection)
+
+        levels: dict[Key, float] = {}
+        by_product: dict[int, set[Key]] = {}
+        by_warehouse: dict[int, set[Key]] = {}
+        for product_id, warehouse_id, shelf_id, quantity, _ in rows:
+            key = (product_id, warehouse_id, shelf_id)
+            levels[key] = float(quantity or 0)
+            by_product.setdefault(product_id, set()).add(key)
+            by_warehouse.setdefault(warehouse_id, set()).add(key)
+
+        with self._lock:
+            self._levels, self._by_product, self._by_warehouse = levels, by_product, by_warehouse
+            self.seq = seq
+            self._stale = False
+        self._checked_at = time.monotonic()
+        return seq
+
+    def refresh(self, *, force: bool = False) -> int:
+        """Catch up with movements booked since `seq`, at most every poll_interval.
+
+        Only one thread polls; the others keep reading the current state.
+        Polls use their own connection to the primary: a request's session
+        may still hold an older snapshot."""
+        if not self.loaded:
+            return self.load()
+        if not (force or self._stale or time.monotonic() - self._checked_at >= self.poll_interval):
+            return self.seq
+        if not self._refresh_lock.acquire(blocking=force):
+            return self.seq
+        try:
+            self._checked_at = time.monotonic()
+            self._stale = False
+            with db.engine.connect() as connection:
+                latest = _latest_movement_id(connection)
+                if latest == self.seq:
+                    return self.seq
+                if latest < self.seq:
+                    # Every hot movement archived (or the table was reset).
+                    return self.load(connection)
+                self._catch_up(connection, latest)
+            return self.seq
+        finally:
+            self._refresh_lock.release()
+
+    def _catch_up(self, connection, latest_id: int) -> None:
+        # Keys touched since seq (archived movements included, in case the
+        # archive job moved them first) joined to their current level, and the
+        # sequence, all in one statement so they come from the same snapshot.
+        seq = self.seq
+        touched = db.union(
+            *(
+                db.select(model.product_id, model.warehouse_id, model.shelf_id).where(model.id > seq)
+                for model in (StockMovement, StockMovementArchive)
+            )
+        ).subquery()
+        latest = db.select(db.func.max(StockMovement.id)).scalar_subquery()
+        rows = connection.execute(
+            db.select(
+                StockLevel.product_id, StockLevel.warehouse_id, StockLevel.shelf_id, StockLevel.quantity, latest
+            ).join(
+                touched,
+                db.and_(
+                    StockLevel.product_id == touched.c.product_id,
+                    StockLevel.warehouse_id == touched.c.warehouse_id,
+                    StockLevel.shelf_id.is_not_distinct_from(touched.c.shelf_id),
+                ),
+            )
+        ).all()
+        with self._lock:
+            if self.seq != seq:
+                # A commit of this process was applied meanwhile; poll again.
+                self._stale = True
+                return
+            for product_id, warehouse_id, shelf_id, quantity, _ in rows:
+                self._set((product_id, warehouse_id, shelf_id), float(quantity or 0))
+            # Without rows the movements up to latest_id touched no level.
+            self.seq = max(seq, int(rows[0][4] or 0) if rows else latest_id)
+
+    def apply_committed(self, movement_ids: list[int], levels: dict[Key, float]) -> bool:
+        """Apply a transaction this process just committed.
+
+        Only taken when its movements are exactly seq+1..seq+n; otherwise
+        the next read refreshes from the database."""
+        if not movement_ids:
+            return False
+        ids = sorted(movement_ids)
+        with self._lock:
+            if self.loaded and ids[0] == self.seq + 1 and ids[-1] - ids[0] + 1 == len(ids):
+                for key, quantity in levels.items():
+                    self._set(key, quantity)
+                self.seq = ids[-1]
+                return True
+            self._stale = True
+            return False
+
+    def level(self, product_id: int, warehouse_id: int, shelf_id: int | None = None) -> tuple[float, int]:
+        """(quantity, seq) for one location; unknown locations hold 0."""
+        with self._lock:
+            return self._levels.get((product_id, warehouse_id, shelf_id), 0.0), self.seq
+
+    def levels(
+        self, product_id: int | None = None, warehouse_id: int | None = None
+    ) -> tuple[list[tuple[Key, float]], int]:
+        """(sorted [(key, quantity)], seq) for a product and/or warehouse."""
+        with self._lock:
+            if product_id is not None:
+                keys = self._by_product.get(product_id, set())
+                if warehouse_id is not None:
+                    keys = {k for k in keys if k[1] == warehouse_id}
+            elif warehouse_id is not None:
+                keys = self._by_warehouse.get(warehouse_id, set())
+            else:
+                keys = self._levels.keys()
+            rows = [(k, self._levels[k]) for k in keys]
+            seq = self.seq
+        rows.sort(key=lambda item: (item[0][0], item[0][1], item[0][2] or 0))
+        return rows, seq
+
+
+def _latest_movement_id(connection) -> int:
+    return int(connection.execute(db.select(db.func.max(StockMovement.id))).scalar() or 0)
+
+
+def query_levels(
+    session, product_id: int | None = None, warehouse_id: int | None = None
+) -> tuple[list[tuple[Key, float]], int]:
+    """StockReadModel.levels() answered from the database, for workers without the model."""
+    latest = db.select(db.func.max(StockMovement.id)).scalar_subquery()
+    stmt = db.select(
+        StockLevel.product_id, StockLevel.warehouse_id, StockLevel.shelf_id, StockLevel.quantity, latest
+    )
+    if product_id is not None:
+        stmt = stmt.where(StockLevel.product_id == product_id)
+    if warehouse_id is not None:
+        stmt = stmt.where(StockLevel.warehouse_id == warehouse_id)
+    rows = session.execute(stmt).all()
+    seq = int(rows[0][4] or 0) if rows else _latest_movement_id(session)
+    levels = [((p, w, s), float(q or 0)) for p, w, s, q, _ in rows]
+    levels.sort(key=lambda item: (item[0][0], item[0][1], item[0][2] or 0))
+    return levels, seq
+
+
+_model: StockReadModel | None = None
+
+
+def get_stock_read_model() -> StockReadModel | None:
+    """The worker's read model, refreshed if due; None when STOCK_READ_MODEL_ENABLED is off."""
+    model = current_app.extensions.get("stock_read_model")
+    if model is not None:
+        model.refresh()
+    return model
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session: Session, flush_context) -> None:
+    if _model is None:
+        return
+    movement_ids = [obj.id for obj in session.new if isinstance(obj, StockMovement)]
+    levels = {
+        (obj.product_id, obj.warehouse_id, obj.shelf_id): float(obj.quantity or 0)
+        for obj in session.new | session.dirty
+        if isinstance(obj, StockLevel)
+    }
+    if movement_ids or levels:
+        changes = session.info.setdefault("stock_read_model", ([], {}))
+        changes[0].extend(movement_ids)
+        changes[1].update(levels)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_changes(session: Session) -> None:
+    changes = session.info.pop("stock_read_model", None)
+    if changes is not None and _model is not None:
+        _model.apply_committed(*changes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_changes(session: Session) -> None:
+    session.info.pop("stock_read_model", None)
+
+
+def init_stock_read_model(app: Flask) -> None:
+    global _model
+    if not app.config.get("STOCK_READ_MODEL_ENABLED"):
+        return
+    model = StockReadModel(float(app.config.get("STOCK_READ_MODEL_POLL_SECONDS", 1.0)))
+    app.extensions["stock_read_model"] = model
+    _model = model
+    # Loaded here so a pre-forking server (preload_app) shares the pages with
+    # its workers; a database without tables yet is loaded on first use.
+    with app.app_context():
+        try:
+            model.load()
+        except (OperationalError, ProgrammingError):
+            pass
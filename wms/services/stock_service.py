@@ -1,12 +1,27 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from sqlalchemy.exc import IntegrityError
 
 from ..extensions import db
-from ..models import Shelf, StockLevel, StockMovement, User, Warehouse
+from ..metrics import STOCK_ERRORS
+from ..models import (
+    Customer,
+    IdempotencyKey,
+    Product,
+    Shelf,
+    StockAvailability,
+    StockLevel,
+    StockMovement,
+    StockMovementArchive,
+    StockReservation,
+    User,
+    Warehouse,
+)
+from ..sqlite_profile import begin_immediate
+from .valuation_service import Valuator
 
 
 @dataclass(frozen=True)
@@ -20,10 +35,25 @@ class StockMovementRequest:
     reason: str | None
     note: str | None
     created_by: int
+    unit_cost: float | None = None  # receipts only; issues are valued by the valuation engine
 
 
 class StockError(ValueError):
-    pass
+    def __init__(self, message: str, reason: str = "other") -> None:
+        super().__init__(message)
+        # Short code for metrics, e.g. "negative_stock".
+        self.reason = reason
+
+
+def _rejected(reason: str, message: str) -> StockError:
+    """A StockError that is counted in wms_stock_errors_total."""
+    STOCK_ERRORS.inc(reason)
+    return StockError(message, reason)
+
+
+def signed_quantity(model=StockMovement):
+    """OUT rows are stored positive; IN and ADJUST (delta) already carry their sign."""
+    return db.case((model.movement_type == "OUT", -model.quantity), else_=model.quantity)
 
 
 def _normalize_shelf_id(warehouse_id: int, shelf_id: int | None) -> int | None:
@@ -32,50 +62,95 @@ def _normalize_shelf_id(warehouse_id: int, shelf_id: int | None) -> int | None:
 
     shelf = Shelf.query.get(shelf_id)
     if not shelf:
-        raise StockError("Raf bulunamadı.")
+        raise _rejected("shelf_not_found", "Raf bulunamadı.")
     if shelf.warehouse_id != warehouse_id:
-        raise StockError("Seçilen raf bu depoya ait değil.")
+        raise _rejected("shelf_mismatch", "Seçilen raf bu depoya ait değil.")
     return shelf_id
 
 
-def create_stock_movement(req: StockMovementRequest, *, manage_transaction: bool = True) -> StockMovement:
+def _check_request(req: StockMovementRequest) -> tuple[str, str]:
+    """Validate the request fields; returns (movement_type, reference_type)."""
     movement_type = (req.movement_type or "").upper().strip()
     reference_type = (req.reference_type or "").lower().strip()
 
     if movement_type not in {"IN", "OUT", "ADJUST"}:
-        raise StockError("Geçersiz hareket tipi.")
+        raise _rejected("invalid_type", "Geçersiz hareket tipi.")
 
     if movement_type in {"IN", "OUT"}:
         if req.quantity is None or req.quantity <= 0:
-            raise StockError("Miktar 0'dan büyük olmalı.")
+            raise _rejected("invalid_quantity", "Miktar 0'dan büyük olmalı.")
 
     if movement_type == "ADJUST":
         if req.quantity is None or req.quantity < 0:
-            raise StockError("Hedef stok 0 veya daha büyük olmalı.")
+            raise _rejected("invalid_quantity", "Hedef stok 0 veya daha büyük olmalı.")
         if not (req.reason or "").strip():
-            raise StockError("ADJUST işleminde sebep (reason) zorunludur.")
+            raise _rejected("reason_required", "ADJUST işleminde sebep (reason) zorunludur.")
 
-    shelf_id = _normalize_shelf_id(req.warehouse_id, req.shelf_id)
+    return movement_type, reference_type
 
-    wh = Warehouse.query.get(req.warehouse_id)
-    if not wh or not wh.is_active:
-        raise StockError("Depo pasif veya bulunamadı.")
 
-    user = User.query.get(req.created_by)
-    if not user:
-        raise StockError("Kullanıcı bulunamadı.")
-    if movement_type == "ADJUST" and not user.is_admin:
-        raise StockError("ADJUST işlemi sadece admin tarafından yapılabilir.")
+def _level_change(movement_type: str, quantity: float, current_qty: float) -> tuple[float, float]:
+    """Returns (new level quantity, quantity stored on the movement).
 
-    delta = req.quantity
-    if movement_type == "OUT":
-        delta = -abs(req.quantity)
-    elif movement_type == "IN":
-        delta = abs(req.quantity)
+    ADJUST sets the level to `quantity` and stores the delta; IN/OUT store the
+    absolute quantity."""
+    if movement_type == "ADJUST":
+        target_qty = float(quantity)
+        new_qty, movement_qty = target_qty, target_qty - current_qty
+    else:
+        movement_qty = abs(float(quantity))
+        delta = movement_qty if movement_type == "IN" else -movement_qty
+        new_qty = current_qty + delta
+
+    if new_qty < 0:
+        raise _rejected("negative_stock", "Negatif stok oluşacağı için işlem reddedildi.")
+    return new_qty, movement_qty
+
+
+def _get_availability(product_id: int, warehouse_id: int) -> StockAvailability:
+    av = (
+        StockAvailability.query.filter_by(product_id=product_id, warehouse_id=warehouse_id)
+        .with_for_update()
+        .first()
+    )
+    if av is None:
+        av = StockAvailability(product_id=product_id, warehouse_id=warehouse_id, on_hand=0, reserved=0)
+        db.session.add(av)
+    return av
+
+
+def _availability_change(av: StockAvailability | None, movement_type: str, delta: float) -> float:
+    """Returns the new on_hand; OUT movements may not dip into reserved stock."""
+    on_hand = float(av.on_hand or 0) if av else 0.0
+    reserved = float(av.reserved or 0) if av else 0.0
+    new_on_hand = on_hand + delta
+    if movement_type == "OUT" and new_on_hand < reserved - 1e-9:
+        raise _rejected("reserved_stock", "Rezerve edilmiş stok nedeniyle çıkış yapılamaz.")
+    return new_on_hand
+
+
+def create_stock_movement(req: StockMovementRequest, *, manage_transaction: bool = True) -> StockMovement:
+    movement_type, reference_type = _check_request(req)
+
+    if manage_transaction:
+        begin_immediate(db.session())
 
     now = datetime.utcnow()
 
     try:
+        # Validated under the write lock, so a rejection must roll back to release it.
+        shelf_id = _normalize_shelf_id(req.warehouse_id, req.shelf_id)
+
+        wh = Warehouse.query.get(req.warehouse_id)
+        if not wh or not wh.is_active:
+            raise _rejected("inactive_warehouse", "Depo pasif veya bulunamadı.")
+
+        user = User.query.get(req.created_by)
+        if not user:
+            raise _rejected("user_not_found", "Kullanıcı bulunamadı.")
+        if movement_type == "ADJUST" and not user.is_admin:
+            raise _rejected("adjust_not_allowed", "ADJUST işlemi sadece admin tarafından yapılabilir.")
+
         sl = (
             StockLevel.query.filter_by(
                 product_id=req.product_id,
@@ -95,22 +170,10 @@ def create_stock_movement(req: StockMovementRequest, *, manage_transaction: bool
             db.session.flush()
 
         current_qty = float(sl.quantity or 0)
+        new_qty, movement_qty = _level_change(movement_type, req.quantity, current_qty)
 
-        if movement_type == "ADJUST":
-            target_qty = float(req.quantity)
-            delta = target_qty - current_qty
-            new_qty = target_qty
-        else:
-            new_qty = current_qty + float(delta)
-
-        if new_qty < 0:
-            raise StockError("Negatif stok oluşacağı için işlem reddedildi.")
-
-        movement_qty = float(req.quantity)
-        if movement_type == "ADJUST":
-            movement_qty = float(delta)
-        elif movement_type in {"IN", "OUT"}:
-            movement_qty = abs(float(req.quantity))
+        av = _get_availability(req.product_id, req.warehouse_id)
+        av.on_hand = _availability_change(av, movement_type, new_qty - current_qty)
 
         m = StockMovement(
             product_id=req.product_id,
@@ -124,6 +187,9 @@ def create_stock_movement(req: StockMovementRequest, *, manage_transaction: bool
             created_by=req.created_by,
             created_at=now,
         )
+        m.unit_cost = Valuator().apply(
+            req.product_id, req.warehouse_id, new_qty - current_qty, req.unit_cost, now
+        )
         db.session.add(m)
 
         sl.quantity = new_qty
@@ -138,4 +204,447 @@ def create_stock_movement(req: StockMovementRequest, *, manage_transaction: bool
         raise
     except IntegrityError as e:
         db.session.rollback()
-        raise StockError("Stok güncellenemedi (veri bütünlüğü hatası).") from e
+        raise _rejected("integrity", "Stok güncellenemedi (veri bütünlüğü hatası).") from e
+
+
+def _find_replay(key: str, user_id: int) -> StockMovement | StockMovementArchive | None:
+    existing = db.session.get(IdempotencyKey, key)
+    if existing is None:
+        return None
+    if existing.user_id != user_id:
+        raise _rejected("key_conflict", "İşlem anahtarı başka bir kullanıcıya ait.")
+    movement = db.session.get(StockMovement, existing.movement_id)
+    if movement is None:
+        movement = db.session.get(StockMovementArchive, existing.movement_id)
+    return movement
+
+
+def create_stock_movement_idempotent(
+    req: StockMovementRequest, idempotency_key: str | None
+) -> tuple[StockMovement | StockMovementArchive, bool]:
+    """Book a movement at most once per idempotency key.
+
+    Returns (movement, replayed). A replayed key returns the movement booked
+    by the first request and leaves StockLevel untouched."""
+    key = (idempotency_key or "").strip()
+    if not key:
+        return create_stock_movement(req), False
+    if len(key) > 64:
+        raise _rejected("invalid_key", "İşlem anahtarı en fazla 64 karakter olabilir.")
+
+    replay = _find_replay(key, req.created_by)
+    if replay is not None:
+        return replay, True
+
+    begin_immediate(db.session())
+    try:
+        # Re-check inside the write transaction: a concurrent retry may have
+        # committed between the first lookup and taking the write lock.
+        replay = _find_replay(key, req.created_by)
+        if replay is not None:
+            db.session.rollback()
+            return replay, True
+
+        m = create_stock_movement(req, manage_transaction=False)
+        db.session.flush()
+        db.session.add(IdempotencyKey(key=key, user_id=req.created_by, movement_id=m.id))
+        db.session.commit()
+        return m, False
+    except StockError:
+        db.session.rollback()
+        raise
+    except IntegrityError:
+        db.session.rollback()
+        replay = _find_replay(key, req.created_by)
+        if replay is None:
+            raise _rejected("integrity", "Stok güncellenemedi (veri bütünlüğü hatası).")
+        return replay, True
+
+
+def purge_idempotency_keys(older_than: timedelta) -> int:
+    cutoff = datetime.utcnow() - older_than
+    deleted = (
+        db.session.query(IdempotencyKey)
+        .filter(IdempotencyKey.created_at < cutoff)
+        .delete(synchronize_session=False)
+    )
+    db.session.commit()
+    return deleted
+
+
+@dataclass
+class BatchLineResult:
+    index: int
+    status: str  # ok, replayed, error, not_processed
+    movement: StockMovement | StockMovementArchive | None = None
+    error: str | None = None
+    reason: str | None = None
+
+
+class _BatchContext:
+    """Everything a batch needs, loaded with one query per table."""
+
+    def __init__(self, reqs: list[StockMovementRequest], keys: list[str | None]) -> None:
+        product_ids = {r.product_id for r in reqs}
+        warehouse_ids = {r.warehouse_id for r in reqs}
+        shelf_ids = {r.shelf_id for r in reqs if r.shelf_id is not None}
+        user_ids = {r.created_by for r in reqs}
+
+        self.products = {
+            pid for (pid,) in db.session.query(Product.id).filter(Product.id.in_(product_ids)).all()
+        }
+        self.warehouses = {
+            w.id: w for w in Warehouse.query.filter(Warehouse.id.in_(warehouse_ids)).all()
+        }
+        self.shelves = (
+            {s.id: s for s in Shelf.query.filter(Shelf.id.in_(shelf_ids)).all()} if shelf_ids else {}
+        )
+        self.users = {u.id: u for u in User.query.filter(User.id.in_(user_ids)).all()}
+        self.levels = {
+            (sl.product_id, sl.warehouse_id, sl.shelf_id): sl
+            for sl in StockLevel.query.filter(StockLevel.product_id.in_(product_ids))
+            .filter(StockLevel.warehouse_id.in_(warehouse_ids))
+            .all()
+        }
+
+        self.availability = {
+            (av.product_id, av.warehouse_id): av
+            for av in StockAvailability.query.filter(StockAvailability.product_id.in_(product_ids))
+            .filter(StockAvailability.warehouse_id.in_(warehouse_ids))
+            .all()
+        }
+
+        self.valuation = Valuator()
+        self.valuation.preload(product_ids, warehouse_ids)
+
+        wanted = {k for k in keys if k}
+        self.keys = (
+            {k.key: k for k in IdempotencyKey.query.filter(IdempotencyKey.key.in_(wanted)).all()}
+            if wanted
+            else {}
+        )
+
+    def level(self, product_id: int, warehouse_id: int, shelf_id: int | None) -> StockLevel:
+        key = (product_id, warehouse_id, shelf_id)
+        sl = self.levels.get(key)
+        if sl is None:
+            sl = StockLevel(product_id=product_id, warehouse_id=warehouse_id, shelf_id=shelf_id, quantity=0)
+            db.session.add(sl)
+            self.levels[key] = sl
+        return sl
+
+    def avail(self, product_id: int, warehouse_id: int) -> StockAvailability:
+        key = (product_id, warehouse_id)
+        av = self.availability.get(key)
+        if av is None:
+            av = StockAvailability(product_id=product_id, warehouse_id=warehouse_id, on_hand=0, reserved=0)
+            db.session.add(av)
+            self.availability[key] = av
+        return av
+
+
+def _check_batch_line(ctx: _BatchContext, req: StockMovementRequest) -> tuple[str, str]:
+    movement_type, reference_type = _check_request(req)
+
+    if req.product_id not in ctx.products:
+        raise _rejected("product_not_found", "Ürün bulunamadı.")
+
+    if req.shelf_id is not None:
+        shelf = ctx.shelves.get(req.shelf_id)
+        if not shelf:
+            raise _rejected("shelf_not_found", "Raf bulunamadı.")
+        if shelf.warehouse_id != req.warehouse_id:
+            raise _rejected("shelf_mismatch", "Seçilen raf bu depoya ait değil.")
+
+    wh = ctx.warehouses.get(req.warehouse_id)
+    if not wh or not wh.is_active:
+        raise _rejected("inactive_warehouse", "Depo pasif veya bulunamadı.")
+
+    user = ctx.users.get(req.created_by)
+    if not user:
+        raise _rejected("user_not_found", "Kullanıcı bulunamadı.")
+    if movement_type == "ADJUST" and not user.is_admin:
+        raise _rejected("adjust_not_allowed", "ADJUST işlemi sadece admin tarafından yapılabilir.")
+
+    return movement_type, reference_type
+
+
+def create_stock_movements_batch(
+    reqs: list[StockMovementRequest],
+    idempotency_keys: list[str | None] | None = None,
+    *,
+    stop_on_error: bool = False,
+    manage_transaction: bool = True,
+) -> list[BatchLineResult]:
+    """Apply an ordered batch of movements in a single transaction.
+
+    Lines are validated and applied in order against in-memory stock levels,
+    so a later line sees the effect of earlier ones. A failing line leaves no
+    trace; with stop_on_error the remaining lines are not processed. Lines
+    whose idempotency key was already used are reported as replayed. With
+    manage_transaction=False the caller inspects the results and commits or
+    rolls back."""
+    keys = [(k or "").strip() or None for k in (idempotency_keys or [None] * len(reqs))]
+    if len(keys) != len(reqs):
+        raise ValueError("idempotency_keys must match reqs")
+
+    if manage_transaction:
+        begin_immediate(db.session())
+    try:
+        ctx = _BatchContext(reqs, keys)
+        results: list[BatchLineResult] = []
+        booked: list[tuple[BatchLineResult, StockMovement, str | None]] = []
+        batch_keys: dict[str, BatchLineResult] = {}
+        now = datetime.utcnow()
+        stopped = False
+
+        for i, (req, key) in enumerate(zip(reqs, keys)):
+            if stopped:
+                results.append(BatchLineResult(i, "not_processed"))
+                continue
+
+            try:
+                if key is not None:
+                    if len(key) > 64:
+                        raise _rejected("invalid_key", "İşlem anahtarı en fazla 64 karakter olabilir.")
+                    existing = ctx.keys.get(key)
+                    if existing is not None:
+                        if existing.user_id != req.created_by:
+                            raise _rejected("key_conflict", "İşlem anahtarı başka bir kullanıcıya ait.")
+                        movement = db.session.get(StockMovement, existing.movement_id) or db.session.get(
+                            StockMovementArchive, existing.movement_id
+                        )
+                        results.append(BatchLineResult(i, "replayed", movement))
+                        continue
+                    if key in batch_keys:
+                        first = batch_keys[key]
+                        if first.movement.created_by != req.created_by:
+                            raise _rejected("key_conflict", "İşlem anahtarı başka bir kullanıcıya ait.")
+                        results.append(BatchLineResult(i, "replayed", first.movement))
+                        continue
+
+                movement_type, reference_type = _check_batch_line(ctx, req)
+                current = ctx.levels.get((req.product_id, req.warehouse_id, req.shelf_id))
+                current_qty = float(current.quantity or 0) if current else 0.0
+                new_qty, movement_qty = _level_change(movement_type, req.quantity, current_qty)
+                new_on_hand = _availability_change(
+                    ctx.availability.get((req.product_id, req.warehouse_id)),
+                    movement_type,
+                    new_qty - current_qty,
+                )
+            except StockError as e:
+                results.append(BatchLineResult(i, "error", error=str(e), reason=e.reason))
+                stopped = stop_on_error
+                continue
+
+            ctx.level(req.product_id, req.warehouse_id, req.shelf_id).quantity = new_qty
+            ctx.avail(req.product_id, req.warehouse_id).on_hand = new_on_hand
+            m = StockMovement(
+                product_id=req.product_id,
+                warehouse_id=req.warehouse_id,
+                shelf_id=req.shelf_id,
+                movement_type=movement_type,
+                quantity=movement_qty,
+                reference_type=reference_type,
+                reason=(req.reason.strip() if req.reason else None),
+                note=req.note,
+                created_by=req.created_by,
+                created_at=now,
+                unit_cost=ctx.valuation.apply(
+                    req.product_id, req.warehouse_id, new_qty - current_qty, req.unit_cost, now
+                ),
+            )
+            line = BatchLineResult(i, "ok", m)
+            results.append(line)
+            booked.append((line, m, key))
+            if key is not None:
+                batch_keys[key] = line
+
+        db.session.add_all([m for _, m, _ in booked])
+        db.session.flush()
+        db.session.add_all(
+            [
+                IdempotencyKey(key=key, user_id=m.created_by, movement_id=m.id)
+                for _, m, key in booked
+                if key is not None
+            ]
+        )
+        if manage_transaction:
+            db.session.commit()
+        return results
+    except IntegrityError as e:
+        db.session.rollback()
+        raise _rejected("integrity", "Stok güncellenemedi (veri bütünlüğü hatası).") from e
+    except Exception:
+        if manage_transaction:
+            db.session.rollback()
+        raise
+
+
+def available_to_promise(product_id: int, warehouse_id: int | None = None, *, session=None) -> float:
+    """On-hand minus open reservations, read from stock_availability."""
+    session = session or db.session
+    q = session.query(
+        db.func.coalesce(db.func.sum(StockAvailability.on_hand - StockAvailability.reserved), 0)
+    ).filter(StockAvailability.product_id == product_id)
+    if warehouse_id is not None:
+        q = q.filter(StockAvailability.warehouse_id == warehouse_id)
+    return float(q.scalar() or 0)
+
+
+def reserve_stock(
+    product_id: int,
+    warehouse_id: int,
+    customer_id: int,
+    quantity: float,
+    created_by: int,
+    note: str | None = None,
+    *,
+    manage_transaction: bool = True,
+) -> StockReservation:
+    if quantity is None or quantity <= 0:
+        raise _rejected("invalid_quantity", "Miktar 0'dan büyük olmalı.")
+
+    if manage_transaction:
+        begin_immediate(db.session())
+    try:
+        if db.session.get(Product, product_id) is None:
+            raise _rejected("product_not_found", "Ürün bulunamadı.")
+        wh = db.session.get(Warehouse, warehouse_id)
+        if not wh or not wh.is_active:
+            raise _rejected("inactive_warehouse", "Depo pasif veya bulunamadı.")
+        customer = db.session.get(Customer, customer_id)
+        if not customer or not customer.is_active:
+            raise _rejected("inactive_customer", "Müşteri pasif veya bulunamadı.")
+
+        av = _get_availability(product_id, warehouse_id)
+        if av.available < float(quantity) - 1e-9:
+            raise _rejected("insufficient_available", "Yeterli serbest stok yok.")
+        av.reserved = float(av.reserved or 0) + float(quantity)
+
+        r = StockReservation(
+            product_id=product_id,
+            warehouse_id=warehouse_id,
+            customer_id=customer_id,
+            quantity=float(quantity),
+            status=StockReservation.Status.OPEN.value,
+            note=note,
+            created_by=created_by,
+        )
+        db.session.add(r)
+
+        if manage_transaction:
+            db.session.commit()
+        return r
+    except StockError:
+        if manage_transaction:
+            db.session.rollback()
+        raise
+
+
+def _open_reservation(reservation_id: int) -> StockReservation:
+    r = db.session.get(StockReservation, reservation_id)
+    if r is None:
+        raise _rejected("reservation_not_found", "Rezervasyon bulunamadı.")
+    if r.status != StockReservation.Status.OPEN.value:
+        raise _rejected("reservation_not_open", "Rezervasyon açık değil.")
+    return r
+
+
+def _unreserve(r: StockReservation, status: StockReservation.Status) -> None:
+    av = _get_availability(r.product_id, r.warehouse_id)
+    av.reserved = max(float(av.reserved or 0) - float(r.quantity), 0.0)
+    r.status = status.value
+    r.closed_at = datetime.utcnow()
+
+
+def release_reservation(reservation_id: int, *, manage_transaction: bool = True) -> StockReservation:
+    if manage_transaction:
+        begin_immediate(db.session())
+    try:
+        r = _open_reservation(reservation_id)
+        _unreserve(r, StockReservation.Status.RELEASED)
+        if manage_transaction:
+            db.session.commit()
+        return r
+    except StockError:
+        if manage_transaction:
+            db.session.rollback()
+        raise
+
+
+def consume_reservation(
+    reservation_id: int,
+    created_by: int,
+    shelf_id: int | None = None,
+    note: str | None = None,
+    *,
+    manage_transaction: bool = True,
+) -> StockReservation:
+    """Ship a reservation: book its OUT movement and drop the reserved quantity."""
+    if manage_transaction:
+        begin_immediate(db.session())
+    try:
+        r = _open_reservation(reservation_id)
+        _unreserve(r, StockReservation.Status.CONSUMED)
+        m = create_stock_movement(
+            StockMovementRequest(
+                product_id=r.product_id,
+                warehouse_id=r.warehouse_id,
+                shelf_id=shelf_id,
+                movement_type="OUT",
+                quantity=float(r.quantity),
+                reference_type="sale",
+                reason=None,
+                note=note or f"reservation:{r.id}",
+                created_by=created_by,
+            ),
+            manage_transaction=False,
+        )
+        db.session.flush()
+        r.movement_id = m.id
+        if manage_transaction:
+            db.session.commit()
+        return r
+    except StockError:
+        if manage_transaction:
+            db.session.rollback()
+        raise
+
+
+def rebuild_availability() -> int:
+    """Recompute stock_availability from stock_levels and open reservations."""
+    db.session.query(StockAvailability).delete(synchronize_session=False)
+
+    rows: dict[tuple[int, int], dict] = {}
+    for product_id, warehouse_id, qty in (
+        db.session.query(StockLevel.product_id, StockLevel.warehouse_id, db.func.sum(StockLevel.quantity))
+        .group_by(StockLevel.product_id, StockLevel.warehouse_id)
+        .all()
+    ):
+        rows[(product_id, warehouse_id)] = {
+            "product_id": product_id,
+            "warehouse_id": warehouse_id,
+            "on_hand": float(qty or 0),
+            "reserved": 0.0,
+        }
+    for product_id, warehouse_id, qty in (
+        db.session.query(
+            StockReservation.product_id,
+            StockReservation.warehouse_id,
+            db.func.sum(StockReservation.quantity),
+        )
+        .filter(StockReservation.status == StockReservation.Status.OPEN.value)
+        .group_by(StockReservation.product_id, StockReservation.warehouse_id)
+        .all()
+    ):
+        row = rows.setdefault(
+            (product_id, warehouse_id),
+            {"product_id": product_id, "warehouse_id": warehouse_id, "on_hand": 0.0, "reserved": 0.0},
+        )
+        row["reserved"] = float(qty or 0)
+
+    if rows:
+        db.session.execute(db.insert(StockAvailability), list(rows.values()))
+    db.session.commit()
+    return len(rows)
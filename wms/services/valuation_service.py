@@ -0,0 +1,290 @@
+from __future__ import annotations
+
+import heapq
+import re
+from dataclasses import dataclass
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import inspect
+
+from ..extensions import db
+from ..models import (
+    CostLayer,
+    Product,
+    PurchaseItem,
+    StockMovement,
+    StockMovementArchive,
+    StockValuation,
+    Warehouse,
+)
+from ..sqlite_profile import begin_immediate
+
+AVERAGE = "average"
+FIFO = "fifo"
+METHODS = (AVERAGE, FIFO)
+
+_EPS = 1e-9
+_PURCHASE_NOTE = re.compile(r"^purchase:(\d+)$")
+
+
+def valuation_method() -> str:
+    method = (current_app.config.get("VALUATION_METHOD") or AVERAGE).lower()
+    if method not in METHODS:
+        raise ValueError(f"VALUATION_METHOD must be one of {', '.join(METHODS)}")
+    return method
+
+
+class Valuator:
+    """Applies quantity changes to stock_valuation (and FIFO cost layers).
+
+    Works inside the caller's transaction. A batch calls preload() once so
+    every row it touches is fetched with one query per table; without it rows
+    are read on first use."""
+
+    def __init__(self, method: str | None = None) -> None:
+        self.method = method or valuation_method()
+        self.rows: dict[tuple[int, int], StockValuation] = {}
+        self.layers: dict[tuple[int, int], list[CostLayer]] = {}
+        self._preloaded = False
+
+    def preload(self, product_ids, warehouse_ids) -> None:
+        product_ids, warehouse_ids = set(product_ids), set(warehouse_ids)
+        if product_ids and warehouse_ids:
+            for row in StockValuation.query.filter(
+                StockValuation.product_id.in_(product_ids), StockValuation.warehouse_id.in_(warehouse_ids)
+            ).all():
+                self.rows[(row.product_id, row.warehouse_id)] = row
+            if self.method == FIFO:
+                for layer in (
+                    CostLayer.query.filter(
+                        CostLayer.product_id.in_(product_ids),
+                        CostLayer.warehouse_id.in_(warehouse_ids),
+                        CostLayer.remaining > 0,
+                    )
+                    .order_by(CostLayer.id.asc())
+                    .all()
+                ):
+                    self.layers.setdefault((layer.product_id, layer.warehouse_id), []).append(layer)
+        self._preloaded = True
+
+    def _row(self, key: tuple[int, int]) -> StockValuation:
+        row = self.rows.get(key)
+        if row is None and not self._preloaded:
+            row = (
+                StockValuation.query.filter_by(product_id=key[0], warehouse_id=key[1])
+                .with_for_update()
+                .first()
+            )
+        if row is None:
+            row = StockValuation(product_id=key[0], warehouse_id=key[1], quantity=0, avg_cost=0, total_value=0)
+            db.session.add(row)
+        self.rows[key] = row
+        return row
+
+    def _layers(self, key: tuple[int, int]) -> list[CostLayer]:
+        layers = self.layers.get(key)
+        if layers is None:
+            layers = (
+                []
+                if self._preloaded
+                else CostLayer.query.filter(
+                    CostLayer.product_id == key[0], CostLayer.warehouse_id == key[1], CostLayer.remaining > 0
+                )
+                .order_by(CostLayer.id.asc())
+                .all()
+            )
+            self.layers[key] = layers
+        return layers
+
+    def _consume(self, key: tuple[int, int], quantity: float, fallback_cost: float) -> float:
+        """Take quantity from the oldest layers; returns the cost taken."""
+        layers = self._layers(key)
+        cost = 0.0
+        need = quantity
+        while need > _EPS and layers:
+            layer = layers[0]
+            take = min(float(layer.remaining), need)
+            cost += take * float(layer.unit_cost)
+            layer.remaining = float(layer.remaining) - take
+            need -= take
+            if layer.remaining <= _EPS:
+                layers.pop(0)
+                if inspect(layer).persistent:
+                    db.session.delete(layer)
+                else:
+                    db.session.expunge(layer)
+        # Stock that predates the layers (or the valuation itself) is charged
+        # at the running average.
+        return cost + max(need, 0.0) * fallback_cost
+
+    def apply(
+        self, product_id: int, warehouse_id: int, delta: float, unit_cost: float | None, at: datetime
+    ) -> float | None:
+        """Book a signed quantity change; returns the unit cost it was valued at.
+
+        Receipts without a cost come in at the current average so they do not
+        move it."""
+        if abs(delta) <= _EPS:
+            return None
+
+        key = (product_id, warehouse_id)
+        row = self._row(key)
+        qty = float(row.quantity or 0)
+        value = float(row.total_value or 0)
+        avg = float(row.avg_cost or 0)
+
+        if delta > 0:
+            cost = float(unit_cost) if unit_cost is not None else avg
+            qty += delta
+            value += delta * cost
+            if self.method == FIFO:
+                layer = CostLayer(
+                    product_id=product_id,
+                    warehouse_id=warehouse_id,
+                    received_at=at,
+                    unit_cost=cost,
+                    quantity=delta,
+                    remaining=delta,
+                )
+                db.session.add(layer)
+                self._layers(key).append(layer)
+        else:
+            out = -delta
+            if self.method == FIFO:
+                taken = self._consume(key, out, avg)
+            else:
+                taken = out * avg
+            cost = taken / out
+            qty -= out
+            value -= taken
+
+        if qty <= _EPS:
+            qty, value = 0.0, 0.0
+        else:
+            avg = value / qty
+
+        row.quantity = qty
+        row.total_value = value
+        row.avg_cost = avg
+        row.updated_at = at
+        return cost
+
+
+@dataclass
+class RebuildResult:
+    movements: int = 0
+    rows: int = 0
+    layers: int = 0
+    backfilled: int = 0
+
+
+def _history(model, chunk_size: int):
+    return db.session.execute(
+        db.select(
+            model.id,
+            model.product_id,
+            model.warehouse_id,
+            model.movement_type,
+            model.quantity,
+            model.unit_cost,
+            model.note,
+            model.created_at,
+            db.literal(model is StockMovementArchive),
+        )
+        .order_by(model.id.asc())
+        .execution_options(yield_per=chunk_size)
+    )
+
+
+def rebuild_valuation(*, method: str | None = None, chunk_size: int = 5000) -> RebuildResult:
+    """Recompute stock_valuation (and FIFO layers) from the full movement history.
+
+    Hot and archived movements are replayed in id order. Receipts without a
+    unit cost take it from the purchase item named in their note
+    ("purchase:<id>"); every computed cost is written back to its movement."""
+    valuator = Valuator(method)
+    result = RebuildResult()
+
+    begin_immediate(db.session())
+    try:
+        db.session.execute(db.delete(CostLayer))
+        db.session.execute(db.delete(StockValuation))
+        valuator.preload((), ())
+
+        purchase_costs = {
+            (purchase_id, product_id): float(cost)
+            for purchase_id, product_id, cost in db.session.query(
+                PurchaseItem.purchase_id, PurchaseItem.product_id, PurchaseItem.unit_cost
+            )
+            .filter(PurchaseItem.unit_cost.isnot(None))
+            .all()
+        }
+
+        updates: dict[bool, list[dict]] = {False: [], True: []}
+        rows = heapq.merge(
+            _history(StockMovement, chunk_size), _history(StockMovementArchive, chunk_size), key=lambda r: r[0]
+        )
+        for mid, product_id, warehouse_id, movement_type, quantity, unit_cost, note, created_at, archived in rows:
+            delta = -float(quantity) if movement_type == "OUT" else float(quantity)
+            incoming = unit_cost if delta > 0 else None
+            if delta > 0 and incoming is None and note:
+                match = _PURCHASE_NOTE.match(note)
+                if match:
+                    incoming = purchase_costs.get((int(match.group(1)), product_id))
+                    if incoming is not None:
+                        result.backfilled += 1
+
+            cost = valuator.apply(product_id, warehouse_id, delta, incoming, created_at)
+            if cost != unit_cost:
+                updates[archived].append({"id": mid, "unit_cost": cost})
+            result.movements += 1
+
+        if updates[False]:
+            db.session.execute(db.update(StockMovement), updates[False])
+        if updates[True]:
+            db.session.execute(db.update(StockMovementArchive), updates[True])
+
+        result.rows = len(valuator.rows)
+        result.layers = sum(len(layers) for layers in valuator.layers.values())
+        db.session.commit()
+        return result
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+@dataclass
+class ValuationRow:
+    product_id: int
+    product: str
+    sku: str
+    warehouse: str
+    quantity: float
+    avg_cost: float
+    total_value: float
+
+
+def valuation_report(warehouse_id: int | None = None, *, session=None) -> list[ValuationRow]:
+    """Current stock value per product/warehouse, read straight from stock_valuation."""
+    session = session or db.session
+    q = (
+        session.query(
+            StockValuation.product_id,
+            Product.name,
+            Product.sku,
+            Warehouse.name,
+            StockValuation.quantity,
+            StockValuation.avg_cost,
+            StockValuation.total_value,
+        )
+        .join(Product, Product.id == StockValuation.product_id)
+        .join(Warehouse, Warehouse.id == StockValuation.warehouse_id)
+        .filter(StockValuation.quantity > 0)
+    )
+    if warehouse_id is not None:
+        q = q.filter(StockValuation.warehouse_id == warehouse_id)
+    return [
+        ValuationRow(pid, name, sku, wh, float(qty), float(avg), float(value))
+        for pid, name, sku, wh, qty, avg, value in q.order_by(Warehouse.name.asc(), Product.name.asc()).all()
+    ]
@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import os
+import tempfile
+import threading
+import time
+
+from flask import Flask
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from .extensions import db
+
+_BEGIN_OPTION = "sqlite_begin"
+# session.info flag: the current transaction has flushed or executed DML.
+_WROTE = "sqlite_wrote"
+
+
+def apply_sqlite_profile(engine: Engine, *, busy_timeout_ms: int, cache_size_kb: int, mmap_size: int) -> None:
+    """Register connect/begin listeners that tune every new SQLite connection."""
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record) -> None:
+        # Let SQLAlchemy emit BEGIN itself so write transactions can ask for
+        # BEGIN IMMEDIATE instead of pysqlite's implicit deferred BEGIN.
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA busy_timeout={int(busy_timeout_ms)}")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA cache_size=-{int(cache_size_kb)}")
+        cursor.execute(f"PRAGMA mmap_size={int(mmap_size)}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+    @event.listens_for(engine, "begin")
+    def _on_begin(conn) -> None:
+        mode = conn.get_execution_options().get(_BEGIN_OPTION)
+        conn.exec_driver_sql(f"BEGIN {mode}" if mode else "BEGIN")
+
+
+def begin_immediate(session: Session) -> None:
+    """Start the session's next transaction with BEGIN IMMEDIATE on SQLite.
+
+    Taking the write lock up front means concurrent writers wait on
+    busy_timeout instead of failing with 'database is locked' when a deferred
+    read transaction tries to upgrade. A read-only transaction that is already
+    open is rolled back first. A transaction with pending changes or one that
+    has already written is left as it is: nothing is ever committed here, and
+    a transaction that wrote already holds the write lock."""
+    bind = session.get_bind()
+    if bind.dialect.name != "sqlite":
+        return
+    if session.in_transaction():
+        if _has_writes(session):
+            return
+        session.rollback()
+    session.connection(execution_options={_BEGIN_OPTION: "IMMEDIATE"})
+
+
+def end_read_transaction(session: Session) -> None:
+    """Roll back a read-only transaction so the next query takes a fresh snapshot.
+
+    Like begin_immediate, a transaction with pending changes or one that has
+    already written is left as it is."""
+    if session.in_transaction() and not _has_writes(session):
+        session.rollback()
+
+
+def _has_writes(session: Session) -> bool:
+    return bool(session.new or session.dirty or session.deleted or session.info.get(_WROTE))
+
+
+@event.listens_for(Session, "after_flush")
+def _flushed(session: Session, flush_context) -> None:
+    session.info[_WROTE] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _executed(orm_execute_state) -> None:
+    # Textual SQL counts as a write: it cannot be told apart from a SELECT.
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info[_WROTE] = True
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _transaction_ended(session: Session, transaction) -> None:
+    if transaction.parent is None:
+        session.info.pop(_WROTE, None)
+
+
+class WalCheckpointer(threading.Thread):
+    def __init__(self, engine: Engine, interval_seconds: float, mode: str = "PASSIVE") -> None:
+        super().__init__(name="wal-checkpoint", daemon=True)
+        self.engine = engine
+        self.interval_seconds = interval_seconds
+        self.mode = mode
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval_seconds):
+            self.checkpoint()
+
+    def checkpoint(self) -> None:
+        try:
+            with self.engine.connect() as conn:
+                conn.exec_driver_sql(f"PRAGMA wal_checkpoint({self.mode})")
+        except Exception:
+            # A busy checkpoint is retried on the next tick.
+            pass
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+
+def init_sqlite_profile(app: Flask) -> None:
+    if not app.config.get("SQLITE_PERFORMANCE_PROFILE", True):
+        return
+
+    with app.app_context():
+        engines = dict(db.engines)
+
+    for sqlite_engine in engines.values():
+        if sqlite_engine.dialect.name != "sqlite":
+            continue
+        apply_sqlite_profile(
+            sqlite_engine,
+            busy_timeout_ms=app.config.get("SQLITE_BUSY_TIMEOUT_MS", 5000),
+            cache_size_kb=app.config.get("SQLITE_CACHE_SIZE_KB", 65536),
+            mmap_size=app.config.get("SQLITE_MMAP_SIZE", 268435456),
+        )
+
+    engine = engines[None]
+    interval = app.config.get("SQLITE_WAL_CHECKPOINT_SECONDS", 0)
+    if engine.dialect.name == "sqlite" and interval and not app.testing:
+        checkpointer = WalCheckpointer(engine, float(interval))
+        checkpointer.start()
+        app.extensions["wal_checkpointer"] = checkpointer
+
+
+def benchmark_sqlite_profile(
+    *,
+    writers: int = 4,
+    readers: int = 4,
+    writes_per_writer: int = 200,
+) -> dict[str, dict[str, float]]:
+    """Compare default pysqlite settings against the profile on scratch files.
+
+    Each writer commits one row per transaction; readers count rows in a loop
+    while writers run."""
+    results: dict[str, dict[str, float]] = {}
+
+    for label, profiled in (("default", False), ("profile", True)):
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_engine("sqlite:///" + os.path.join(tmp, "bench.sqlite3"))
+            if profiled:
+                apply_sqlite_profile(
+                    engine, busy_timeout_ms=5000, cache_size_kb=65536, mmap_size=268435456
+                )
+            with engine.begin() as conn:
+                conn.execute(text("CREATE TABLE t (id INTEGER PRIMARY KEY, v REAL NOT NULL)"))
+
+            stats = {"writes": 0, "write_errors": 0, "reads": 0}
+            lock = threading.Lock()
+            done = threading.Event()
+
+            def writer() -> None:
+                ok = failed = 0
+                for i in range(writes_per_writer):
+                    try:
+                        with engine.connect() as conn:
+                            if profiled:
+                                conn = conn.execution_options(**{_BEGIN_OPTION: "IMMEDIATE"})
+                            with conn.begin():
+                                conn.execute(text("INSERT INTO t (v) VALUES (:v)"), {"v": float(i)})
+                        ok += 1
+                    except Exception:
+                        failed += 1
+                with lock:
+                    stats["writes"] += ok
+                    stats["write_errors"] += failed
+
+            def reader() -> None:
+                n = 0
+                while not done.is_set():
+                    try:
+                        with engine.connect() as conn:
+                            conn.execute(text("SELECT COUNT(*) FROM t")).scalar()
+                        n += 1
+                    except Exception:
+                        pass
+                with lock:
+                    stats["reads"] += n
+
+            write_threads = [threading.Thread(target=writer) for _ in range(writers)]
+            read_threads = [threading.Thread(target=reader) for _ in range(readers)]
+
+            started = time.perf_counter()
+            for t in read_threads + write_threads:
+                t.start()
+            for t in write_threads:
+                t.join()
+            elapsed = time.perf_counter() - started
+            done.set()
+            for t in read_threads:
+                t.join()
+            engine.dispose()
+
+            results[label] = {
+                "seconds": elapsed,
+                "writes_per_sec": stats["writes"] / elapsed if elapsed else 0.0,
+                "write_errors": float(stats["write_errors"]),
+                "reads_per_sec": stats["reads"] / elapsed if elapsed else 0.0,
+            }
+
+    return results
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+import time
+
+_SNIPPET = "from wms import create_app; create_app(web={web})"
+
+
+def _parse_importtime(stderr: str) -> dict[str, int]:
+    """Cumulative import time in microseconds per module from `python -X importtime`."""
+    result: dict[str, int] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:") :].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            cumulative = int(parts[1].strip())
+        except ValueError:
+            continue
+        result[parts[2].strip()] = cumulative
+    return result
+
+
+def benchmark_startup(*, runs: int = 5, top: int = 10) -> dict[str, dict]:
+    """Create the app in fresh interpreters, with and without the web layer.
+
+    Returns median wall time per mode and the slowest top-level imports of the
+    last run."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    results: dict[str, dict] = {}
+
+    for label, web in (("web", True), ("cli", False)):
+        walls: list[float] = []
+        imports: dict[str, int] = {}
+        for _ in range(runs):
+            t0 = time.perf_counter()
+            proc = subprocess.run(
+                [sys.executable, "-X", "importtime", "-c", _SNIPPET.format(web=web)],
+                cwd=root,
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+            walls.append(time.perf_counter() - t0)
+            imports = _parse_importtime(proc.stderr)
+
+        walls.sort()
+        heavy = sorted(
+            ((name, us) for name, us in imports.items() if "." not in name or name.startswith("wms.")),
+            key=lambda item: item[1],
+            reverse=True,
+        )
+        results[label] = {
+            "median_ms": walls[len(walls) // 2] * 1000,
+            "modules": len(imports),
+            "top": [(name, us / 1000) for name, us in heavy[:top]],
+        }
+    return results
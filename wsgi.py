@@ -0,0 +1,5 @@
+from wms import create_app
+
+# Production entry point, loaded once in the gunicorn master (preload_app) and
+# forked into the workers: gunicorn -c gunicorn.conf.py wsgi:app
+app = create_app()